@@ -0,0 +1,151 @@
+"""versions, search and counters
+
+Revision ID: 9b7d3e5a2c81
+Revises: c4e8a1f2b6d3
+Create Date: 2026-10-18 09:26:41.093377
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9b7d3e5a2c81'
+down_revision: Union[str, Sequence[str], None] = 'c4e8a1f2b6d3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+UPDATED_AT_TABLES = ['users', 'vaccines', 'appointments', 'vaccinations', 'awareness_articles']
+
+# Frozen copy of app.models.ARTICLE_SEARCH_DDL (every statement is idempotent).
+ARTICLE_SEARCH_DDL = {
+    'postgresql': [
+        "ALTER TABLE awareness_articles ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        "GENERATED ALWAYS AS (setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(content, '')), 'B')) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_awareness_articles_search_vector "
+        "ON awareness_articles USING GIN (search_vector)",
+    ],
+    'sqlite': [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS awareness_articles_fts USING fts5("
+        "title, content, content='awareness_articles', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER IF NOT EXISTS awareness_articles_fts_ai AFTER INSERT ON awareness_articles BEGIN "
+        "INSERT INTO awareness_articles_fts (rowid, title, content) VALUES (new.id, new.title, new.content); END",
+        "CREATE TRIGGER IF NOT EXISTS awareness_articles_fts_ad AFTER DELETE ON awareness_articles BEGIN "
+        "INSERT INTO awareness_articles_fts (awareness_articles_fts, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); END",
+        "CREATE TRIGGER IF NOT EXISTS awareness_articles_fts_au AFTER UPDATE OF title, content "
+        "ON awareness_articles BEGIN "
+        "INSERT INTO awareness_articles_fts (awareness_articles_fts, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); "
+        "INSERT INTO awareness_articles_fts (rowid, title, content) VALUES (new.id, new.title, new.content); END",
+        # index rows that predate the table
+        "INSERT INTO awareness_articles_fts (awareness_articles_fts) VALUES ('rebuild')",
+    ],
+}
+
+# Counters backfilled from the base tables when their table is created here.
+# Days match app.stats.stored_day: UTC on PostgreSQL, stored wall-clock on SQLite.
+DAY = {
+    'postgresql': "CAST(preferred_date AT TIME ZONE 'UTC' AS DATE)",
+    'sqlite': "date(preferred_date)",
+}
+BACKFILL = {
+    'appointment_daily_stats':
+        "INSERT INTO appointment_daily_stats (vaccine_id, day, status, count) "
+        "SELECT vaccine_id, {day}, status, COUNT(*) FROM appointments GROUP BY 1, 2, 3",
+    'vaccine_dose_stats':
+        "INSERT INTO vaccine_dose_stats (vaccine_id, doses) "
+        "SELECT vaccine_id, COUNT(*) FROM vaccinations GROUP BY vaccine_id",
+    'appointment_slots':
+        "INSERT INTO appointment_slots (vaccine_id, day, capacity, booked) "
+        "SELECT vaccine_id, {day}, NULL, COUNT(*) FROM appointments "
+        "WHERE status IN ('pending', 'approved') GROUP BY 1, 2",
+}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    bind = op.get_bind()
+    dialect = bind.dialect.name
+    inspector = sa.inspect(bind)
+    existing = set(inspector.get_table_names())
+
+    # updated_at for Last-Modified/ETags. SQLite cannot ALTER in a column with
+    # a non-constant default, so the table is copied there.
+    for table in UPDATED_AT_TABLES:
+        if 'updated_at' in {column['name'] for column in inspector.get_columns(table)}:
+            continue
+        with op.batch_alter_table(table, recreate='always' if dialect == 'sqlite' else 'auto') as batch:
+            batch.add_column(sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(),
+                                       nullable=True))
+
+    op.create_table(
+        'catalog_versions',
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('name'),
+        if_not_exists=True,
+    )
+    for name in ('vaccines', 'articles'):
+        op.execute(
+            "INSERT INTO catalog_versions (name, version) "
+            f"SELECT '{name}', 0 WHERE NOT EXISTS (SELECT 1 FROM catalog_versions WHERE name = '{name}')"
+        )
+
+    for statement in ARTICLE_SEARCH_DDL.get(dialect, []):
+        op.execute(statement)
+
+    op.create_table(
+        'appointment_daily_stats',
+        sa.Column('vaccine_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['vaccine_id'], ['vaccines.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('vaccine_id', 'day', 'status'),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'vaccine_dose_stats',
+        sa.Column('vaccine_id', sa.Integer(), nullable=False),
+        sa.Column('doses', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['vaccine_id'], ['vaccines.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('vaccine_id'),
+        if_not_exists=True,
+    )
+    op.create_table(
+        'appointment_slots',
+        sa.Column('vaccine_id', sa.Integer(), nullable=False),
+        sa.Column('day', sa.Date(), nullable=False),
+        sa.Column('capacity', sa.Integer(), nullable=True),
+        sa.Column('booked', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['vaccine_id'], ['vaccines.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('vaccine_id', 'day'),
+        if_not_exists=True,
+    )
+    for table, statement in BACKFILL.items():
+        if table not in existing:
+            op.execute(statement.format(day=DAY[dialect]))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    dialect = op.get_bind().dialect.name
+    op.drop_table('appointment_slots')
+    op.drop_table('vaccine_dose_stats')
+    op.drop_table('appointment_daily_stats')
+    if dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_awareness_articles_search_vector")
+        op.execute("ALTER TABLE awareness_articles DROP COLUMN IF EXISTS search_vector")
+    elif dialect == 'sqlite':
+        for suffix in ('ai', 'ad', 'au'):
+            op.execute(f"DROP TRIGGER IF EXISTS awareness_articles_fts_{suffix}")
+        op.execute("DROP TABLE IF EXISTS awareness_articles_fts")
+    op.drop_table('catalog_versions')
+    for table in reversed(UPDATED_AT_TABLES):
+        with op.batch_alter_table(table) as batch:
+            batch.drop_column('updated_at')
@@ -0,0 +1,189 @@
+"""partition appointments and vaccinations
+
+Revision ID: b8d4f1a6c3e2
+Revises: f3b9c2d7e4a1
+Create Date: 2026-10-18 11:06:52.731480
+
+"""
+from datetime import date, datetime, timezone
+from typing import Sequence, Union
+
+from alembic import context, op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d4f1a6c3e2'
+down_revision: Union[str, Sequence[str], None] = 'f3b9c2d7e4a1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Months after the current one partitioned here; app/partitions.py moves the window on.
+MONTHS_AHEAD = 12
+
+# Frozen table definitions: (table, partition key, columns, indexes). The
+# primary key gains the partition key (PostgreSQL requires it), so vaccinations
+# can no longer reference appointments by id. vaccinations first: its old
+# table holds the foreign key to the old appointments.
+TABLES = [
+    ('vaccinations', 'vaccination_date', [
+        "id integer NOT NULL DEFAULT nextval('{sequence}')",
+        "appointment_id integer",
+        "citizen_id integer REFERENCES users (id) ON DELETE CASCADE",
+        "vaccine_id integer NOT NULL REFERENCES vaccines (id) ON DELETE CASCADE",
+        "dose_number integer NOT NULL",
+        "batch_number varchar",
+        "vaccination_date timestamp with time zone NOT NULL DEFAULT now()",
+        "admin_id integer REFERENCES users (id) ON DELETE SET NULL",
+        "updated_at timestamp with time zone DEFAULT now()",
+    ], [
+        ('idx_vaccination_citizen_date', ['citizen_id', 'vaccination_date']),
+        ('idx_vaccination_appointment', ['appointment_id']),
+        ('idx_vaccination_vaccine', ['vaccine_id']),
+        ('idx_vaccination_admin', ['admin_id']),
+    ]),
+    ('appointments', 'preferred_date', [
+        "id integer NOT NULL DEFAULT nextval('{sequence}')",
+        "citizen_id integer NOT NULL REFERENCES users (id) ON DELETE CASCADE",
+        "vaccine_id integer NOT NULL REFERENCES vaccines (id) ON DELETE CASCADE",
+        "preferred_date timestamp with time zone NOT NULL",
+        "status varchar NOT NULL",
+        "admin_id integer REFERENCES users (id) ON DELETE SET NULL",
+        "reason_rejection varchar",
+        "created_at timestamp with time zone DEFAULT now()",
+        "updated_at timestamp with time zone DEFAULT now()",
+    ], [
+        ('idx_appointment_user_status', ['citizen_id', 'status']),
+        ('idx_appointment_vaccine_date', ['vaccine_id', 'preferred_date']),
+        ('idx_appointment_status_created', ['status', 'created_at']),
+        ('idx_appointment_admin', ['admin_id']),
+    ]),
+]
+
+# Copy expressions that differ from the plain column.
+UPGRADE_COPY = {'vaccination_date': "COALESCE(vaccination_date, updated_at, now())"}
+DOWNGRADE_COLUMNS = {
+    'appointment_id': "appointment_id integer REFERENCES appointments (id) ON DELETE CASCADE",
+    'vaccination_date': "vaccination_date timestamp with time zone DEFAULT now()",
+}
+# Archived months come back with the live rows (see downgrade); a vaccination whose appointment
+# is still missing loses the link the restored foreign key would reject.
+DOWNGRADE_COPY = {'appointment_id': "(SELECT id FROM appointments WHERE appointments.id = source.appointment_id)"}
+
+
+# The ON DELETE CASCADE of the dropped vaccinations.appointment_id foreign key, for SQL
+# deletes through the parent table. A statement trigger on the parent: rows moved out of
+# the default partition (app/partitions.py) and detached months delete nothing.
+APPOINTMENT_CASCADE_DDL = [
+    "CREATE OR REPLACE FUNCTION delete_appointment_vaccinations() RETURNS trigger AS $$ "
+    "BEGIN "
+    "DELETE FROM vaccinations WHERE appointment_id IN (SELECT id FROM old_appointments); "
+    "RETURN NULL; "
+    "END $$ LANGUAGE plpgsql",
+    "CREATE OR REPLACE TRIGGER appointments_delete_vaccinations AFTER DELETE ON appointments "
+    "REFERENCING OLD TABLE AS old_appointments FOR EACH STATEMENT EXECUTE FUNCTION delete_appointment_vaccinations()",
+]
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _sequence(table: str) -> str:
+    if context.is_offline_mode():
+        return f'{table}_id_seq'
+    return op.get_bind().execute(sa.text(f"SELECT pg_get_serial_sequence('{table}', 'id')")).scalar()
+
+
+def _months(table: str, key: str) -> list:
+    """Months holding rows, plus the current one and MONTHS_AHEAD after it."""
+    today = datetime.now(timezone.utc).date()
+    months = {_add_months(date(today.year, today.month, 1), n) for n in range(MONTHS_AHEAD + 1)}
+    if not context.is_offline_mode():
+        # Rows outside these months land in the default partition; `python -m app.partitions --maintain` moves them.
+        months.update(op.get_bind().execute(sa.text(
+            f"SELECT DISTINCT CAST(date_trunc('month', {key} AT TIME ZONE 'UTC') AS date) FROM {table} "
+            f"WHERE {key} IS NOT NULL"
+        )).scalars())
+    return sorted(months)
+
+
+def _archived(table: str) -> list:
+    """``archive.<table>`` when it exists (app/partitions.py attaches archived months to it)."""
+    if context.is_offline_mode():
+        return [f'archive.{table}']
+    exists = op.get_bind().execute(sa.text(f"SELECT to_regclass('archive.{table}')")).scalar()
+    return [f'archive.{table}'] if exists else []
+
+
+def _rebuild(table: str, key: str, columns: list, indexes: list, copy: dict, partitioned: bool, archived=()):
+    """Swap ``table`` for a new (partitioned or plain) table holding the same rows, under the same names.
+
+    Rows of the ``archived`` tables are copied in too."""
+    sequence = _sequence(table)
+    names = [column.split()[0] for column in columns]
+    source = f'{table}_source'
+    months = _months(table, key) if partitioned else []
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY NONE")
+    op.execute(f"ALTER TABLE {table} RENAME TO {source}")
+    op.execute(f"ALTER INDEX {table}_pkey RENAME TO {source}_pkey")
+    for name, _ in indexes:
+        op.execute(f"DROP INDEX IF EXISTS {name}")
+
+    definition = ", ".join(columns).format(sequence=sequence)
+    if partitioned:
+        op.execute(f"CREATE TABLE {table} ({definition}, PRIMARY KEY (id, {key})) PARTITION BY RANGE ({key})")
+        op.execute(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT")
+        for month in months:
+            op.execute(f"CREATE TABLE {table}_p{month:%Y_%m} PARTITION OF {table} "
+                       f"FOR VALUES FROM ('{month} UTC') TO ('{_add_months(month, 1)} UTC')")
+    else:
+        op.execute(f"CREATE TABLE {table} ({definition}, PRIMARY KEY (id))")
+    rows = " UNION ALL ".join(f"SELECT {', '.join(names)} FROM {name}" for name in [source, *archived])
+    op.execute(f"INSERT INTO {table} ({', '.join(names)}) "
+               f"SELECT {', '.join(copy.get(name, name) for name in names)} FROM ({rows}) AS source")
+    # Built after the copy (one sort per partition instead of row-by-row maintenance).
+    for name, index_columns in indexes:
+        op.create_index(name, table, index_columns)
+    op.execute(f"DROP TABLE {source}")
+    op.execute(f"ALTER SEQUENCE {sequence} OWNED BY {table}.id")
+    op.execute(f"ANALYZE {table}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        # Plain tables elsewhere; only the vaccination date becomes NOT NULL, as the partition key is.
+        op.execute("UPDATE vaccinations SET vaccination_date = COALESCE(updated_at, CURRENT_TIMESTAMP) "
+                   "WHERE vaccination_date IS NULL")
+        with op.batch_alter_table('vaccinations') as batch:
+            batch.alter_column('vaccination_date', existing_type=sa.DateTime(timezone=True), nullable=False,
+                               existing_server_default=sa.func.now())
+        return
+    for table, key, columns, indexes in TABLES:
+        _rebuild(table, key, columns, indexes, UPGRADE_COPY, partitioned=True)
+    for statement in APPOINTMENT_CASCADE_DDL:
+        op.execute(statement)
+    # Archived month partitions are attached here (see app/partitions.py).
+    op.execute("CREATE SCHEMA IF NOT EXISTS archive")
+    for table, key, _, _ in TABLES:
+        op.execute(f"CREATE TABLE IF NOT EXISTS archive.{table} (LIKE public.{table}) PARTITION BY RANGE ({key})")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        with op.batch_alter_table('vaccinations') as batch:
+            batch.alter_column('vaccination_date', existing_type=sa.DateTime(timezone=True), nullable=True,
+                               existing_server_default=sa.func.now())
+        return
+    op.execute("DROP FUNCTION IF EXISTS delete_appointment_vaccinations() CASCADE")
+    # Archived months move back into the plain tables (appointments first, for the restored foreign key);
+    # their archive tables go once copied. The archive schema itself is kept.
+    for table, key, columns, indexes in reversed(TABLES):
+        columns = [DOWNGRADE_COLUMNS.get(column.split()[0], column) for column in columns]
+        archived = _archived(table)
+        _rebuild(table, key, columns, indexes, DOWNGRADE_COPY, partitioned=False, archived=archived)
+        for name in archived:
+            op.execute(f"DROP TABLE {name}")
@@ -0,0 +1,106 @@
+"""create tables
+
+Revision ID: c4e8a1f2b6d3
+Revises: 6a21b431b4aa
+Create Date: 2026-10-18 09:12:04.518223
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e8a1f2b6d3'
+down_revision: Union[str, Sequence[str], None] = '6a21b431b4aa'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The original tables, as Base.metadata.create_all used to build them at
+    # startup. IF NOT EXISTS lets databases created that way adopt the chain.
+    op.create_table(
+        'users',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('full_name', sa.String(), nullable=False),
+        sa.Column('email', sa.String(), nullable=False),
+        sa.Column('password_hash', sa.String(), nullable=False),
+        sa.Column('role', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_users_email', 'users', ['email'], unique=True, if_not_exists=True)
+
+    op.create_table(
+        'vaccines',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('price', sa.Float(), nullable=True),
+        sa.Column('availability', sa.Boolean(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('name'),
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        'appointments',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('citizen_id', sa.Integer(), nullable=False),
+        sa.Column('vaccine_id', sa.Integer(), nullable=False),
+        sa.Column('preferred_date', sa.DateTime(timezone=True), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('admin_id', sa.Integer(), nullable=True),
+        sa.Column('reason_rejection', sa.String(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['admin_id'], ['users.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['citizen_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['vaccine_id'], ['vaccines.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index('ix_appointments_status', 'appointments', ['status'], if_not_exists=True)
+
+    op.create_table(
+        'vaccinations',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('appointment_id', sa.Integer(), nullable=True),
+        sa.Column('citizen_id', sa.Integer(), nullable=True),
+        sa.Column('vaccine_id', sa.Integer(), nullable=False),
+        sa.Column('dose_number', sa.Integer(), nullable=False),
+        sa.Column('batch_number', sa.String(), nullable=True),
+        sa.Column('vaccination_date', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('admin_id', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['admin_id'], ['users.id'], ondelete='SET NULL'),
+        sa.ForeignKeyConstraint(['appointment_id'], ['appointments.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['citizen_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['vaccine_id'], ['vaccines.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+
+    op.create_table(
+        'awareness_articles',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('title', sa.String(), nullable=False),
+        sa.Column('content', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('created_by', sa.Integer(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('awareness_articles')
+    op.drop_table('vaccinations')
+    op.drop_index('ix_appointments_status', table_name='appointments')
+    op.drop_table('appointments')
+    op.drop_table('vaccines')
+    op.drop_index('ix_users_email', table_name='users')
+    op.drop_table('users')
@@ -0,0 +1,56 @@
+"""index pack
+
+Revision ID: e2a6f4c8d1b5
+Revises: 9b7d3e5a2c81
+Create Date: 2026-10-18 09:47:13.862140
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e2a6f4c8d1b5'
+down_revision: Union[str, Sequence[str], None] = '9b7d3e5a2c81'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (name, table, columns) for every access path the routers use.
+INDEXES = [
+    # declared in models from the start, but never attached to the table
+    ('idx_appointment_user_status', 'appointments', ['citizen_id', 'status']),
+    # batch status filters, appointment exports, slot and rollup maintenance
+    ('idx_appointment_vaccine_date', 'appointments', ['vaccine_id', 'preferred_date']),
+    # status queues in creation order; replaces ix_appointments_status
+    ('idx_appointment_status_created', 'appointments', ['status', 'created_at']),
+    # a citizen's vaccination history
+    ('idx_vaccination_citizen_date', 'vaccinations', ['citizen_id', 'vaccination_date']),
+    # foreign keys: ORM cascades, ON DELETE actions and joins read by them
+    ('idx_appointment_admin', 'appointments', ['admin_id']),
+    ('idx_vaccination_appointment', 'vaccinations', ['appointment_id']),
+    ('idx_vaccination_vaccine', 'vaccinations', ['vaccine_id']),
+    ('idx_vaccination_admin', 'vaccinations', ['admin_id']),
+    ('idx_article_author', 'awareness_articles', ['created_by']),
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # PostgreSQL builds them CONCURRENTLY (outside the migration transaction)
+    # so a live database keeps taking writes.
+    with op.get_context().autocommit_block():
+        for name, table, columns in INDEXES:
+            op.create_index(name, table, columns, if_not_exists=True, postgresql_concurrently=True)
+        op.drop_index('ix_appointments_status', table_name='appointments', if_exists=True,
+                      postgresql_concurrently=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.get_context().autocommit_block():
+        op.create_index('ix_appointments_status', 'appointments', ['status'], if_not_exists=True,
+                        postgresql_concurrently=True)
+        for name, table, columns in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
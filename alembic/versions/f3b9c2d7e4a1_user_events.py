@@ -0,0 +1,63 @@
+"""user events
+
+Revision ID: f3b9c2d7e4a1
+Revises: e2a6f4c8d1b5
+Create Date: 2026-10-18 10:12:40.518203
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f3b9c2d7e4a1'
+down_revision: Union[str, Sequence[str], None] = 'e2a6f4c8d1b5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Frozen copy of app.models.USER_EVENT_NOTIFY_DDL.
+NOTIFY_DDL = [
+    "CREATE OR REPLACE FUNCTION notify_user_events() RETURNS trigger AS $$ "
+    "DECLARE chunk text; "
+    "BEGIN "
+    "FOR chunk IN SELECT json_agg(json_build_array(id, user_id) ORDER BY id)::text FROM "
+    "(SELECT id, user_id, (row_number() OVER (ORDER BY id) - 1) / 200 AS part FROM new_events) numbered "
+    "GROUP BY part LOOP "
+    "PERFORM pg_notify('user_events', chunk); "
+    "END LOOP; "
+    "RETURN NULL; "
+    "END $$ LANGUAGE plpgsql",
+    "CREATE OR REPLACE TRIGGER user_events_notify AFTER INSERT ON user_events "
+    "REFERENCING NEW TABLE AS new_events FOR EACH STATEMENT EXECUTE FUNCTION notify_user_events()",
+]
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'user_events',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=False),
+        sa.Column('type', sa.String(), nullable=False),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+        if_not_exists=True,
+    )
+    op.create_index('idx_user_event_user', 'user_events', ['user_id', 'id'], if_not_exists=True)
+    op.create_index('idx_user_event_created', 'user_events', ['created_at'], if_not_exists=True)
+    if op.get_bind().dialect.name == 'postgresql':
+        for statement in NOTIFY_DDL:
+            op.execute(statement)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP FUNCTION IF EXISTS notify_user_events() CASCADE")
+    op.drop_index('idx_user_event_created', table_name='user_events', if_exists=True)
+    op.drop_index('idx_user_event_user', table_name='user_events', if_exists=True)
+    op.drop_table('user_events')
@@ -0,0 +1,297 @@
+"""Admission control: per-principal rate limits and in-flight caps per route class.
+
+Routes that hit the database hard during a campaign opening (login and
+registration, booking, bulk exports/imports/analytics) declare a route class
+with ``dependencies=[admission("auth"), ...]``. Before anything touches the
+pool, a request of that class must
+
+- take a token from its client IP's bucket and from its user's bucket
+  (the bearer token's user, or the account a login/registration names),
+  otherwise it gets 429 with ``Retry-After`` set to when a token is back;
+- find a free in-flight slot for its class, otherwise it gets 503 with
+  ``Retry-After: 1``.
+
+Nothing queues: a surge is turned away in microseconds while cheap reads
+keep their connections and threads. Token buckets live in this process
+(``RATE_LIMIT_BACKEND=memory``) or in Redis (``redis``), shared by every
+worker. In-flight caps are always per process, like the pool they protect.
+
+Each class is configured as ``ADMISSION_<CLASS>="ip=<tokens>/<seconds>
+user=<tokens>/<seconds> in_flight=<n>"``; a missing part is not limited and
+``off`` disables the class.
+"""
+import logging
+import math
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from fastapi import Depends, Request
+from . import metrics
+from .auth_handler import decode_access_token
+from .database import DB_MAX_OVERFLOW, DB_POOL_SIZE
+from .hashing import PASSWORD_HASH_WORKERS
+from .principal_cache import principal_cache
+
+logger = logging.getLogger("app.admission")
+
+# --------------------------
+# SETTINGS
+# --------------------------
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+# Buckets kept by the memory backend; the least recently used are forgotten (i.e. refilled).
+RATE_LIMIT_MAX_KEYS = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+
+_POOL = DB_POOL_SIZE + DB_MAX_OVERFLOW
+DEFAULT_CLASSES = {
+    # A login is mostly PBKDF2: more in flight than hashing workers only queues.
+    "auth": f"ip=60/60 user=10/60 in_flight={max(PASSWORD_HASH_WORKERS, 1) * 2}",
+    "booking": f"ip=120/60 user=20/60 in_flight={max(_POOL // 2, 1)}",
+    "bulk": "user=30/60 in_flight=2",
+}
+
+
+class Rate(NamedTuple):
+    tokens: int      # bucket size (burst)
+    seconds: float   # time to refill it from empty
+
+    @property
+    def per_second(self) -> float:
+        return self.tokens / self.seconds
+
+
+class RouteClass(NamedTuple):
+    per_ip: Optional[Rate] = None
+    per_user: Optional[Rate] = None
+    max_in_flight: Optional[int] = None
+
+
+def parse_route_class(spec: str) -> RouteClass:
+    if spec.strip() == "off":
+        return RouteClass()
+    parts = {}
+    for item in spec.split():
+        key, _, value = item.partition("=")
+        if key in ("ip", "user"):
+            tokens, _, seconds = value.partition("/")
+            parts[f"per_{key}"] = Rate(int(tokens), float(seconds or 1))
+        elif key == "in_flight":
+            parts["max_in_flight"] = int(value)
+        else:
+            raise ValueError(f"Unknown admission setting {item!r} (expected ip=, user= or in_flight=)")
+    return RouteClass(**parts)
+
+
+ROUTE_CLASSES = {name: parse_route_class(os.getenv(f"ADMISSION_{name.upper()}", default))
+                 for name, default in DEFAULT_CLASSES.items()}
+
+
+class RateLimited(RuntimeError):
+    def __init__(self, retry_after: float):
+        super().__init__(f"rate limited, retry in {retry_after:.1f}s")
+        self.retry_after = retry_after
+
+
+class Overloaded(RuntimeError):
+    pass
+
+
+# --------------------------
+# TOKEN BUCKET BACKENDS
+# --------------------------
+# take() spends one token of ``key`` and returns 0, or the seconds until one is available.
+class MemoryBackend:
+    name = "memory"
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()  # key -> (tokens, updated)
+
+    async def take(self, key: str, rate: Rate) -> float:
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.pop(key, (rate.tokens, now))
+            tokens = min(rate.tokens, tokens + (now - updated) * rate.per_second)
+            wait = 0.0
+            if tokens >= 1:
+                tokens -= 1
+            else:
+                wait = (1 - tokens) / rate.per_second
+            self._buckets[key] = (tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+# The same bucket in one atomic step on the Redis server, timed by its clock.
+TOKEN_BUCKET_SCRIPT = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= 1 then tokens = tokens - 1 else wait = (1 - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return tostring(wait)
+"""
+
+
+class RedisBackend:
+    """Buckets shared by every worker. Fails open: Redis being down must not take the API down."""
+    name = "redis"
+
+    def __init__(self, url: str):
+        self.url = url
+        self._script = None
+        self._pid = None
+
+    def _get_script(self):
+        # Created lazily in each (forked) worker, on its own loop.
+        if self._script is None or self._pid != os.getpid():
+            import redis.asyncio
+
+            self._script = redis.asyncio.from_url(self.url).register_script(TOKEN_BUCKET_SCRIPT)
+            self._pid = os.getpid()
+        return self._script
+
+    async def take(self, key: str, rate: Rate) -> float:
+        try:
+            wait = await self._get_script()(keys=[f"ratelimit:{key}"], args=[rate.tokens, rate.per_second])
+        except Exception as error:
+            logger.warning("rate limit backend unavailable, admitting: %s", error)
+            return 0.0
+        return float(wait)
+
+    def clear(self):
+        pass
+
+
+def _backend():
+    if RATE_LIMIT_BACKEND == "memory":
+        return MemoryBackend(RATE_LIMIT_MAX_KEYS)
+    if RATE_LIMIT_BACKEND == "redis":
+        return RedisBackend(REDIS_URL)
+    raise ValueError(f"Unknown RATE_LIMIT_BACKEND {RATE_LIMIT_BACKEND!r}")
+
+
+backend = _backend()
+
+
+# --------------------------
+# IN-FLIGHT SLOTS (per process, on the event loop)
+# --------------------------
+class InFlight:
+    def __init__(self):
+        self._counts = {}
+
+    def acquire(self, name: str, limit: Optional[int]) -> bool:
+        count = self._counts.get(name, 0)
+        if limit is not None and count >= limit:
+            return False
+        self._counts[name] = count + 1
+        metrics.ADMISSION_IN_FLIGHT.inc(name)
+        return True
+
+    def release(self, name: str):
+        self._counts[name] -= 1
+        metrics.ADMISSION_IN_FLIGHT.dec(name)
+
+    def count(self, name: str) -> int:
+        return self._counts.get(name, 0)
+
+
+in_flight = InFlight()
+
+
+# --------------------------
+# PRINCIPALS
+# --------------------------
+def client_ip(request: Request) -> str:
+    # Behind a proxy, the server (app/serve.py) resolves X-Forwarded-For into request.client.
+    return request.client.host if request.client else "unknown"
+
+
+async def _account(request: Request) -> Optional[str]:
+    """The account a login form or registration body names. The body is already parsed (and cached)."""
+    content_type = request.headers.get("content-type", "")
+    try:
+        if content_type.startswith(("application/x-www-form-urlencoded", "multipart/form-data")):
+            value = (await request.form()).get("username")
+        elif content_type.startswith("application/json"):
+            body = await request.json()
+            value = body.get("email") if isinstance(body, dict) else None
+        else:
+            return None
+    except ValueError:
+        return None
+    return value.strip().lower() if isinstance(value, str) and value.strip() else None
+
+
+async def user_key(request: Request) -> Optional[str]:
+    authorization = request.headers.get("authorization", "")
+    if authorization.lower().startswith("bearer "):
+        token = authorization[7:]
+        principal = principal_cache.get(token)
+        if principal is not None:
+            return f"user:{principal.id}"
+        payload = decode_access_token(token)
+        if payload and payload.get("user_id") is not None:
+            return f"user:{payload['user_id']}"
+    account = await _account(request)
+    return f"account:{account}" if account else None
+
+
+# --------------------------
+# ROUTE DEPENDENCY
+# --------------------------
+async def _check_rates(name: str, route_class: RouteClass, request: Request):
+    checks = []
+    if route_class.per_ip is not None:
+        checks.append(("rate_ip", f"{name}:ip:{client_ip(request)}", route_class.per_ip))
+    if route_class.per_user is not None:
+        key = await user_key(request)
+        if key is not None:
+            checks.append(("rate_user", f"{name}:{key}", route_class.per_user))
+    for reason, key, rate in checks:
+        wait = await backend.take(key, rate)
+        if wait > 0:
+            metrics.ADMISSION_REJECTED.inc(name, reason)
+            raise RateLimited(wait)
+
+
+def admission(name: str):
+    """Route dependency admitting a request of class ``name``; list it first so rejects cost no DB work."""
+    route_class = ROUTE_CLASSES[name]
+
+    async def admit(request: Request):
+        if not ADMISSION_ENABLED:
+            yield
+            return
+        await _check_rates(name, route_class, request)
+        if not in_flight.acquire(name, route_class.max_in_flight):
+            metrics.ADMISSION_REJECTED.inc(name, "in_flight")
+            raise Overloaded(f"too many {name} requests in flight")
+        try:
+            yield
+        finally:
+            in_flight.release(name)
+
+    return Depends(admit)
+
+
+def retry_after(error: RateLimited) -> str:
+    return str(max(math.ceil(error.retry_after), 1))
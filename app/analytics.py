@@ -0,0 +1,434 @@
+"""Vaccination coverage analytics, computed column-wise with NumPy.
+
+Vaccinations are read as four integer columns (citizen, vaccine, dose
+number, day) from a server-side cursor, ``ANALYTICS_BATCH_SIZE`` rows at a
+time, and stacked into NumPy arrays; no ORM object or per-row Python loop is
+involved. Every report is a handful of array operations: rows are packed into
+one sortable int64 key per group, grouped with ``np.unique`` and summed with
+``np.bincount``/``np.cumsum``. Reports are Arrow tables, served as JSON rows
+or downloaded as Parquet or an Arrow IPC stream.
+
+- coverage: doses per vaccine, month and dose number, citizens reaching that
+  dose that month, the running total and its share of all citizens
+- progression: per vaccine and dose number, citizens who reached it, citizens
+  who stopped there, and days since the previous dose (median, p90)
+- cohorts: citizens grouped by the month of their first dose, with the share
+  of each cohort that reached every later dose
+- citizens: one row per citizen and vaccine: doses, last dose, next dose due
+- due: the citizens whose next dose was due on or before ``as_of``
+
+A citizen's next dose is due DOSE_INTERVAL_DAYS after their last one, until
+they have DOSE_SERIES_LENGTH doses.
+
+    python -m app.analytics coverage --format parquet -o coverage.parquet
+"""
+import argparse
+import os
+import sys
+from datetime import date, datetime, time, timezone
+from itertools import chain
+from typing import Optional
+
+import numpy as np
+import orjson
+import pyarrow as pa
+import pyarrow.parquet as pq
+from fastapi import Query
+from fastapi.responses import Response
+from sqlalchemy import Integer, cast, func, select
+from . import models
+from .pagination import MAX_PAGE_SIZE, TOTAL_COUNT_HEADER
+
+# --------------------------
+# SETTINGS
+# --------------------------
+ANALYTICS_BATCH_SIZE = int(os.getenv("ANALYTICS_BATCH_SIZE", "100000"))
+DOSE_SERIES_LENGTH = int(os.getenv("DOSE_SERIES_LENGTH", "3"))
+DOSE_INTERVAL_DAYS = int(os.getenv("DOSE_INTERVAL_DAYS", "28"))
+
+ANALYTICS_FORMATS = ("json", "parquet", "arrow")
+MEDIA_TYPES = {"json": "application/json", "parquet": "application/vnd.apache.parquet",
+               "arrow": "application/vnd.apache.arrow.stream"}
+EXTENSIONS = {"json": "json", "parquet": "parquet", "arrow": "arrows"}
+EPOCH = date(1970, 1, 1)
+
+
+# --------------------------
+# PARAMETERS (dependency)
+# --------------------------
+class AnalyticsParams:
+    def __init__(
+        self,
+        format: str = Query("json", pattern="^(json|parquet|arrow)$"),
+        date_from: Optional[date] = Query(None, description="vaccinations on or after this day"),
+        date_to: Optional[date] = Query(None, description="vaccinations before this day"),
+        vaccine_id: Optional[int] = None,
+        as_of: Optional[date] = Query(None, description="due date cut-off (default: today)"),
+        limit: int = Query(100, ge=1, le=MAX_PAGE_SIZE, description="JSON rows of per-citizen reports"),
+    ):
+        self.format = format
+        self.date_from = date_from
+        self.date_to = date_to
+        self.vaccine_id = vaccine_id
+        self.as_of = as_of or datetime.now(timezone.utc).date()
+        self.limit = limit
+
+
+# --------------------------
+# LOADING (column batches)
+# --------------------------
+class VaccinationColumns:
+    """One NumPy array per column; ``day`` counts days since 1970-01-01."""
+
+    def __init__(self, citizen_id, vaccine_id, dose_number, day, population: int = 0):
+        self.citizen_id = citizen_id  # 0 when unknown
+        self.vaccine_id = vaccine_id
+        self.dose_number = dose_number
+        self.day = day
+        self.population = population  # citizens, the denominator of coverage
+
+    def __len__(self):
+        return len(self.day)
+
+    def take(self, index) -> "VaccinationColumns":
+        return VaccinationColumns(self.citizen_id[index], self.vaccine_id[index], self.dose_number[index],
+                                  self.day[index], self.population)
+
+    @classmethod
+    def from_partitions(cls, partitions, population: int = 0) -> "VaccinationColumns":
+        chunks = [np.fromiter(chain.from_iterable(rows), np.int64, 4 * len(rows)).reshape(-1, 4)
+                  for rows in partitions if rows]
+        data = np.concatenate(chunks) if chunks else np.empty((0, 4), np.int64)
+        return cls(data[:, 0].copy(), data[:, 1].astype(np.int32), data[:, 2].astype(np.int32),
+                   data[:, 3].astype(np.int32), population)
+
+
+def _epoch_day(column, dialect: str):
+    """The day of ``column`` as the database stores it (see stats.stored_day), as days since 1970-01-01."""
+    if dialect == "postgresql":
+        return cast(func.floor(func.extract("epoch", column) / 86400), Integer)
+    return cast(func.julianday(column) - 2440587.5, Integer)
+
+
+def _bound(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def vaccination_statement(dialect: str, params: AnalyticsParams):
+    vaccination = models.Vaccination
+    stmt = select(func.coalesce(vaccination.citizen_id, 0), vaccination.vaccine_id, vaccination.dose_number,
+                  _epoch_day(vaccination.vaccination_date, dialect)).where(vaccination.vaccination_date.is_not(None))
+    if params.date_from is not None:
+        stmt = stmt.where(vaccination.vaccination_date >= _bound(params.date_from))
+    if params.date_to is not None:
+        stmt = stmt.where(vaccination.vaccination_date < _bound(params.date_to))
+    if params.vaccine_id is not None:
+        stmt = stmt.where(vaccination.vaccine_id == params.vaccine_id)
+    return stmt.execution_options(stream_results=True, yield_per=ANALYTICS_BATCH_SIZE)
+
+
+POPULATION = select(func.count()).select_from(models.User).where(models.User.role == "citizen")
+
+
+def load(db, params: AnalyticsParams) -> VaccinationColumns:
+    conn = db.connection()
+    population = conn.scalar(POPULATION)
+    result = conn.execute(vaccination_statement(conn.dialect.name, params))
+    return VaccinationColumns.from_partitions(result.partitions(), population)
+
+
+async def load_async(db, params: AnalyticsParams) -> VaccinationColumns:
+    conn = await db.connection()
+    population = await conn.scalar(POPULATION)
+    result = await conn.stream(vaccination_statement(conn.dialect.name, params))
+    return VaccinationColumns.from_partitions([rows async for rows in result.partitions()], population)
+
+
+# --------------------------
+# ARRAY HELPERS
+# --------------------------
+def _pack(*columns):
+    """One int64 per row that sorts like the tuple of ``columns`` (integer arrays, most significant first).
+
+    Each column takes the bits its value range needs; when they add up to more
+    than 63, dense ranks from a lexsort stand in for the packed key.
+    """
+    size = len(columns[0])
+    lows = [int(column.min()) if size else 0 for column in columns]
+    widths = [(int(column.max()) - low).bit_length() if size else 0 for column, low in zip(columns, lows)]
+    if sum(widths) > 63:
+        order = np.lexsort(columns[::-1])
+        ranks = np.empty(size, np.int64)
+        ranks[order] = np.cumsum(_starts(*(column[order] for column in columns)))
+        return ranks
+    packed = np.zeros(size, np.int64)
+    for column, low, width in zip(columns, lows, widths):
+        packed = (packed << width) | (column.astype(np.int64) - low)
+    return packed
+
+
+def _argsort(key):
+    """Stable argsort of a non-negative int64 key.
+
+    When the key leaves room for a row number in its low bits, sorting
+    ``key << bits | row`` and keeping the low bits is several times faster
+    than ``np.argsort``.
+    """
+    bits = max(len(key) - 1, 0).bit_length()
+    if len(key) and int(key.max()) < 1 << (63 - bits):
+        return np.sort((key << bits) | np.arange(len(key))) & ((1 << bits) - 1)
+    return np.argsort(key, kind="stable")
+
+
+def _starts(*columns):
+    """True on each row that starts a new run of equal keys (``columns`` already sorted)."""
+    starts = np.ones(len(columns[0]), bool)
+    starts[1:] = False
+    for column in columns:
+        starts[1:] |= column[1:] != column[:-1]
+    return starts
+
+
+def _run_heads(starts):
+    """For every row, the index of the row that starts its run."""
+    return np.maximum.accumulate(np.where(starts, np.arange(len(starts)), 0))
+
+
+def _group_by(*columns):
+    """Groups of equal keys in key order: a row of each group, every row's group, the group sizes."""
+    key = _pack(*columns)
+    if len(key) and int(key.max()) < 4 * len(key):
+        # Few possible keys (vaccine x month x dose): count into an array instead of sorting.
+        counts = np.bincount(key)
+        present = np.flatnonzero(counts)
+        groups = np.zeros(len(counts), np.int64)
+        groups[present] = np.arange(len(present))
+        inverse = groups[key]
+        rows = np.zeros(len(present), np.int64)
+        rows[inverse] = np.arange(len(key))  # any row of the group will do
+        return rows, inverse, counts[present]
+    _, rows, inverse, counts = np.unique(key, return_index=True, return_inverse=True, return_counts=True)
+    return rows, inverse.reshape(-1), counts
+
+
+def _group_quantiles(groups, values, count: int, quantiles):
+    """Per group (0..count-1), the lower nearest-rank quantiles of ``values``; null for empty groups."""
+    order = _argsort(_pack(groups, values))
+    values = values[order]
+    sizes = np.bincount(groups, minlength=count)
+    offsets = np.cumsum(sizes) - sizes
+    present = sizes > 0
+    columns = []
+    for quantile in quantiles:
+        picked = np.zeros(count, values.dtype)
+        picked[present] = values[offsets[present] + ((sizes[present] - 1) * quantile).astype(np.int64)]
+        columns.append(pa.array(picked, mask=~present))
+    return columns
+
+
+def _months(days):
+    """Months since 1970-01 of days since 1970-01-01 (converted once per distinct day)."""
+    if not len(days):
+        return days.astype(np.int32)
+    low = int(days.min())
+    span = np.arange(low, int(days.max()) + 1).astype("datetime64[D]")
+    return span.astype("datetime64[M]").astype(np.int32)[days - low]
+
+
+def _month_labels(months):
+    return pa.array(np.datetime_as_string(months.astype("datetime64[M]")))
+
+
+def _dates(days, mask=None):
+    return pa.array(days.astype(np.int32), pa.int32(), mask=mask).cast(pa.date32())
+
+
+def _reached(data: VaccinationColumns):
+    """Row indices of the first vaccination per citizen, vaccine and dose, sorted by those three.
+
+    Repeated records of the same dose count once, on their earliest day;
+    vaccinations without a citizen are left out.
+    """
+    known = np.flatnonzero(data.citizen_id != 0)
+    dose_key = _pack(data.citizen_id[known], data.vaccine_id[known], data.dose_number[known])
+    order = _argsort(_pack(dose_key, data.day[known]))
+    return known[order][_starts(dose_key[order])]
+
+
+class _Series:
+    """The doses each citizen reached of each vaccine, one run of rows per (citizen, vaccine) series.
+
+    ``heads``/``tails`` index the lowest and highest dose of every series.
+    """
+
+    def __init__(self, data: VaccinationColumns):
+        self.reached = data.take(_reached(data))
+        self.starts = _starts(self.reached.citizen_id, self.reached.vaccine_id)
+        self.heads = np.flatnonzero(self.starts)
+        self.tails = np.append(self.heads[1:], len(self.starts)) - 1 if len(self.heads) else self.heads
+        self.series = np.cumsum(self.starts) - 1  # per reached row, its (citizen, vaccine) series
+
+
+# --------------------------
+# REPORTS
+# --------------------------
+def coverage(data: VaccinationColumns, as_of: date) -> pa.Table:
+    reached = np.zeros(len(data), bool)
+    reached[_reached(data)] = True
+    months = _months(data.day)
+    rows, inverse, doses = _group_by(data.vaccine_id, months, data.dose_number)
+    citizens = np.bincount(inverse, weights=reached, minlength=len(rows)).astype(np.int64)
+    vaccine, month, dose = data.vaccine_id[rows], months[rows], data.dose_number[rows]
+    # running total of citizens per vaccine and dose, month after month
+    order = _argsort(_pack(vaccine, dose, month))
+    totals = np.cumsum(citizens[order])
+    heads = _run_heads(_starts(vaccine[order], dose[order]))
+    cumulative = np.empty_like(citizens)
+    cumulative[order] = totals - totals[heads] + citizens[order][heads]
+    share = cumulative / data.population if data.population else np.zeros(len(rows))
+    return pa.table({
+        "vaccine_id": vaccine, "month": _month_labels(month), "dose_number": dose, "doses": doses,
+        "citizens": citizens, "cumulative_citizens": cumulative,
+        "coverage": pa.array(share, mask=np.full(len(rows), not data.population)),
+    })
+
+
+def progression(data: VaccinationColumns, as_of: date) -> pa.Table:
+    series = _Series(data)
+    reached = series.reached
+    last = np.ones(len(reached), bool)
+    last[:-1] = series.starts[1:]
+    # days from dose n-1 to dose n within the same series
+    consecutive = np.zeros(len(reached), bool)
+    consecutive[1:] = ~series.starts[1:] & (reached.dose_number[1:] == reached.dose_number[:-1] + 1)
+    gaps = np.zeros(len(reached), np.int32)
+    gaps[1:] = reached.day[1:] - reached.day[:-1]
+    rows, inverse, citizens = _group_by(reached.vaccine_id, reached.dose_number)
+    stopped = np.bincount(inverse, weights=last, minlength=len(rows)).astype(np.int64)
+    median, p90 = _group_quantiles(inverse[consecutive], gaps[consecutive], len(rows), (0.5, 0.9))
+    return pa.table({
+        "vaccine_id": reached.vaccine_id[rows], "dose_number": reached.dose_number[rows],
+        "citizens": citizens, "stopped": stopped,
+        "median_days_since_previous": median, "p90_days_since_previous": p90,
+    })
+
+
+def cohorts(data: VaccinationColumns, as_of: date) -> pa.Table:
+    series = _Series(data)
+    reached = series.reached
+    # a series joins the cohort of its first dose's month; series not starting at dose 1 are left out
+    started = (reached.dose_number[series.heads] == 1)[series.series]
+    cohort = _months(reached.day[series.heads])[series.series][started]
+    vaccine, dose = reached.vaccine_id[started], reached.dose_number[started]
+    rows, _, citizens = _group_by(vaccine, cohort, dose)
+    vaccine, cohort, dose = vaccine[rows], cohort[rows], dose[rows]
+    # dose 1 opens every (vaccine, cohort) run: its count is the cohort size
+    size = citizens[_run_heads(_starts(vaccine, cohort))]
+    return pa.table({
+        "vaccine_id": vaccine, "cohort": _month_labels(cohort), "dose_number": dose,
+        "citizens": citizens, "share": citizens / np.maximum(size, 1),
+    })
+
+
+def _citizen_series(data: VaccinationColumns):
+    series = _Series(data)
+    reached, heads, tails = series.reached, series.heads, series.tails
+    last_dose = reached.dose_number[tails]
+    complete = last_dose >= DOSE_SERIES_LENGTH
+    return {
+        "citizen_id": reached.citizen_id[heads], "vaccine_id": reached.vaccine_id[heads],
+        "doses": (tails - heads + 1).astype(np.int32), "last_dose_number": last_dose,
+        "first_dose_day": reached.day[heads], "last_dose_day": reached.day[tails],
+        "next_dose_day": reached.day[tails] + DOSE_INTERVAL_DAYS, "complete": complete,
+    }
+
+
+def citizens(data: VaccinationColumns, as_of: date) -> pa.Table:
+    rows = _citizen_series(data)
+    return pa.table({
+        "citizen_id": rows["citizen_id"], "vaccine_id": rows["vaccine_id"], "doses": rows["doses"],
+        "last_dose_number": rows["last_dose_number"], "first_dose_date": _dates(rows["first_dose_day"]),
+        "last_dose_date": _dates(rows["last_dose_day"]),
+        "next_dose_due": _dates(rows["next_dose_day"], mask=rows["complete"]),
+    })
+
+
+def due(data: VaccinationColumns, as_of: date) -> pa.Table:
+    """Series still missing doses whose next one was due by ``as_of``, longest overdue first."""
+    rows = _citizen_series(data)
+    cutoff = (as_of - EPOCH).days
+    selected = np.flatnonzero(~rows["complete"] & (rows["next_dose_day"] <= cutoff))
+    selected = selected[_argsort(_pack(rows["next_dose_day"][selected]))]
+    return pa.table({
+        "citizen_id": rows["citizen_id"][selected], "vaccine_id": rows["vaccine_id"][selected],
+        "last_dose_number": rows["last_dose_number"][selected],
+        "last_dose_date": _dates(rows["last_dose_day"][selected]),
+        "next_dose_due": _dates(rows["next_dose_day"][selected]),
+        "overdue_days": (cutoff - rows["next_dose_day"][selected]).astype(np.int32),
+    })
+
+
+REPORTS = {"coverage": coverage, "progression": progression, "cohorts": cohorts, "citizens": citizens, "due": due}
+# One row per citizen and vaccine: JSON responses are cut at ``limit`` rows.
+PER_CITIZEN_REPORTS = ("citizens", "due")
+REPORT_PATTERN = f"^({'|'.join(REPORTS)})$"
+
+
+# --------------------------
+# OUTPUT
+# --------------------------
+def encode(table: pa.Table, fmt: str) -> bytes:
+    if fmt == "parquet":
+        buffer = pa.BufferOutputStream()
+        pq.write_table(table, buffer, compression="zstd")
+        return buffer.getvalue().to_pybytes()
+    if fmt == "arrow":
+        buffer = pa.BufferOutputStream()
+        with pa.ipc.new_stream(buffer, table.schema) as writer:
+            writer.write_table(table)
+        return buffer.getvalue().to_pybytes()
+    return orjson.dumps(table.to_pylist())
+
+
+def report_response(name: str, data: VaccinationColumns, params: AnalyticsParams) -> Response:
+    table = REPORTS[name](data, params.as_of)
+    headers = {}
+    if params.format == "json" and name in PER_CITIZEN_REPORTS:
+        headers[TOTAL_COUNT_HEADER] = str(table.num_rows)
+        table = table.slice(0, params.limit)
+    elif params.format != "json":
+        headers["Content-Disposition"] = f'attachment; filename="{name}.{EXTENSIONS[params.format]}"'
+    return Response(encode(table, params.format), media_type=MEDIA_TYPES[params.format], headers=headers)
+
+
+# --------------------------
+# CLI
+# --------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Compute a vaccination analytics report")
+    parser.add_argument("report", choices=list(REPORTS))
+    parser.add_argument("--format", choices=ANALYTICS_FORMATS, default="parquet")
+    parser.add_argument("--from", dest="date_from", type=date.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=date.fromisoformat)
+    parser.add_argument("--vaccine-id", type=int)
+    parser.add_argument("--as-of", type=date.fromisoformat)
+    parser.add_argument("-o", "--output", help="default: stdout")
+    args = parser.parse_args(argv)
+    from .database import SessionLocal
+
+    params = AnalyticsParams(args.format, args.date_from, args.date_to, args.vaccine_id, args.as_of, MAX_PAGE_SIZE)
+    db = SessionLocal()
+    try:
+        table = REPORTS[args.report](load(db, params), params.as_of)
+    finally:
+        db.close()
+    body = encode(table, args.format)
+    if args.output:
+        with open(args.output, "wb") as out:
+            out.write(body)
+    else:
+        sys.stdout.buffer.write(body)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+import os
+from collections import Counter
+
+from fastapi import HTTPException
+from sqlalchemy import select, update
+from sqlalchemy.orm import Session
+from . import events, models, schemas, slots, stats
+
+# --------------------------
+# SETTINGS
+# --------------------------
+# Largest id list accepted by one batch; filters are not capped.
+APPOINTMENT_BATCH_MAX_IDS = int(os.getenv("APPOINTMENT_BATCH_MAX_IDS", "5000"))
+
+APPOINTMENT_STATUSES = ("pending", "approved", "rejected")
+
+# Target status -> statuses an appointment may be moved from. A decision can be
+# revised, but nothing goes back to pending in bulk.
+STATUS_TRANSITIONS = {
+    "approved": ("pending", "rejected"),
+    "rejected": ("pending", "approved"),
+}
+
+
+# --------------------------
+# BATCH TRANSITION
+# --------------------------
+def _batch_filter(batch: schemas.AppointmentStatusBatch, sources):
+    conditions = []
+    if batch.vaccine_id is not None:
+        conditions.append(models.Appointment.vaccine_id == batch.vaccine_id)
+    if batch.date_from is not None:
+        conditions.append(models.Appointment.preferred_date >= batch.date_from)
+    if batch.date_to is not None:
+        conditions.append(models.Appointment.preferred_date < batch.date_to)
+    if batch.current_status is not None and batch.current_status not in sources:
+        raise HTTPException(status_code=400,
+                            detail=f"Cannot move {batch.current_status} appointments to {batch.status}")
+    return conditions
+
+
+def apply_status_batch(db: Session, batch: schemas.AppointmentStatusBatch, admin_id: int):
+    """Move every selected appointment to ``batch.status`` with set-based UPDATE ... RETURNING.
+
+    One UPDATE runs per source status (at most two), so the dashboard
+    rollups and slot counters know what moved; they are adjusted with at
+    most three more statements. Rejections free their places; approving
+    rejected appointments takes places again and raises SlotFull if a slot
+    is full. One INSERT records the citizens' status events. Ids that were
+    not updated cost one more SELECT, to tell missing rows from invalid
+    transitions. The caller commits.
+    """
+    if batch.status not in APPOINTMENT_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    sources = STATUS_TRANSITIONS.get(batch.status)
+    if sources is None:
+        raise HTTPException(status_code=400, detail=f"Appointments cannot be moved to {batch.status} in bulk")
+    has_filter = any(value is not None for value in
+                     (batch.vaccine_id, batch.date_from, batch.date_to, batch.current_status))
+    if (batch.ids is None) == (not has_filter):
+        raise HTTPException(status_code=400, detail="Give either ids or a filter")
+    if batch.ids is not None and len(batch.ids) > APPOINTMENT_BATCH_MAX_IDS:
+        raise HTTPException(status_code=400, detail=f"At most {APPOINTMENT_BATCH_MAX_IDS} ids per batch")
+
+    if batch.ids is not None:
+        ids = list(dict.fromkeys(batch.ids))
+        if not ids:
+            return schemas.AppointmentStatusBatchOut(status=batch.status, updated=0, results=[])
+        conditions = [models.Appointment.id.in_(ids)]
+    else:
+        ids = None
+        conditions = _batch_filter(batch, sources)
+
+    updated, moves, places, notices = set(), Counter(), Counter(), []
+    dialect = db.get_bind().dialect.name
+    for source in [batch.current_status] if batch.current_status else sources:
+        stmt = (
+            update(models.Appointment)
+            .where(*conditions, models.Appointment.status == source)
+            .values(status=batch.status, reason_rejection=batch.reason_rejection, admin_id=admin_id)
+            .returning(models.Appointment.id, models.Appointment.vaccine_id, models.Appointment.preferred_date,
+                       models.Appointment.citizen_id)
+            .execution_options(synchronize_session=False)
+        )
+        for appointment_id, vaccine_id, preferred_date, citizen_id in db.execute(stmt):
+            updated.add(appointment_id)
+            notices.append(events.status_event(appointment_id, citizen_id, batch.status, batch.reason_rejection))
+            moves[stats.appointment_bucket(dialect, vaccine_id, preferred_date, source)] -= 1
+            moves[stats.appointment_bucket(dialect, vaccine_id, preferred_date, batch.status)] += 1
+            for status, sign in ((source, -1), (batch.status, +1)):
+                slot = slots.holding_slot(dialect, vaccine_id, preferred_date, status)
+                if slot is not None:
+                    places[slot] += sign
+    stats.apply_deltas(db.connection(), appointments=moves)
+    slots.adjust(db.connection(), places)
+    events.record(db, notices)
+    results = [schemas.AppointmentStatusResult(id=appointment_id, result="updated", status=batch.status)
+               for appointment_id in sorted(updated)]
+
+    rest = [appointment_id for appointment_id in ids or [] if appointment_id not in updated]
+    if rest:
+        current = dict(db.execute(
+            select(models.Appointment.id, models.Appointment.status).where(models.Appointment.id.in_(rest))
+        ).all())
+        for appointment_id in rest:
+            if appointment_id in current:
+                results.append(schemas.AppointmentStatusResult(
+                    id=appointment_id, result="invalid_transition", status=current[appointment_id]))
+            else:
+                results.append(schemas.AppointmentStatusResult(id=appointment_id, result="not_found"))
+    return schemas.AppointmentStatusBatchOut(status=batch.status, updated=len(updated), results=results)
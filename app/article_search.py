@@ -0,0 +1,117 @@
+import argparse
+import html
+import re
+
+from sqlalchemy import DDL, DateTime, Float, Integer, String, text
+from sqlalchemy.orm import Session
+from .models import ARTICLE_SEARCH_CONFIG, ARTICLE_SEARCH_DDL
+
+SNIPPET_START = "<mark>"
+SNIPPET_STOP = "</mark>"
+# The database marks matches with private-use characters, so the article text
+# around them can be HTML-escaped before the markers become <mark> tags.
+_MATCH_START = "\ue000"
+_MATCH_STOP = "\ue001"
+_MARKED = re.compile(f"{_MATCH_START}([^{_MATCH_START}{_MATCH_STOP}]*){_MATCH_STOP}")
+
+
+class SearchUnavailable(RuntimeError):
+    pass
+
+
+# --------------------------
+# QUERIES
+# --------------------------
+# Rank and paginate on the index first; only the page rows are joined back to
+# the table and get a snippet built (ts_headline re-parses the whole content).
+_POSTGRES_SEARCH = text(f"""
+    SELECT a.id, a.title, a.created_at, hits.rank,
+           ts_headline('{ARTICLE_SEARCH_CONFIG}', a.content, hits.query, :headline_options) AS snippet
+    FROM (
+        SELECT id, ts_rank_cd(search_vector, query) AS rank, query
+        FROM awareness_articles, websearch_to_tsquery('{ARTICLE_SEARCH_CONFIG}', :q) AS query
+        WHERE search_vector @@ query
+        ORDER BY rank DESC, id
+        LIMIT :limit OFFSET :offset
+    ) AS hits
+    JOIN awareness_articles a ON a.id = hits.id
+    ORDER BY hits.rank DESC, a.id
+""")
+
+# FTS5 bm25 is lower-is-better; title matches weigh ten times more than content.
+_SQLITE_SEARCH = text("""
+    SELECT a.id, a.title, a.created_at, -bm25(awareness_articles_fts, 10.0, 1.0) AS rank,
+           snippet(awareness_articles_fts, 1, :start, :stop, '…', 24) AS snippet
+    FROM awareness_articles_fts
+    JOIN awareness_articles a ON a.id = awareness_articles_fts.rowid
+    WHERE awareness_articles_fts MATCH :q
+    ORDER BY bm25(awareness_articles_fts, 10.0, 1.0), a.id
+    LIMIT :limit OFFSET :offset
+""")
+
+_COLUMNS = dict(id=Integer, title=String, created_at=DateTime(timezone=True), rank=Float, snippet=String)
+
+
+def _fts5_query(q: str) -> str:
+    # Quote every term so user input is never parsed as FTS5 syntax; terms are ANDed.
+    terms = re.findall(r"\w+", q)
+    return " ".join('"%s"' % term for term in terms)
+
+
+def search_articles(db: Session, q: str, limit: int, offset: int = 0):
+    """Ranked page of articles matching ``q``: dicts of id, title, created_at, rank and the HTML snippet."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        options = f"StartSel={_MATCH_START}, StopSel={_MATCH_STOP}, MaxFragments=2, MaxWords=30, MinWords=10"
+        stmt = _POSTGRES_SEARCH.columns(**_COLUMNS)
+        params = {"q": q, "headline_options": options}
+    elif dialect == "sqlite":
+        q = _fts5_query(q)
+        if not q:
+            return []
+        stmt = _SQLITE_SEARCH.columns(**_COLUMNS)
+        params = {"q": q, "start": _MATCH_START, "stop": _MATCH_STOP}
+    else:
+        raise SearchUnavailable(f"Article search is not available on {dialect}")
+    rows = db.execute(stmt, {**params, "limit": limit, "offset": offset}).all()
+    return [{**row._asdict(), "snippet": highlight(row.snippet)} for row in rows]
+
+
+def highlight(snippet: str) -> str:
+    """HTML: the article text escaped, only the matched terms wrapped in <mark></mark>."""
+    marked = _MARKED.sub(lambda match: SNIPPET_START + match.group(1) + SNIPPET_STOP, html.escape(snippet or ""))
+    return marked.replace(_MATCH_START, "").replace(_MATCH_STOP, "")  # strays, e.g. typed into an article
+
+
+# --------------------------
+# INDEX MAINTENANCE
+# --------------------------
+def rebuild_index(db: Session):
+    """Create any missing search objects and re-index existing articles."""
+    dialect = db.get_bind().dialect.name
+    for statement in ARTICLE_SEARCH_DDL.get(dialect, []):
+        db.execute(DDL(statement))
+    if dialect == "sqlite":
+        db.execute(text("INSERT INTO awareness_articles_fts (awareness_articles_fts) VALUES ('rebuild')"))
+    db.commit()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the awareness article search index")
+    parser.add_argument("--rebuild", action="store_true",
+                        help="create missing search objects and re-index every article")
+    args = parser.parse_args(argv)
+    if not args.rebuild:
+        parser.print_help()
+        return
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        rebuild_index(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Depends, Path
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import analytics
+from ..analytics import AnalyticsParams
+from ..utils import get_async_db, require_admin_async, Principal
+from ..admission import admission
+from ..query_budget import query_budget
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# Vaccinations are read as column batches and aggregated with NumPy (see app/analytics.py).
+
+# GET a coverage report as JSON, Parquet or Arrow (admin only)
+# The array work runs in the threadpool, off the event loop.
+@router.get("/{report}", dependencies=[admission("bulk"), query_budget(3)])
+async def get_report(report: str = Path(pattern=analytics.REPORT_PATTERN), params: AnalyticsParams = Depends(),
+                     db: AsyncSession = Depends(get_async_db), admin: Principal = Depends(require_admin_async)):
+    data = await analytics.load_async(db, params)
+    return await run_in_threadpool(analytics.report_response, report, data, params)
@@ -0,0 +1,121 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from .. import exports, models, projections, schemas
+from ..appointment_status import apply_status_batch
+from ..utils import get_async_db, require_admin_async, require_citizen_async, Principal
+from ..pagination import TOTAL_COUNT_HEADER, PageParams, paginate_async
+from ..loaders import eager
+from ..admission import admission
+from ..query_budget import query_budget
+from ..exports import ExportParams
+from ..conditional import conditional, latest, make_etag
+from ..vaccine_catalog import vaccine_catalog
+
+router = APIRouter(prefix="/appointments", tags=["Appointments"])
+
+# Relationships serialized by AppointmentOut
+LOAD_OPTIONS = eager(joinedload(models.Appointment.vaccine))
+
+
+async def _load(db: AsyncSession, appointment_id: int):
+    return await db.scalar(
+        select(models.Appointment).options(*LOAD_OPTIONS)
+        .where(models.Appointment.id == appointment_id)
+        .execution_options(populate_existing=True)
+    )
+
+# GET all appointments
+@router.get("/", response_model=list[schemas.AppointmentOut], dependencies=[query_budget(1)])
+async def get_appointments(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_async_db)):
+    return await paginate_async(db, projections.APPOINTMENTS, page, response)
+
+# HEAD all appointments: row count in X-Total-Count, no body
+@router.head("/", dependencies=[query_budget(1)])
+async def count_appointments(db: AsyncSession = Depends(get_async_db)):
+    total = await db.scalar(select(func.count(models.Appointment.id)))
+    return Response(status_code=200, headers={TOTAL_COUNT_HEADER: str(total)})
+
+# GET export (admin only), declared before /{appointment_id}
+# Column tuples streamed from a server-side cursor; no ORM objects are built.
+@router.get("/export", dependencies=[admission("bulk"), query_budget(2)])
+async def export_appointments(params: ExportParams = Depends(), db: AsyncSession = Depends(get_async_db),
+                              admin: Principal = Depends(require_admin_async)):
+    stmt, names = exports.export_statement(exports.APPOINTMENTS, params)
+    return exports.export_response(exports.iter_export_async(db, stmt, names, params.format), exports.APPOINTMENTS, params)
+
+# HEAD appointment: EXISTS probe on the primary key, the row is never loaded
+@router.head("/{appointment_id}", dependencies=[query_budget(1)])
+async def head_appointment(appointment_id: int, db: AsyncSession = Depends(get_async_db)):
+    found = await db.scalar(select(exists().where(models.Appointment.id == appointment_id)))
+    if not found:
+        raise HTTPException(status_code=404)
+    return Response(status_code=200)
+
+# GET appointment by ID
+@router.get("/{appointment_id}", response_model=schemas.AppointmentOut, dependencies=[query_budget(1)])
+async def get_appointment(appointment_id: int, request: Request, response: Response,
+                          db: AsyncSession = Depends(get_async_db)):
+    appointment = await _load(db, appointment_id)
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    last_modified = latest(appointment.updated_at, appointment.vaccine.updated_at if appointment.vaccine else None)
+    not_modified = conditional(request, response, make_etag("appointment", appointment_id, last_modified), last_modified)
+    if not_modified:
+        return not_modified
+    return appointment
+
+# POST appointment (citizen only)
+@router.post("/", response_model=schemas.AppointmentOut, dependencies=[admission("booking"), query_budget(7)])
+async def create_appointment(appointment: schemas.AppointmentCreate, db: AsyncSession = Depends(get_async_db),
+                             citizen: Principal = Depends(require_citizen_async)):
+    if appointment.citizen_id != citizen.id:
+        raise HTTPException(status_code=403, detail="You can only book for yourself")
+    vaccine = await vaccine_catalog.get_async(db, appointment.vaccine_id)
+    if not vaccine:
+        raise HTTPException(status_code=404, detail="Vaccine not found")
+    new_appointment = models.Appointment(**appointment.dict())
+    db.add(new_appointment)
+    await db.commit()
+    return await _load(db, new_appointment.id)
+
+# PATCH many appointment statuses (admin only)
+# Set-based UPDATE ... RETURNING per source status, one rollup upsert, up to two
+# slot statements, one event INSERT and one SELECT to explain ids left
+# untouched: constant whatever the batch size.
+@router.patch("/status", response_model=schemas.AppointmentStatusBatchOut, dependencies=[admission("bulk"), query_budget(8)])
+async def update_appointment_statuses(batch: schemas.AppointmentStatusBatch, db: AsyncSession = Depends(get_async_db),
+                                      admin: Principal = Depends(require_admin_async)):
+    result = await db.run_sync(apply_status_batch, batch, admin.id)
+    await db.commit()
+    return result
+
+# PATCH appointment status (admin only)
+@router.patch("/{appointment_id}/status", response_model=schemas.AppointmentOut, dependencies=[query_budget(6)])
+async def update_appointment_status(appointment_id: int, status: str, reason_rejection: str = None,
+                                    db: AsyncSession = Depends(get_async_db),
+                                    admin: Principal = Depends(require_admin_async)):
+    appointment = await _load(db, appointment_id)
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    if status not in ["pending", "approved", "rejected"]:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    appointment.status = status
+    appointment.reason_rejection = reason_rejection
+    appointment.admin_id = admin.id
+    await db.commit()
+    return await _load(db, appointment_id)
+
+# DELETE appointment (citizen or admin), with its vaccination (session cascade)
+@router.delete("/{appointment_id}", status_code=204, dependencies=[query_budget(8)])
+async def delete_appointment(appointment_id: int, db: AsyncSession = Depends(get_async_db),
+                             user: Principal = Depends(require_citizen_async)):
+    appointment = await db.get(models.Appointment, appointment_id)
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    if user.role == "citizen" and appointment.citizen_id != user.id:
+        raise HTTPException(status_code=403, detail="You cannot delete this appointment")
+    await db.delete(appointment)
+    await db.commit()
+    return Response(status_code=204)
@@ -0,0 +1,31 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import schemas, slots
+from ..utils import get_async_db, require_admin_async, Principal
+from ..query_budget import query_budget
+from ..vaccine_catalog import vaccine_catalog
+
+router = APIRouter(prefix="/slots", tags=["Appointment Slots"])
+
+# Places per vaccine and day; bookings take them with a conditional increment (see app/slots.py).
+
+# GET slots with capacity and booked places (admin only)
+@router.get("/", response_model=list[schemas.AppointmentSlotOut], dependencies=[query_budget(1)])
+async def get_slots(vaccine_id: Optional[int] = None, date_from: Optional[date] = None,
+                    date_to: Optional[date] = None, db: AsyncSession = Depends(get_async_db),
+                    admin: Principal = Depends(require_admin_async)):
+    return await db.run_sync(slots.list_slots, vaccine_id, date_from, date_to)
+
+# PUT slot capacity (admin only)
+@router.put("/{vaccine_id}/{day}", response_model=schemas.AppointmentSlotOut, dependencies=[query_budget(3)])
+async def set_slot_capacity(vaccine_id: int, day: date, body: schemas.AppointmentSlotCapacity,
+                            db: AsyncSession = Depends(get_async_db),
+                            admin: Principal = Depends(require_admin_async)):
+    if not await vaccine_catalog.get_async(db, vaccine_id):
+        raise HTTPException(status_code=404, detail="Vaccine not found")
+    slot = await db.run_sync(slots.set_capacity, vaccine_id, day, body.capacity)
+    await db.commit()
+    return slot
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import OAuth2PasswordRequestForm
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, schemas
+from ..utils import get_primary_async_db, verify_and_update_password_async
+from ..auth_handler import create_access_token
+from ..admission import admission
+from ..query_budget import query_budget
+
+router = APIRouter(prefix="/auth", tags=["Authentication"])
+
+
+@router.post("/login", response_model=schemas.Token, dependencies=[admission("auth"), query_budget(2)])
+async def login(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    db: AsyncSession = Depends(get_primary_async_db)
+):
+    user = (await db.execute(select(models.User.id, models.User.password_hash, models.User.role).where(
+        models.User.email == form_data.username
+    ))).first()
+    # End the read transaction: the connection goes back to the pool while PBKDF2 runs.
+    await db.rollback()
+
+    valid, new_hash = (await verify_and_update_password_async(form_data.password, user.password_hash)
+                       if user else (False, None))
+    if not valid:
+        raise HTTPException(status_code=400, detail="Invalid credentials")
+
+    # Rehash with the current PASSWORD_HASH_ROUNDS
+    if new_hash:
+        await db.execute(update(models.User).where(models.User.id == user.id).values(password_hash=new_hash))
+        await db.commit()
+
+    token = create_access_token({"user_id": user.id, "role": user.role})
+    return {"access_token": token, "token_type": "bearer"}
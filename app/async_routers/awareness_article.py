@@ -0,0 +1,131 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from .. import article_search, models, projections, schemas
+from ..utils import get_async_db, require_admin_async, Principal
+from ..pagination import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, PageParams,
+                          decode_cursor, encode_cursor, paginate_async)
+from ..loaders import eager
+from ..query_budget import query_budget
+from ..conditional import conditional, is_conditional, latest, make_etag
+from ..versions import bump_version, read_version
+
+router = APIRouter(prefix="/articles", tags=["AwarenessArticles"])
+
+# Relationships serialized by AwarenessArticleOut
+LOAD_OPTIONS = eager(joinedload(models.AwarenessArticle.author))
+# catalog_versions row bumped by every article write; drives the list ETag.
+VERSION_NAME = "articles"
+
+
+async def _load(db: AsyncSession, article_id: int):
+    return await db.scalar(
+        select(models.AwarenessArticle).options(*LOAD_OPTIONS)
+        .where(models.AwarenessArticle.id == article_id)
+        .execution_options(populate_existing=True)
+    )
+
+
+def _article_validators(article_id: int, article_updated_at, author_updated_at):
+    last_modified = latest(article_updated_at, author_updated_at)
+    return make_etag("article", article_id, last_modified), last_modified
+
+# GET all articles
+@router.get("/", response_model=list[schemas.AwarenessArticleOut], dependencies=[query_budget(2)])
+async def get_articles(request: Request, response: Response, page: PageParams = Depends(),
+                       db: AsyncSession = Depends(get_async_db)):
+    version, updated_at = await db.run_sync(read_version, VERSION_NAME)
+    etag = make_etag(VERSION_NAME, version, page.after_id, page.limit, page.stream, page.ids)
+    not_modified = conditional(request, response, etag, updated_at)
+    if not_modified:
+        return not_modified
+    return await paginate_async(db, projections.ARTICLES, page, response)
+
+# HEAD all articles: row count in X-Total-Count, no body
+@router.head("/", dependencies=[query_budget(1)])
+async def count_articles(db: AsyncSession = Depends(get_async_db)):
+    total = await db.scalar(select(func.count(models.AwarenessArticle.id)))
+    return Response(status_code=200, headers={TOTAL_COUNT_HEADER: str(total)})
+
+# GET search articles (ranked full-text search, declared before /{article_id})
+# The cursor is the offset of the next page: ranked results have no stable keyset.
+@router.get("/search", response_model=list[schemas.AwarenessArticleSearchHit], dependencies=[query_budget(1)])
+async def search_articles(response: Response, q: str = Query(..., min_length=1, max_length=200),
+                          cursor: Optional[str] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                          db: AsyncSession = Depends(get_async_db)):
+    offset = max(decode_cursor(cursor, "offset")["offset"], 0) if cursor else 0
+    hits = await db.run_sync(article_search.search_articles, q, limit + 1, offset)
+    if len(hits) > limit:
+        hits = hits[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"offset": offset + limit})
+    return hits
+
+# HEAD article: EXISTS probe on the primary key, the row is never loaded
+@router.head("/{article_id}", dependencies=[query_budget(1)])
+async def head_article(article_id: int, db: AsyncSession = Depends(get_async_db)):
+    found = await db.scalar(select(exists().where(models.AwarenessArticle.id == article_id)))
+    if not found:
+        raise HTTPException(status_code=404)
+    return Response(status_code=200)
+
+# GET article by ID
+# Revalidation reads only the timestamps, so a 304 never loads the article content.
+@router.get("/{article_id}", response_model=schemas.AwarenessArticleOut, dependencies=[query_budget(2)])
+async def get_article(article_id: int, request: Request, response: Response,
+                      db: AsyncSession = Depends(get_async_db)):
+    if is_conditional(request):
+        stamps = (await db.execute(
+            select(models.AwarenessArticle.updated_at, models.User.updated_at)
+            .outerjoin(models.AwarenessArticle.author).where(models.AwarenessArticle.id == article_id)
+        )).first()
+        not_modified = stamps and conditional(request, response, *_article_validators(article_id, *stamps))
+        if not_modified:
+            return not_modified
+    article = await _load(db, article_id)
+    if not article:
+        raise HTTPException(status_code=404, detail="Article not found")
+    author_updated_at = article.author.updated_at if article.author else None
+    not_modified = conditional(request, response,
+                               *_article_validators(article_id, article.updated_at, author_updated_at))
+    if not_modified:
+        return not_modified
+    return article
+
+# POST article (admin only)
+@router.post("/", response_model=schemas.AwarenessArticleOut, dependencies=[query_budget(4)])
+async def create_article(article: schemas.AwarenessArticleBase, db: AsyncSession = Depends(get_async_db),
+                         admin: Principal = Depends(require_admin_async)):
+    new_article = models.AwarenessArticle(**article.dict(), created_by=admin.id)
+    db.add(new_article)
+    await db.run_sync(bump_version, VERSION_NAME)
+    await db.commit()
+    return await _load(db, new_article.id)
+
+# PATCH article (admin only)
+@router.patch("/{article_id}", response_model=schemas.AwarenessArticleOut, dependencies=[query_budget(5)])
+async def update_article(article_id: int, article: schemas.AwarenessArticleBase,
+                         db: AsyncSession = Depends(get_async_db),
+                         admin: Principal = Depends(require_admin_async)):
+    db_article = await _load(db, article_id)
+    if not db_article:
+        raise HTTPException(status_code=404, detail="Article not found")
+    for key, value in article.dict(exclude_unset=True).items():
+        setattr(db_article, key, value)
+    await db.run_sync(bump_version, VERSION_NAME)
+    await db.commit()
+    return await _load(db, article_id)
+
+# DELETE article (admin only)
+@router.delete("/{article_id}", status_code=204, dependencies=[query_budget(4)])
+async def delete_article(article_id: int, db: AsyncSession = Depends(get_async_db),
+                         admin: Principal = Depends(require_admin_async)):
+    article = await db.get(models.AwarenessArticle, article_id)
+    if not article:
+        raise HTTPException(status_code=404, detail="Article not found")
+    await db.delete(article)
+    await db.run_sync(bump_version, VERSION_NAME)
+    await db.commit()
+    return Response(status_code=204)
@@ -0,0 +1,25 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import schemas, stats
+from ..utils import get_async_db, require_admin_async, Principal
+from ..query_budget import query_budget
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+# Dashboard reads come from rollup rows maintained on every write: O(buckets), not O(rows).
+
+# GET appointments per vaccine, day and status (admin only)
+@router.get("/appointments", response_model=list[schemas.AppointmentDayStatsOut], dependencies=[query_budget(1)])
+async def get_appointment_stats(vaccine_id: Optional[int] = None, date_from: Optional[date] = None,
+                                date_to: Optional[date] = None, db: AsyncSession = Depends(get_async_db),
+                                admin: Principal = Depends(require_admin_async)):
+    return await db.run_sync(stats.appointment_stats, vaccine_id, date_from, date_to)
+
+# GET doses administered per vaccine (admin only)
+@router.get("/vaccinations", response_model=list[schemas.VaccineDoseStatsOut], dependencies=[query_budget(1)])
+async def get_dose_stats(vaccine_id: Optional[int] = None, db: AsyncSession = Depends(get_async_db),
+                         admin: Principal = Depends(require_admin_async)):
+    return await db.run_sync(stats.dose_stats, vaccine_id)
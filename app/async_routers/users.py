@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, HTTPException, Response
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models
+from .. import projections
+from .. import schemas
+from ..utils import hash_password_async, get_async_db
+from ..pagination import TOTAL_COUNT_HEADER, PageParams, paginate_async
+from ..admission import admission
+from ..query_budget import query_budget
+
+router = APIRouter(prefix="/users", tags=["Users"])
+
+
+# =========================
+# REGISTER USER
+# =========================
+@router.post("/register", response_model=schemas.UserOut, dependencies=[admission("auth"), query_budget(3)])
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+
+    existing_user = await db.scalar(select(models.User).where(models.User.email == user.email))
+    if existing_user:
+        raise HTTPException(status_code=400, detail="Email already registered")
+
+    hashed_pass = await hash_password_async(user.password)
+
+    new_user = models.User(
+        full_name=user.full_name,
+        email=user.email,
+        password_hash=hashed_pass
+    )
+
+    db.add(new_user)
+    await db.commit()
+    await db.refresh(new_user)
+
+    return new_user
+
+
+# =========================
+# GET ALL USERS (Admin later)
+# =========================
+@router.get("/", response_model=list[schemas.UserOut], dependencies=[query_budget(1)])
+async def get_users(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_async_db)):
+    return await paginate_async(db, projections.USERS, page, response)
+
+# HEAD all users: row count in X-Total-Count, no body
+@router.head("/", dependencies=[query_budget(1)])
+async def count_users(db: AsyncSession = Depends(get_async_db)):
+    total = await db.scalar(select(func.count(models.User.id)))
+    return Response(status_code=200, headers={TOTAL_COUNT_HEADER: str(total)})
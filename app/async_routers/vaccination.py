@@ -0,0 +1,124 @@
+import io
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import exists, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from .. import exports, models, projections, schemas, vaccination_import
+from ..utils import get_async_db, require_admin_async, Principal
+from ..pagination import TOTAL_COUNT_HEADER, PageParams, paginate_async
+from ..loaders import eager
+from ..admission import admission
+from ..query_budget import query_budget
+from ..exports import ExportParams
+from ..conditional import conditional, latest, make_etag
+
+router = APIRouter(prefix="/vaccinations", tags=["Vaccinations"])
+
+# Relationships serialized by VaccinationOut
+LOAD_OPTIONS = eager(joinedload(models.Vaccination.vaccine))
+
+
+async def _load(db: AsyncSession, vaccination_id: int):
+    return await db.scalar(
+        select(models.Vaccination).options(*LOAD_OPTIONS)
+        .where(models.Vaccination.id == vaccination_id)
+        .execution_options(populate_existing=True)
+    )
+
+# GET all vaccinations
+@router.get("/", response_model=list[schemas.VaccinationOut], dependencies=[query_budget(1)])
+async def get_vaccinations(response: Response, page: PageParams = Depends(), db: AsyncSession = Depends(get_async_db)):
+    return await paginate_async(db, projections.VACCINATIONS, page, response)
+
+# HEAD all vaccinations: row count in X-Total-Count, no body
+@router.head("/", dependencies=[query_budget(1)])
+async def count_vaccinations(db: AsyncSession = Depends(get_async_db)):
+    total = await db.scalar(select(func.count(models.Vaccination.id)))
+    return Response(status_code=200, headers={TOTAL_COUNT_HEADER: str(total)})
+
+# GET export (admin only), declared before /{vaccination_id}
+# Column tuples streamed from a server-side cursor; no ORM objects are built.
+@router.get("/export", dependencies=[admission("bulk"), query_budget(2)])
+async def export_vaccinations(params: ExportParams = Depends(), db: AsyncSession = Depends(get_async_db),
+                              admin: Principal = Depends(require_admin_async)):
+    stmt, names = exports.export_statement(exports.VACCINATIONS, params)
+    return exports.export_response(exports.iter_export_async(db, stmt, names, params.format), exports.VACCINATIONS, params)
+
+# HEAD vaccination: EXISTS probe on the primary key, the row is never loaded
+@router.head("/{vaccination_id}", dependencies=[query_budget(1)])
+async def head_vaccination(vaccination_id: int, db: AsyncSession = Depends(get_async_db)):
+    found = await db.scalar(select(exists().where(models.Vaccination.id == vaccination_id)))
+    if not found:
+        raise HTTPException(status_code=404)
+    return Response(status_code=200)
+
+# GET vaccination by ID
+@router.get("/{vaccination_id}", response_model=schemas.VaccinationOut, dependencies=[query_budget(1)])
+async def get_vaccination(vaccination_id: int, request: Request, response: Response,
+                          db: AsyncSession = Depends(get_async_db)):
+    vaccination = await _load(db, vaccination_id)
+    if not vaccination:
+        raise HTTPException(status_code=404, detail="Vaccination not found")
+    last_modified = latest(vaccination.updated_at, vaccination.vaccine.updated_at if vaccination.vaccine else None)
+    not_modified = conditional(request, response, make_etag("vaccination", vaccination_id, last_modified), last_modified)
+    if not_modified:
+        return not_modified
+    return vaccination
+
+# POST vaccination (admin only)
+@router.post("/", response_model=schemas.VaccinationOut, dependencies=[query_budget(5)])
+async def create_vaccination(vaccination: schemas.VaccinationCreate, db: AsyncSession = Depends(get_async_db),
+                             admin: Principal = Depends(require_admin_async)):
+    appointment = await db.get(models.Appointment, vaccination.appointment_id)
+    if not appointment:
+        raise HTTPException(status_code=404, detail="Appointment not found")
+    new_vaccination = models.Vaccination(**vaccination.dict(), admin_id=admin.id)
+    db.add(new_vaccination)
+    await db.commit()
+    return await _load(db, new_vaccination.id)
+
+# POST bulk import (admin only)
+# Parsing and validation run in a worker thread, chunk by chunk; each chunk
+# costs one appointment lookup, a citizen lookup for rows not owned by their
+# appointment's citizen, one insert and one event insert.
+@router.post("/import", response_model=schemas.VaccinationImportOut, dependencies=[admission("bulk"), query_budget(None)])
+async def import_vaccinations(file: UploadFile = File(...), format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+                              db: AsyncSession = Depends(get_async_db),
+                              admin: Principal = Depends(require_admin_async)):
+    fmt = format or vaccination_import.detect_format(file.filename, file.content_type)
+    report = vaccination_import.ImportReport()
+    chunks = vaccination_import.parse_chunks(io.TextIOWrapper(file.file, encoding="utf-8", newline=""), fmt, report)
+    try:
+        while (chunk := await run_in_threadpool(next, chunks, None)) is not None:
+            await db.run_sync(vaccination_import.store_chunk, chunk, admin.id, report)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File is not UTF-8 encoded")
+    await db.commit()
+    return report.result()
+
+# PATCH vaccination (admin only)
+@router.patch("/{vaccination_id}", response_model=schemas.VaccinationOut, dependencies=[query_budget(5)])
+async def update_vaccination(vaccination_id: int, vaccination: schemas.VaccinationCreate,
+                             db: AsyncSession = Depends(get_async_db),
+                             admin: Principal = Depends(require_admin_async)):
+    db_vacc = await _load(db, vaccination_id)
+    if not db_vacc:
+        raise HTTPException(status_code=404, detail="Vaccination not found")
+    for key, value in vaccination.dict(exclude_unset=True).items():
+        setattr(db_vacc, key, value)
+    await db.commit()
+    return await _load(db, vaccination_id)
+
+# DELETE vaccination (admin only)
+@router.delete("/{vaccination_id}", status_code=204, dependencies=[query_budget(4)])
+async def delete_vaccination(vaccination_id: int, db: AsyncSession = Depends(get_async_db),
+                             admin: Principal = Depends(require_admin_async)):
+    vacc = await db.get(models.Vaccination, vaccination_id)
+    if not vacc:
+        raise HTTPException(status_code=404, detail="Vaccination not found")
+    await db.delete(vacc)
+    await db.commit()
+    return Response(status_code=204)
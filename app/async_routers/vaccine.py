@@ -0,0 +1,103 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import exists, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from .. import models, schemas
+from ..utils import get_async_db, require_admin_async, Principal
+from ..pagination import TOTAL_COUNT_HEADER, parse_ids, set_missing_ids
+from ..query_budget import query_budget
+from ..vaccine_catalog import vaccine_catalog
+from ..conditional import conditional, make_etag
+
+router = APIRouter(prefix="/vaccines", tags=["Vaccines"])
+
+# GET all vaccines, or ?ids=1,2,3 (missing ids listed in X-Missing-Ids)
+# Catalog reads are served from the in-memory snapshot; the budget covers a refresh.
+# The ETag follows the shared catalog version, so a 304 costs no serialization.
+@router.get("/", response_model=list[schemas.VaccineOut], dependencies=[query_budget(2)])
+async def get_vaccines(request: Request, response: Response, ids: Optional[str] = None, db: AsyncSession = Depends(get_async_db)):
+    wanted = parse_ids(ids) if ids is not None else None
+    version, updated_at = await db.run_sync(vaccine_catalog.validators)
+    etag = make_etag("vaccines", version) if wanted is None else make_etag("vaccines", version, wanted)
+    not_modified = conditional(request, response, etag, updated_at)
+    if not_modified:
+        return not_modified
+    if wanted is None:
+        return await vaccine_catalog.all_async(db)
+    vaccines = await vaccine_catalog.many_async(db, wanted)
+    set_missing_ids(response, wanted, (vaccine.id for vaccine in vaccines))
+    return vaccines
+
+# HEAD all vaccines: catalog size in X-Total-Count
+@router.head("/", dependencies=[query_budget(2)])
+async def count_vaccines(db: AsyncSession = Depends(get_async_db)):
+    total = await vaccine_catalog.count_async(db)
+    return Response(status_code=200, headers={TOTAL_COUNT_HEADER: str(total)})
+
+# HEAD vaccine: a snapshot lookup, or an EXISTS probe with the cache off
+@router.head("/{vaccine_id}", dependencies=[query_budget(2)])
+async def head_vaccine(vaccine_id: int, db: AsyncSession = Depends(get_async_db)):
+    found = await vaccine_catalog.exists_async(db, vaccine_id)
+    if not found:
+        raise HTTPException(status_code=404)
+    return Response(status_code=200)
+
+# GET vaccine by ID
+@router.get("/{vaccine_id}", response_model=schemas.VaccineOut, dependencies=[query_budget(2)])
+async def get_vaccine(vaccine_id: int, request: Request, response: Response, db: AsyncSession = Depends(get_async_db)):
+    vaccine = await vaccine_catalog.get_async(db, vaccine_id)
+    if not vaccine:
+        raise HTTPException(status_code=404, detail="Vaccine not found")
+    version, updated_at = await db.run_sync(vaccine_catalog.validators)
+    not_modified = conditional(request, response, make_etag("vaccines", version, vaccine_id), updated_at)
+    if not_modified:
+        return not_modified
+    return vaccine
+
+# POST vaccine (admin only)
+@router.post("/", response_model=schemas.VaccineOut, dependencies=[query_budget(4)])
+async def create_vaccine(vaccine: schemas.VaccineCreate, db: AsyncSession = Depends(get_async_db),
+                         admin: Principal = Depends(require_admin_async)):
+    exists = await db.scalar(select(models.Vaccine).where(models.Vaccine.name == vaccine.name))
+    if exists:
+        raise HTTPException(status_code=400, detail="Vaccine already exists")
+    new_vaccine = models.Vaccine(**vaccine.dict())
+    db.add(new_vaccine)
+    await db.run_sync(vaccine_catalog.bump)
+    await db.commit()
+    vaccine_catalog.invalidate()
+    return new_vaccine
+
+# PATCH vaccine (admin only)
+@router.patch("/{vaccine_id}", response_model=schemas.VaccineOut, dependencies=[query_budget(4)])
+async def update_vaccine(vaccine_id: int, vaccine: schemas.VaccineCreate, db: AsyncSession = Depends(get_async_db),
+                         admin: Principal = Depends(require_admin_async)):
+    db_vaccine = await db.get(models.Vaccine, vaccine_id)
+    if not db_vaccine:
+        raise HTTPException(status_code=404, detail="Vaccine not found")
+    for key, value in vaccine.dict(exclude_unset=True).items():
+        setattr(db_vaccine, key, value)
+    await db.run_sync(vaccine_catalog.bump)
+    await db.commit()
+    vaccine_catalog.invalidate()
+    return db_vaccine
+
+# DELETE vaccine (admin only)
+@router.delete("/{vaccine_id}", status_code=204, dependencies=[query_budget(7)])
+async def delete_vaccine(vaccine_id: int, db: AsyncSession = Depends(get_async_db),
+                         admin: Principal = Depends(require_admin_async)):
+    vaccine = await db.get(models.Vaccine, vaccine_id)
+    if not vaccine:
+        raise HTTPException(status_code=404, detail="Vaccine not found")
+    linked = await db.scalar(select(
+        exists().where(models.Appointment.vaccine_id == vaccine_id)
+        | exists().where(models.Vaccination.vaccine_id == vaccine_id)
+    ))
+    if linked:
+        raise HTTPException(status_code=400, detail="Cannot delete vaccine linked to appointments or vaccinations")
+    await db.delete(vaccine)
+    await db.run_sync(vaccine_catalog.bump)
+    await db.commit()
+    vaccine_catalog.invalidate()
+    return Response(status_code=204)
@@ -0,0 +1,269 @@
+"""Time the column-wise analytics reports on synthetic vaccinations, against a row-by-row reference.
+
+    python -m app.benchmarks.analytics --rows 10000000 --reference-rows 1000000
+
+``--rows`` vaccinations are generated straight into NumPy columns (seeded):
+each series (a citizen taking a vaccine) starts on a random day and takes a
+dose every DOSE_INTERVAL_DAYS plus a few days; 50/30/20% of the series stop
+after one/two/three doses, vaccine popularity is skewed, and 1% of the doses
+are recorded twice. Every report of ``app.analytics`` is timed on all rows
+and encoded as Parquet. The first ``--reference-rows`` rows also go through a
+plain-Python implementation that loops over the rows, as code iterating
+``Vaccination`` objects would; both must return the same report rows.
+
+``--load-rows`` rows are then written to a scratch SQLite file and read back
+with ``analytics.load`` to time the column-batch read. With DATABASE_URL set,
+the vaccinations already in that database are read instead (nothing is written).
+"""
+import argparse
+import json
+import os
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from datetime import date, timedelta
+
+import numpy as np
+
+DAY_ZERO = (date(2024, 1, 1) - date(1970, 1, 1)).days
+
+
+# --------------------------
+# SYNTHETIC COLUMNS
+# --------------------------
+def synthetic(rows: int, citizens: int, vaccines: int, days: int, seed: int):
+    from app import analytics
+
+    rng = np.random.default_rng(seed)
+    unique_rows = int(rows / 1.01)
+    lengths = rng.choice([1, 2, 3], size=int(unique_rows / 1.7) + 1, p=[0.5, 0.3, 0.2])
+    lengths = lengths[:np.searchsorted(np.cumsum(lengths), unique_rows) + 1]
+    series = np.repeat(np.arange(len(lengths)), lengths)
+    starts = np.cumsum(lengths) - lengths
+    dose = (np.arange(len(series)) - starts[series] + 1).astype(np.int32)
+    citizen = rng.integers(1, citizens + 1, len(lengths))[series]
+    weights = 1 / np.arange(1, vaccines + 1) ** 1.1
+    vaccine = rng.choice(np.arange(1, vaccines + 1, dtype=np.int32), size=len(lengths), p=weights / weights.sum())[series]
+    steps = np.where(dose == 1, 0, analytics.DOSE_INTERVAL_DAYS + rng.exponential(10, len(series)).astype(np.int32))
+    totals = np.cumsum(steps)
+    day = (rng.integers(DAY_ZERO, DAY_ZERO + days, len(lengths))[series] + totals - totals[starts][series]).astype(np.int32)
+    repeated = rng.integers(0, len(series), rows - len(series)) if rows > len(series) else np.empty(0, np.int64)
+    order = rng.permutation(np.concatenate([np.arange(len(series)), repeated]))[:rows]
+    return analytics.VaccinationColumns(citizen[order], vaccine[order], dose[order], day[order], population=citizens)
+
+
+# --------------------------
+# ROW-BY-ROW REFERENCE
+# --------------------------
+def _date(day: int) -> date:
+    return date(1970, 1, 1) + timedelta(days=int(day))
+
+
+def _month(day: int) -> str:
+    return _date(day).strftime("%Y-%m")
+
+
+def _series(rows):
+    first = {}
+    for citizen, vaccine, dose, day in rows:
+        if citizen and ((citizen, vaccine, dose) not in first or day < first[citizen, vaccine, dose]):
+            first[citizen, vaccine, dose] = day
+    series = defaultdict(list)
+    for (citizen, vaccine, dose), day in sorted(first.items()):
+        series[citizen, vaccine].append((dose, day))
+    return first, series
+
+
+def _quantile(values, quantile):
+    return sorted(values)[int((len(values) - 1) * quantile)] if values else None
+
+
+def reference_coverage(rows, population, as_of):
+    first, _ = _series(rows)
+    doses, citizens = Counter(), Counter()
+    for citizen, vaccine, dose, day in rows:
+        doses[vaccine, _month(day), dose] += 1
+    for (citizen, vaccine, dose), day in first.items():
+        citizens[vaccine, _month(day), dose] += 1
+    cumulative, running = {}, Counter()
+    for vaccine, month, dose in sorted(doses, key=lambda key: (key[0], key[2], key[1])):
+        running[vaccine, dose] += citizens[vaccine, month, dose]
+        cumulative[vaccine, month, dose] = running[vaccine, dose]
+    return [{"vaccine_id": vaccine, "month": month, "dose_number": dose, "doses": doses[vaccine, month, dose],
+             "citizens": citizens[vaccine, month, dose], "cumulative_citizens": cumulative[vaccine, month, dose],
+             "coverage": cumulative[vaccine, month, dose] / population if population else None}
+            for vaccine, month, dose in sorted(doses)]
+
+
+def reference_progression(rows, population, as_of):
+    _, series = _series(rows)
+    citizens, stopped, gaps = Counter(), Counter(), defaultdict(list)
+    for (citizen, vaccine), doses in series.items():
+        for index, (dose, day) in enumerate(doses):
+            citizens[vaccine, dose] += 1
+            if index and doses[index - 1][0] == dose - 1:
+                gaps[vaccine, dose].append(day - doses[index - 1][1])
+        stopped[vaccine, doses[-1][0]] += 1
+    return [{"vaccine_id": vaccine, "dose_number": dose, "citizens": citizens[vaccine, dose],
+             "stopped": stopped[vaccine, dose],
+             "median_days_since_previous": _quantile(gaps[vaccine, dose], 0.5),
+             "p90_days_since_previous": _quantile(gaps[vaccine, dose], 0.9)}
+            for vaccine, dose in sorted(citizens)]
+
+
+def reference_cohorts(rows, population, as_of):
+    _, series = _series(rows)
+    citizens = Counter()
+    for (citizen, vaccine), doses in series.items():
+        if doses[0][0] == 1:
+            for dose, day in doses:
+                citizens[vaccine, _month(doses[0][1]), dose] += 1
+    return [{"vaccine_id": vaccine, "cohort": cohort, "dose_number": dose, "citizens": citizens[vaccine, cohort, dose],
+             "share": citizens[vaccine, cohort, dose] / citizens[vaccine, cohort, 1]}
+            for vaccine, cohort, dose in sorted(citizens)]
+
+
+def _reference_series(rows):
+    from app import analytics
+
+    for (citizen, vaccine), doses in sorted(_series(rows)[1].items()):
+        last_dose, last_day = doses[-1]
+        complete = last_dose >= analytics.DOSE_SERIES_LENGTH
+        yield citizen, vaccine, doses, last_dose, last_day, None if complete else last_day + analytics.DOSE_INTERVAL_DAYS
+
+
+def reference_citizens(rows, population, as_of):
+    return [{"citizen_id": citizen, "vaccine_id": vaccine, "doses": len(doses), "last_dose_number": last_dose,
+             "first_dose_date": _date(doses[0][1]), "last_dose_date": _date(last_day),
+             "next_dose_due": None if next_day is None else _date(next_day)}
+            for citizen, vaccine, doses, last_dose, last_day, next_day in _reference_series(rows)]
+
+
+def reference_due(rows, population, as_of):
+    cutoff = (as_of - date(1970, 1, 1)).days
+    due = [(next_day, citizen, vaccine, last_dose, last_day)
+           for citizen, vaccine, doses, last_dose, last_day, next_day in _reference_series(rows)
+           if next_day is not None and next_day <= cutoff]
+    return [{"citizen_id": citizen, "vaccine_id": vaccine, "last_dose_number": last_dose,
+             "last_dose_date": _date(last_day), "next_dose_due": _date(next_day), "overdue_days": cutoff - next_day}
+            for next_day, citizen, vaccine, last_dose, last_day in sorted(due, key=lambda row: row[0])]
+
+
+REFERENCE = {"coverage": reference_coverage, "progression": reference_progression, "cohorts": reference_cohorts,
+             "citizens": reference_citizens, "due": reference_due}
+
+
+# --------------------------
+# DATABASE READ
+# --------------------------
+def _timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def _database_load(data, rows: int, scratch: bool):
+    """Columns read back through ``analytics.load``, the read time, and whether they are the ones written."""
+    written = data.take(np.arange(min(rows, len(data)))) if scratch else None
+    from app import analytics, database, models
+    from app.bulk_insert import insert_rows
+
+    db = database.SessionLocal()
+    try:
+        if written is not None:
+            database.Base.metadata.create_all(bind=database.engine)
+            insert_rows(db, models.User.__table__, ("id", "full_name", "email", "password_hash", "role"),
+                        [(n, "Citizen", f"citizen{n}@analytics.bench", "-", "citizen")
+                         for n in range(1, data.population + 1)])
+            insert_rows(db, models.Vaccine.__table__, ("id", "name"),
+                        [(n, f"Vaccine {n}") for n in range(1, int(data.vaccine_id.max()) + 1)])
+            for start in range(0, len(written), 100000):
+                chunk = slice(start, start + 100000)
+                insert_rows(db, models.Vaccination.__table__,
+                            ("citizen_id", "vaccine_id", "dose_number", "vaccination_date"),
+                            [(int(citizen), int(vaccine), int(dose), _date(day))
+                             for citizen, vaccine, dose, day in zip(written.citizen_id[chunk], written.vaccine_id[chunk],
+                                                                    written.dose_number[chunk], written.day[chunk])])
+            db.commit()
+        params = analytics.AnalyticsParams("parquet", None, None, None, None, 1)
+        loaded, seconds = _timed(analytics.load, db, params)
+    finally:
+        db.close()
+    matches = None
+    if written is not None:
+        key = lambda columns: np.sort(analytics._pack(columns.citizen_id, columns.vaccine_id, columns.dose_number,
+                                                      columns.day))
+        matches = len(loaded) == len(written) and bool(np.array_equal(key(loaded), key(written)))
+    return loaded, seconds, matches
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10_000_000)
+    parser.add_argument("--reference-rows", type=int, default=1_000_000,
+                        help="rows also run through the row-by-row reference (0 skips it)")
+    parser.add_argument("--load-rows", type=int, default=1_000_000,
+                        help="rows written to a scratch SQLite file and read back (0 skips it)")
+    parser.add_argument("--citizens", type=int, default=None, help="default: rows / 5")
+    parser.add_argument("--vaccines", type=int, default=12)
+    parser.add_argument("--days", type=int, default=730, help="span of the first doses")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+    scratch = not os.getenv("DATABASE_URL")
+    if scratch:
+        os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'analytics.db')}"
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+    from app import analytics
+
+    data, generate_seconds = _timed(synthetic, args.rows, args.citizens or max(args.rows // 5, 1), args.vaccines,
+                                    args.days, args.seed)
+    as_of = analytics.EPOCH + timedelta(days=DAY_ZERO + args.days)
+    sample = data.take(np.arange(min(args.reference_rows, len(data))))
+    sample_rows = list(zip(sample.citizen_id.tolist(), sample.vaccine_id.tolist(), sample.dose_number.tolist(),
+                           sample.day.tolist()))
+    results, mismatches = {}, []
+    for name, report in analytics.REPORTS.items():
+        table, seconds = _timed(report, data, as_of)
+        body, encode_seconds = _timed(analytics.encode, table, "parquet")
+        result = {"rows": table.num_rows, "vectorized_ms": round(seconds * 1000, 1),
+                  "parquet_bytes": len(body), "parquet_ms": round(encode_seconds * 1000, 1)}
+        if sample_rows:
+            expected, python_seconds = _timed(REFERENCE[name], sample_rows, sample.population, as_of)
+            table, sample_seconds = _timed(report, sample, as_of)
+            if table.to_pylist() != expected:
+                mismatches.append(name)
+            result.update(sample_rows=len(sample_rows), python_ms=round(python_seconds * 1000, 1),
+                          sample_vectorized_ms=round(sample_seconds * 1000, 1),
+                          speedup=round(python_seconds / sample_seconds, 1) if sample_seconds else None)
+        results[name] = result
+    load = None
+    if args.load_rows:
+        loaded, seconds, matches = _database_load(data, args.load_rows, scratch)
+        load = {"rows": len(loaded), "seconds": round(seconds, 2), "rows_per_second": round(len(loaded) / seconds)}
+        if matches is False:
+            mismatches.append("load")
+
+    if args.json:
+        print(json.dumps({"rows": len(data), "generate_seconds": round(generate_seconds, 2), "reports": results,
+                          "load": load, "mismatches": mismatches}, indent=2))
+    else:
+        print(f"{len(data):,} vaccinations generated in {generate_seconds:.1f}s")
+        print(f"{'report':<12} {'out rows':>10} {'numpy ms':>9} {'parquet':>10} {'py ms':>9} {'np ms':>7} {'speedup':>8}")
+        for name, result in results.items():
+            print(f"{name:<12} {result['rows']:>10,} {result['vectorized_ms']:>9} {result['parquet_bytes']:>10,} "
+                  f"{result.get('python_ms', '-'):>9} {result.get('sample_vectorized_ms', '-'):>7} "
+                  f"{str(result.get('speedup', '-')) + 'x':>8}")
+        if sample_rows:
+            print(f"(py ms / np ms / speedup on the first {len(sample_rows):,} rows)")
+        if load:
+            print(f"load: {load['rows']:,} rows in {load['seconds']}s ({load['rows_per_second']:,} rows/s)")
+        for mismatch in mismatches:
+            print(f"MISMATCH: {mismatch} differs from the reference", file=sys.stderr)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""Latency percentiles and throughput per endpoint, in-process or over HTTP.
+
+    python -m app.benchmarks.endpoints --requests 500 --concurrency 16 --output results.json
+    python -m app.benchmarks.endpoints --url http://localhost:8000 --baseline results.json
+
+Without ``--url`` the app is imported and driven in-process through its ASGI
+interface (no sockets, same DATABASE_URL/DB_MODE as the environment); with
+``--url`` a running server is driven over HTTP. Either way the database should
+hold data from ``python -m app.synthetic_data``, whose fixed accounts are used to
+log in. Ids are sampled from the first pages of the list endpoints.
+
+Each endpoint gets ``--requests`` requests from ``--concurrency`` concurrent
+clients after ``--warmup`` unmeasured ones. ``--output`` saves the results as
+JSON. ``--baseline`` compares against saved results and exits with status 1
+when an endpoint's p95 or requests/s got worse by more than ``--tolerance``.
+
+This measures endpoint cost, not admission control: in-process it is off
+(ADMISSION_ENABLED=0); run a benchmarked server with it off too, or the
+login and booking loops hit their rate limits.
+"""
+import argparse
+import asyncio
+import base64
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+import httpx
+
+SEARCH_TERMS = ("measles", "booster dose", "vaccine safety", "travel", "influenza season", "children")
+
+
+class Endpoint:
+    def __init__(self, name, method, path, role=None, body=None, form=None, expect=(200,)):
+        self.name = name
+        self.method = method
+        self.path = path  # str.format template over the sampled ids
+        self.role = role
+        self.body = body  # callable(context) -> JSON body
+        self.form = form
+        self.expect = expect
+
+
+def _booking(context):
+    day = datetime(2031, 1, 1, 8, tzinfo=timezone.utc) + timedelta(days=context["rng"].randrange(365),
+                                                                   minutes=15 * context["rng"].randrange(40))
+    return {"citizen_id": context["citizen_id"], "vaccine_id": context["rng"].choice(context["vaccine_ids"]),
+            "preferred_date": day.isoformat()}
+
+
+ENDPOINTS = [
+    Endpoint("GET /vaccines/", "GET", "/vaccines/"),
+    Endpoint("GET /appointments/ page", "GET", "/appointments/?limit=50"),
+    Endpoint("GET /appointments/{id}", "GET", "/appointments/{appointment_id}"),
+    Endpoint("GET /appointments/?ids= (20)", "GET", "/appointments/?ids={appointment_batch}"),
+    Endpoint("HEAD /appointments/{id}", "HEAD", "/appointments/{appointment_id}"),
+    Endpoint("GET /vaccinations/{id}", "GET", "/vaccinations/{vaccination_id}"),
+    Endpoint("GET /articles/ page", "GET", "/articles/?limit=20"),
+    Endpoint("GET /articles/{id}", "GET", "/articles/{article_id}"),
+    Endpoint("GET /articles/search", "GET", "/articles/search?q={term}"),
+    Endpoint("GET /stats/appointments", "GET", "/stats/appointments?vaccine_id={vaccine_id}", role="admin"),
+    Endpoint("POST /appointments/", "POST", "/appointments/", role="citizen", body=_booking),
+    Endpoint("POST /auth/login", "POST", "/auth/login", form=True),
+]
+
+
+# --------------------------
+# CLIENTS
+# --------------------------
+class InProcess:
+    """The app behind an ASGI transport, with its startup/shutdown handlers run."""
+
+    def __init__(self):
+        from app.main import app
+
+        self.app = app
+        self.client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench")
+
+    async def __aenter__(self):
+        await self.app.router.startup()
+        return self.client
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+        await self.app.router.shutdown()
+        # Pooled aiosqlite connections hold non-daemon threads that would keep
+        # the interpreter alive.
+        from app import database
+
+        if database.async_engine is not None:
+            await database.async_engine.dispose()
+        database.engine.dispose()
+
+
+class OverHttp:
+    def __init__(self, url: str, concurrency: int):
+        limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+        self.client = httpx.AsyncClient(base_url=url, limits=limits, timeout=60)
+
+    async def __aenter__(self):
+        return self.client
+
+    async def __aexit__(self, *exc):
+        await self.client.aclose()
+
+
+# --------------------------
+# MEASURE
+# --------------------------
+def percentile(sorted_values, fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    rank = max(int(round(fraction * len(sorted_values) + 0.5)) - 1, 0)
+    return sorted_values[min(rank, len(sorted_values) - 1)]
+
+
+async def _login(client, email: str, password: str):
+    response = await client.post("/auth/login", data={"username": email, "password": password})
+    response.raise_for_status()
+    token = response.json()["access_token"]
+    payload = json.loads(base64.urlsafe_b64decode(token.split(".")[1] + "=="))
+    return {"Authorization": f"Bearer {token}"}, payload["user_id"]
+
+
+async def _sample_ids(client, headers, path: str):
+    response = await client.get(path, headers=headers)
+    response.raise_for_status()
+    return [row["id"] for row in response.json()] or [0]
+
+
+async def _context(client, seed: int, admin_email: str, citizen_email: str, password: str):
+    admin, _ = await _login(client, admin_email, password)
+    citizen, citizen_id = await _login(client, citizen_email, password)
+    return {
+        "rng": random.Random(seed),
+        "headers": {"admin": admin, "citizen": citizen},
+        "citizen_id": citizen_id,
+        "credentials": {"username": citizen_email, "password": password},
+        "vaccine_ids": await _sample_ids(client, admin, "/vaccines/"),
+        "appointment_ids": await _sample_ids(client, admin, "/appointments/?limit=500"),
+        "vaccination_ids": await _sample_ids(client, admin, "/vaccinations/?limit=500"),
+        "article_ids": await _sample_ids(client, admin, "/articles/?limit=500"),
+    }
+
+
+def _request(endpoint: Endpoint, context):
+    rng = context["rng"]
+    path = endpoint.path.format(
+        appointment_id=rng.choice(context["appointment_ids"]),
+        appointment_batch=",".join(map(str, rng.sample(context["appointment_ids"],
+                                                       min(20, len(context["appointment_ids"]))))),
+        vaccination_id=rng.choice(context["vaccination_ids"]),
+        article_id=rng.choice(context["article_ids"]),
+        vaccine_id=rng.choice(context["vaccine_ids"]),
+        term=rng.choice(SEARCH_TERMS),
+    )
+    kwargs = {"headers": context["headers"].get(endpoint.role, {})}
+    if endpoint.body:
+        kwargs["json"] = endpoint.body(context)
+    if endpoint.form:
+        kwargs["data"] = context["credentials"]
+    return endpoint.method, path, kwargs
+
+
+async def run_endpoint(client, endpoint: Endpoint, context, requests: int, concurrency: int, warmup: int):
+    latencies, errors = [], 0
+    queue = asyncio.Queue()
+    for n in range(warmup + requests):
+        queue.put_nowait(n >= warmup)
+
+    async def worker():
+        nonlocal errors
+        while not queue.empty():
+            measured = queue.get_nowait()
+            method, path, kwargs = _request(endpoint, context)
+            start = time.perf_counter()
+            response = await client.request(method, path, **kwargs)
+            await response.aread()
+            elapsed = time.perf_counter() - start
+            if measured:
+                latencies.append(elapsed)
+                if response.status_code not in endpoint.expect:
+                    errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    # Throughput over the measured share of the run.
+    wall = (time.perf_counter() - start) * requests / (warmup + requests)
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "rps": round(requests / wall, 1) if wall else 0.0,
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+    }
+
+
+async def run(args):
+    from app.synthetic_data import SYNTHETIC_ADMIN_EMAIL, SYNTHETIC_CITIZEN_EMAIL, SYNTHETIC_PASSWORD
+
+    selected = [e for e in ENDPOINTS if not args.only or any(term in e.name for term in args.only)]
+    harness = OverHttp(args.url, args.concurrency) if args.url else InProcess()
+    results = {}
+    async with harness as client:
+        context = await _context(client, args.seed, args.admin_email or SYNTHETIC_ADMIN_EMAIL,
+                                 args.citizen_email or SYNTHETIC_CITIZEN_EMAIL, args.password or SYNTHETIC_PASSWORD)
+        for endpoint in selected:
+            requests = args.login_requests if endpoint.form else args.requests
+            results[endpoint.name] = await run_endpoint(client, endpoint, context, requests, args.concurrency,
+                                                        min(args.warmup, requests))
+            print(f"  {endpoint.name}: {results[endpoint.name]['p95_ms']} ms p95", file=sys.stderr)
+    return results
+
+
+# --------------------------
+# REPORT
+# --------------------------
+def compare(results: dict, baseline: dict, tolerance: float):
+    """Rows of (endpoint, p95 change, rps change, regressed) against a saved baseline."""
+    rows = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before:
+            continue
+        p95 = result["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        rps = result["rps"] / before["rps"] - 1 if before["rps"] else 0.0
+        rows.append((name, p95, rps, p95 > tolerance or rps < -tolerance))
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="benchmark a running server instead of the in-process app")
+    parser.add_argument("--requests", type=int, default=500, help="measured requests per endpoint")
+    parser.add_argument("--login-requests", type=int, default=50, help="measured logins (PBKDF2 is slow)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--only", nargs="*", help="substrings of the endpoint names to run")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--admin-email")
+    parser.add_argument("--citizen-email")
+    parser.add_argument("--password")
+    parser.add_argument("--output", help="save the results as JSON")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10,
+                        help="allowed p95 increase / requests/s decrease before failing (0.10 = 10%%)")
+    args = parser.parse_args()
+    os.environ.setdefault("ADMISSION_ENABLED", "0")
+
+    results = asyncio.run(run(args))
+    report = {
+        "meta": {
+            "target": args.url or "in-process",
+            "db_mode": os.getenv("DB_MODE", "sync"),
+            "concurrency": args.concurrency,
+            "python": platform.python_version(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        },
+        "results": results,
+    }
+    print(f"{'endpoint':<28} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for name, result in results.items():
+        print(f"{name:<28} {result['rps']:>9} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8} "
+              f"{result['errors']:>7}")
+    if args.output:
+        with open(args.output, "w") as out:
+            json.dump(report, out, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as source:
+            rows = compare(results, json.load(source), args.tolerance)
+        print(f"\n{'endpoint':<28} {'p95':>8} {'req/s':>8}")
+        for name, p95, rps, regressed in rows:
+            print(f"{name:<28} {p95:>+8.1%} {rps:>+8.1%}{'  REGRESSION' if regressed else ''}")
+        if any(row[3] for row in rows):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""Compare ORM + pydantic list serialization with the column-projection path.
+
+    python -m app.benchmarks.list_serialization --rows 10000 --repeat 5
+
+Both paths read the same ``--rows`` rows and must produce identical bytes:
+the old one loads ORM objects (with their eager joins), validates them
+through ``list[Schema]`` and renders with the json module, as
+``response_model`` does; the new one selects column tuples through
+``app.projections`` and renders with orjson. NDJSON lines are compared
+against ``model_dump_json()`` the same way. Without DATABASE_URL a
+temporary SQLite file is filled by ``app.synthetic_data``.
+"""
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+
+def _database(rows: int):
+    if os.getenv("DATABASE_URL"):
+        from app import database
+
+        return database
+    path = os.path.join(tempfile.mkdtemp(), "list_serialization.db")
+    os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+    from app import database, synthetic_data
+
+    database.Base.metadata.create_all(bind=database.engine)
+    db = database.SessionLocal()
+    try:
+        synthetic_data.generate(db, users=rows // 4, appointments=rows * 2, articles=max(rows // 10, 1))
+    finally:
+        db.close()
+    return database
+
+
+def _best(fn, repeat: int):
+    timings, body = [], None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        body = fn()
+        timings.append(time.perf_counter() - start)
+    return min(timings), statistics.median(timings), body
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    database = _database(args.rows)
+    from pydantic import TypeAdapter
+    from sqlalchemy.orm import joinedload
+    from app import models, projections, schemas
+
+    cases = [
+        ("appointments", projections.APPOINTMENTS, [joinedload(models.Appointment.vaccine)]),
+        ("vaccinations", projections.VACCINATIONS, [joinedload(models.Vaccination.vaccine)]),
+        ("users", projections.USERS, []),
+        ("articles", projections.ARTICLES, [joinedload(models.AwarenessArticle.author)]),
+    ]
+    results, mismatches = {}, []
+    db = database.SessionLocal()
+    try:
+        for name, projection, options in cases:
+            entity = projection.entity
+            adapter = TypeAdapter(list[projection.schema])
+
+            def orm_page():
+                db.expunge_all()
+                objects = db.query(entity).options(*options).order_by(entity.id).limit(args.rows).all()
+                content = adapter.dump_python(adapter.validate_python(objects, from_attributes=True), mode="json")
+                return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None,
+                                  separators=(",", ":")).encode("utf-8")
+
+            def projected_page():
+                rows = db.connection().execute(projection.statement().order_by(entity.id).limit(args.rows)).all()
+                return projection.render(rows)
+
+            def orm_lines():
+                db.expunge_all()
+                objects = db.query(entity).options(*options).order_by(entity.id).limit(args.rows).all()
+                return "".join(projection.schema.model_validate(obj, from_attributes=True).model_dump_json() + "\n"
+                               for obj in objects).encode("utf-8")
+
+            def projected_lines():
+                rows = db.connection().execute(projection.statement().order_by(entity.id).limit(args.rows)).all()
+                return projection.render_lines(rows)
+
+            row = {}
+            for label, old, new in (("json", orm_page, projected_page), ("ndjson", orm_lines, projected_lines)):
+                old_best, old_median, old_body = _best(old, args.repeat)
+                new_best, new_median, new_body = _best(new, args.repeat)
+                if old_body != new_body:
+                    mismatches.append(f"{name} {label}")
+                row[label] = {
+                    "rows": len(json.loads(old_body)) if label == "json" else old_body.count(b"\n"),
+                    "bytes": len(new_body),
+                    "orm_ms": round(old_best * 1000, 1),
+                    "projection_ms": round(new_best * 1000, 1),
+                    "orm_median_ms": round(old_median * 1000, 1),
+                    "projection_median_ms": round(new_median * 1000, 1),
+                    "speedup": round(old_best / new_best, 1) if new_best else None,
+                }
+            results[name] = row
+    finally:
+        db.close()
+
+    if args.json:
+        print(json.dumps({"results": results, "mismatches": mismatches}, indent=2))
+    else:
+        print(f"{'list':<14} {'format':<7} {'rows':>6} {'orm ms':>8} {'proj ms':>8} {'speedup':>8}")
+        for name, row in results.items():
+            for label, result in row.items():
+                print(f"{name:<14} {label:<7} {result['rows']:>6} {result['orm_ms']:>8} {result['projection_ms']:>8} "
+                      f"{result['speedup']:>7}x")
+        for mismatch in mismatches:
+            print(f"MISMATCH: {mismatch} output differs", file=sys.stderr)
+    if mismatches:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
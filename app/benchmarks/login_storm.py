@@ -0,0 +1,176 @@
+"""p99 of cheap endpoints, quiet and during a login storm, with and without admission control.
+
+    python -m app.benchmarks.login_storm --seconds 10 --storm-rate 200
+    python -m app.benchmarks.login_storm --url http://localhost:8000
+
+A few probe clients loop over cheap reads (GET /vaccines/, GET/HEAD
+/appointments/{id}) for ``--seconds`` while nothing else runs, then again
+while logins of sampled citizens arrive at ``--storm-rate`` per second over
+up to ``--storm`` clients, each with its own client address. Logins use the
+real password, so every attempt that is admitted costs a PBKDF2 hash.
+
+In-process (no ``--url``) the storm runs twice, with admission control off
+and on (app/admission.py), and the run exits with status 1 when the probes'
+p99 under the storm with admission on exceeds the quiet p99 by more than
+``--tolerance`` (plus ``--slack-ms``). Over HTTP the server's own settings
+apply and every storm client shares this machine's address, so the per-IP
+bucket sheds most of it. The database should hold data from
+``python -m app.synthetic_data``.
+"""
+import argparse
+import asyncio
+import random
+import sys
+import time
+from collections import Counter, deque
+
+import httpx
+
+from app.benchmarks.endpoints import InProcess, OverHttp, _login, _sample_ids, percentile
+
+PROBES = ("GET /vaccines/", "GET /appointments/{id}", "HEAD /appointments/{id}")
+
+
+async def _probe(client, headers, appointment_ids, rng, deadline, latencies):
+    while time.perf_counter() < deadline:
+        name = rng.choice(PROBES)
+        method, path = name.split(" ")
+        path = path.format(id=rng.choice(appointment_ids))
+        start = time.perf_counter()
+        response = await client.request(method, path, headers=headers)
+        await response.aread()
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            raise RuntimeError(f"{name}: {response.status_code} {response.text[:200]}")
+
+
+async def _storm(clients, emails, password, rate: float, rng, deadline, outcomes):
+    """Open loop: logins arrive at ``rate``/s whatever the responses, as from a crowd of browsers.
+    Arrivals finding every client busy are counted as "dropped" (the storm outran the generator)."""
+    idle = deque(clients)  # round robin over the client addresses
+
+    async def attempt(client):
+        try:
+            response = await client.post("/auth/login", data={"username": rng.choice(emails), "password": password})
+            await response.aread()
+            outcomes[response.status_code] += 1
+        finally:
+            idle.append(client)
+
+    pending = set()
+    next_at = time.perf_counter()
+    while next_at < deadline:
+        await asyncio.sleep(max(next_at - time.perf_counter(), 0))
+        next_at += 1 / rate
+        if not idle:
+            outcomes["dropped"] += 1
+            continue
+        task = asyncio.create_task(attempt(idle.popleft()))
+        pending.add(task)
+        task.add_done_callback(pending.discard)
+    await asyncio.gather(*pending)
+
+
+def _storm_clients(harness, count: int):
+    """One client per storm worker; in-process each gets its own address."""
+    if isinstance(harness, InProcess):
+        return [httpx.AsyncClient(base_url="http://bench", timeout=120, transport=httpx.ASGITransport(
+            app=harness.app, client=(f"10.0.{n // 250}.{n % 250 + 1}", 40000))) for n in range(count)]
+    return [harness.client] * count
+
+
+async def _phase(harness, context, seconds: float, probes: int, storm: int, rate: float, seed: int):
+    if isinstance(harness, InProcess):
+        from app import admission
+
+        admission.backend.clear()
+    rng = random.Random(seed)
+    deadline = time.perf_counter() + seconds
+    latencies, outcomes = [], Counter()
+    tasks = [_probe(harness.client, context["headers"], context["appointment_ids"], random.Random(rng.random()),
+                    deadline, latencies) for _ in range(probes)]
+    clients = _storm_clients(harness, storm) if storm else []
+    if clients:
+        tasks.append(_storm(clients, context["emails"], context["password"], rate, random.Random(rng.random()),
+                            deadline, outcomes))
+    try:
+        await asyncio.gather(*tasks)
+    finally:
+        for client in set(clients) - {harness.client}:
+            await client.aclose()
+    latencies.sort()
+    return {
+        "probes": len(latencies),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+        "max_ms": round(latencies[-1] * 1000, 2) if latencies else 0.0,
+        "logins": dict(sorted(outcomes.items(), key=lambda item: str(item[0]))),
+    }
+
+
+async def run(args):
+    from app.synthetic_data import SYNTHETIC_ADMIN_EMAIL, SYNTHETIC_PASSWORD
+
+    harness = OverHttp(args.url, args.probes + args.storm) if args.url else InProcess()
+    password = args.password or SYNTHETIC_PASSWORD
+    async with harness as client:
+        admin, _ = await _login(client, args.admin_email or SYNTHETIC_ADMIN_EMAIL, password)
+        users = (await client.get("/users/?limit=500", headers=admin)).json()
+        context = {
+            "headers": admin,
+            "password": password,
+            "emails": [user["email"] for user in users if user["role"] == "citizen"],
+            "appointment_ids": await _sample_ids(client, admin, "/appointments/?limit=500"),
+        }
+        phases = {"quiet": dict(storm=0, admission=None)}
+        if args.url:
+            phases["storm"] = dict(storm=args.storm, admission=None)
+        else:
+            phases["storm, admission off"] = dict(storm=args.storm, admission=False)
+            phases["storm, admission on"] = dict(storm=args.storm, admission=True)
+        results = {}
+        for name, phase in phases.items():
+            if phase["admission"] is not None:
+                from app import admission
+
+                admission.ADMISSION_ENABLED = phase["admission"]
+            results[name] = await _phase(harness, context, args.seconds, args.probes, phase["storm"],
+                                         args.storm_rate, args.seed)
+            print(f"  {name}: {results[name]['p99_ms']} ms p99", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="drive a running server instead of the in-process app")
+    parser.add_argument("--seconds", type=float, default=10, help="length of each phase")
+    parser.add_argument("--probes", type=int, default=4, help="concurrent clients on the cheap endpoints")
+    parser.add_argument("--storm", type=int, default=64, help="login clients (most attempts outstanding at once)")
+    parser.add_argument("--storm-rate", type=float, default=200, help="login attempts per second")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--admin-email")
+    parser.add_argument("--password")
+    parser.add_argument("--tolerance", type=float, default=0.5,
+                        help="allowed p99 increase over the quiet phase with admission on (0.5 = 50%%)")
+    parser.add_argument("--slack-ms", type=float, default=5.0, help="absolute p99 allowance on top of --tolerance")
+    args = parser.parse_args()
+
+    results = asyncio.run(run(args))
+    print(f"{'phase':<24} {'probes':>7} {'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}  logins by status")
+    for name, result in results.items():
+        logins = " ".join(f"{status}:{count}" for status, count in result["logins"].items()) or "-"
+        print(f"{name:<24} {result['probes']:>7} {result['p50_ms']:>8} {result['p99_ms']:>8} {result['max_ms']:>8}  "
+              f"{logins}")
+
+    guarded = results.get("storm, admission on")
+    if guarded is not None:
+        limit = results["quiet"]["p99_ms"] * (1 + args.tolerance) + args.slack_ms
+        flat = guarded["p99_ms"] <= limit
+        print(f"\np99 with admission on: {guarded['p99_ms']} ms (limit {limit:.2f} ms) -> "
+              f"{'flat' if flat else 'NOT FLAT'}")
+        if not flat:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
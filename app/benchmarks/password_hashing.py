@@ -0,0 +1,70 @@
+"""Login (PBKDF2 verify) throughput against the number of hashing processes.
+
+    python -m app.benchmarks.password_hashing --logins 400 --concurrency 64
+
+Each row verifies ``--logins`` passwords from ``--concurrency`` request threads,
+first inline on those threads (the old behaviour, serialized by the GIL), then
+through app.hashing's process pool sized 1, 2, 4 ... up to the core count.
+"""
+import argparse
+import importlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def _run(hashing, logins: int, concurrency: int, stored_hash: str) -> float:
+    with ThreadPoolExecutor(max_workers=concurrency) as threads:
+        # warm the worker processes up before timing
+        list(threads.map(lambda _: hashing.verify_password("secret", stored_hash), range(concurrency)))
+        start = time.perf_counter()
+        results = list(threads.map(lambda _: hashing.verify_password("secret", stored_hash), range(logins)))
+        elapsed = time.perf_counter() - start
+    assert all(results)
+    return logins / elapsed
+
+
+def _hashing_module(workers: int):
+    os.environ["PASSWORD_HASH_WORKERS"] = str(workers)
+    os.environ["PASSWORD_HASH_MAX_PENDING"] = "100000"
+    from app import hashing
+    hashing.shutdown()
+    return importlib.reload(hashing)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--logins", type=int, default=400)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    worker_counts = [0]
+    workers = 1
+    while workers < args.max_workers:
+        worker_counts.append(workers)
+        workers *= 2
+    worker_counts.append(args.max_workers)
+
+    results = []
+    for workers in worker_counts:
+        hashing = _hashing_module(workers)
+        stored_hash = hashing.hash_password("secret")
+        rate = _run(hashing, args.logins, args.concurrency, stored_hash)
+        hashing.shutdown()
+        results.append({"processes": workers, "rounds": hashing.PASSWORD_HASH_ROUNDS, "logins_per_s": round(rate, 1)})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    baseline = results[0]["logins_per_s"]
+    print(f"{'processes':>10} {'logins/s':>10} {'speedup':>8}")
+    for row in results:
+        label = "inline" if row["processes"] == 0 else row["processes"]
+        print(f"{label:>10} {row['logins_per_s']:>10} {row['logins_per_s'] / baseline:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""Hammer one appointment slot from many threads and prove it is never overbooked.
+
+    DATABASE_URL=postgresql://... python -m app.benchmarks.slot_contention --threads 32 --capacity 50
+
+Run it against a scratch database (default: a temporary SQLite file). Each
+thread books the same vaccine/day slot through its own session; some of the
+booked appointments are then cancelled or rejected, which must give their
+place back. A monitor thread keeps counting holding appointments while the
+hammer runs, and at the end the slot counter must match the table exactly.
+A second slot is booked concurrently to show it is not held up.
+"""
+import argparse
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+
+def _database():
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "slot_contention.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    from app import database, models, slots
+    from sqlalchemy import exc
+
+    database.Base.metadata.create_all(bind=database.engine)
+    return database, models, slots, exc
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--attempts", type=int, default=20, help="booking attempts per thread")
+    parser.add_argument("--capacity", type=int, default=50)
+    parser.add_argument("--release-rate", type=float, default=0.3,
+                        help="share of successful bookings cancelled or rejected afterwards")
+    parser.add_argument("--json", action="store_true", help="print results as JSON")
+    args = parser.parse_args()
+
+    database, models, slots, exc = _database()
+    preferred_date = datetime(2031, 1, 1, 9, tzinfo=timezone.utc)
+    run = f"{os.getpid()}-{time.time_ns()}"
+    db = database.SessionLocal()
+    citizen = models.User(full_name="Slot hammer", email=f"hammer-{run}@example.com", password_hash="-")
+    vaccine = models.Vaccine(name=f"Hammer {run}")
+    other = models.Vaccine(name=f"Hammer other {run}")
+    db.add_all([citizen, vaccine, other])
+    db.flush()
+    day = slots.stored_day(preferred_date, db.get_bind().dialect.name)
+    slots.set_capacity(db, vaccine.id, day, args.capacity)
+    db.commit()
+    citizen_id, vaccine_id, other_id = citizen.id, vaccine.id, other.id
+    db.close()
+
+    counts = {"booked": 0, "full": 0, "released": 0, "other_booked": 0, "retried": 0, "max_seen": 0}
+    lock = threading.Lock()
+    done = threading.Event()
+
+    def count(key, n=1):
+        with lock:
+            counts[key] += n
+
+    def holding() -> int:
+        session = database.SessionLocal()
+        try:
+            return session.query(models.Appointment).filter(
+                models.Appointment.vaccine_id == vaccine_id,
+                models.Appointment.status.in_(slots.HOLDING_STATUSES)).count()
+        finally:
+            session.close()
+
+    def monitor():
+        while not done.is_set():
+            seen = holding()
+            with lock:
+                counts["max_seen"] = max(counts["max_seen"], seen)
+            time.sleep(0.005)
+
+    def attempt(target_id: int):
+        """Book once; returns the appointment id, or None if the slot was full."""
+        while True:
+            session = database.SessionLocal()
+            try:
+                appointment = models.Appointment(citizen_id=citizen_id, vaccine_id=target_id,
+                                                 preferred_date=preferred_date)
+                session.add(appointment)
+                session.commit()
+                return appointment.id
+            except slots.SlotFull:
+                return None
+            except exc.OperationalError:  # SQLite: database is locked
+                count("retried")
+            finally:
+                session.close()
+
+    def release(appointment_id: int):
+        session = database.SessionLocal()
+        try:
+            appointment = session.get(models.Appointment, appointment_id)
+            if random.random() < 0.5:
+                session.delete(appointment)
+            else:
+                appointment.status = "rejected"
+            session.commit()
+        finally:
+            session.close()
+
+    def worker(index: int):
+        for _ in range(args.attempts):
+            if index % 8 == 7:
+                if attempt(other_id) is not None:
+                    count("other_booked")
+                continue
+            appointment_id = attempt(vaccine_id)
+            if appointment_id is None:
+                count("full")
+                continue
+            count("booked")
+            if random.random() < args.release_rate:
+                release(appointment_id)
+                count("released")
+
+    watcher = threading.Thread(target=monitor, daemon=True)
+    watcher.start()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as threads:
+        list(threads.map(worker, range(args.threads)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    watcher.join()
+
+    final = holding()
+    db = database.SessionLocal()
+    slot = db.get(models.AppointmentSlot, (vaccine_id, day))
+    db.close()
+    attempts = counts["booked"] + counts["full"]
+    result = {
+        **counts,
+        "capacity": args.capacity,
+        "holding": final,
+        "slot_booked": slot.booked,
+        "attempts_per_s": round((attempts + counts["other_booked"]) / elapsed, 1),
+        "backend": database.engine.dialect.name,
+    }
+    problems = []
+    if counts["max_seen"] > args.capacity or final > args.capacity:
+        problems.append(f"overbooked: saw {counts['max_seen']} holding appointments for {args.capacity} places")
+    if slot.booked != final:
+        problems.append(f"slot counter {slot.booked} != {final} holding appointments")
+    if counts["booked"] - counts["released"] != final:
+        problems.append("released places were not given back")
+
+    if args.json:
+        print(json.dumps({**result, "problems": problems}, indent=2))
+    else:
+        for key, value in result.items():
+            print(f"{key:>15} {value}")
+    if problems:
+        raise SystemExit("; ".join(problems))
+    if not args.json:
+        print("never overbooked")
+
+
+if __name__ == "__main__":
+    main()
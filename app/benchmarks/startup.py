@@ -0,0 +1,152 @@
+"""Cold start, scale-out and throughput of the server, per worker count.
+
+    python -m app.benchmarks.startup --workers 1 2 4 --duration 10
+
+For every worker count, ``python -m app.serve`` is started on a free port and
+timed until /readyz answers (first worker ready) and until /healthz has been
+answered by every worker pid (all workers ready); then GET /vaccines/ is
+driven for ``--duration`` seconds to measure requests/s. A plain
+``uvicorn app.main:app`` is timed the same way for comparison, and the
+import time of ``app.main`` is measured in fresh interpreters. Without
+DATABASE_URL a temporary SQLite file is migrated to head first.
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+IMPORT_SNIPPET = "import time; t = time.perf_counter(); import app.main; print(time.perf_counter() - t)"
+
+
+def _database():
+    if not os.getenv("DATABASE_URL"):
+        path = os.path.join(tempfile.mkdtemp(), "startup.db")
+        os.environ["DATABASE_URL"] = f"sqlite:///{path}"
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+    subprocess.run([sys.executable, "-m", "alembic", "upgrade", "head"], cwd=ROOT, check=True,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def import_time(repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        out = subprocess.run([sys.executable, "-W", "ignore", "-c", IMPORT_SNIPPET], cwd=ROOT, check=True,
+                             capture_output=True, text=True).stdout
+        timings.append(float(out.strip().splitlines()[-1]))
+    return statistics.median(timings)
+
+
+async def _wait_ready(client, url: str, workers: int, start: float, timeout: float):
+    first_ready, pids = None, set()
+    while time.perf_counter() - start < timeout:
+        try:
+            if first_ready is None:
+                if (await client.get(f"{url}/readyz")).status_code == 200:
+                    first_ready = time.perf_counter() - start
+            # a new connection per probe, so the kernel spreads them over the workers
+            async with httpx.AsyncClient() as probe:
+                pids.add((await probe.get(f"{url}/healthz")).json()["pid"])
+            if first_ready is not None and len(pids) >= workers:
+                return first_ready, time.perf_counter() - start
+        except httpx.TransportError:
+            await asyncio.sleep(0.02)
+    raise TimeoutError(f"{workers} workers not ready after {timeout}s")
+
+
+async def _load(url: str, duration: float, concurrency: int) -> float:
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    done = 0
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=30) as client:
+        deadline = time.perf_counter() + duration
+
+        async def worker():
+            nonlocal done
+            while time.perf_counter() < deadline:
+                (await client.get("/vaccines/")).raise_for_status()
+                done += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return done / (time.perf_counter() - start)
+
+
+def run_server(command, workers: int, duration: float, concurrency: int, timeout: float) -> dict:
+    port = _free_port()
+    url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, PORT=str(port))
+    start = time.perf_counter()
+    process = subprocess.Popen(command(port, workers), cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        async def measure():
+            async with httpx.AsyncClient(timeout=5) as client:
+                first, every = await _wait_ready(client, url, workers, start, timeout)
+            rps = await _load(url, duration, concurrency) if duration > 0 else None
+            return first, every, rps
+
+        first, every, rps = asyncio.run(measure())
+    finally:
+        process.send_signal(signal.SIGTERM)
+        try:
+            process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    return {"first_ready_s": round(first, 3), "all_ready_s": round(every, 3),
+            "rps": round(rps, 1) if rps is not None else None}
+
+
+def _serve(port, workers):
+    return [sys.executable, "-m", "app.serve", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--no-access-log", "--log-level", "warning"]
+
+
+def _uvicorn(port, workers):
+    return [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+            "--workers", str(workers), "--no-access-log", "--log-level", "warning"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, os.cpu_count() or 1])
+    parser.add_argument("--duration", type=float, default=5.0, help="load seconds per run (0 skips the load)")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--imports", type=int, default=5, help="fresh interpreters timing the import")
+    parser.add_argument("--timeout", type=float, default=60.0)
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args()
+
+    _database()
+    results = {"import_s": round(import_time(args.imports), 3), "cores": os.cpu_count(), "runs": []}
+    for workers in sorted(set(args.workers)):
+        for name, command in (("app.serve", _serve), ("uvicorn", _uvicorn)):
+            run = run_server(command, workers, args.duration, args.concurrency, args.timeout)
+            results["runs"].append({"server": name, "workers": workers, **run})
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    print(f"import app.main: {results['import_s']} s ({results['cores']} cores)")
+    print(f"{'server':<10} {'workers':>7} {'first ready s':>14} {'all ready s':>12} {'req/s':>9}")
+    for run in results["runs"]:
+        print(f"{run['server']:<10} {run['workers']:>7} {run['first_ready_s']:>14} {run['all_ready_s']:>12} "
+              f"{run['rps'] if run['rps'] is not None else '-':>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,64 @@
+"""Driver-level bulk INSERT: PostgreSQL COPY, executemany elsewhere.
+
+Rows are tuples in ``columns`` order. Nothing goes through the ORM, so the
+session hooks (dashboard rollups, slot counters, user events) do not see
+these rows: callers adjust or rebuild those themselves.
+"""
+import csv
+import io
+
+from sqlalchemy import Table, insert, text
+from sqlalchemy.orm import Session
+from sqlalchemy.util import await_only
+
+PLACEHOLDERS = {"qmark": "?", "format": "%s", "pyformat": "%s"}
+
+
+def insert_rows(db: Session, table: Table, columns, rows: list, return_ids: bool = False):
+    """Insert ``rows``; with ``return_ids``, return their new ``id`` values in row order."""
+    conn = db.connection()
+    dialect = conn.dialect
+    if dialect.driver in ("psycopg2", "psycopg"):
+        ids = None
+        if return_ids:
+            # COPY returns nothing: the ids are drawn from the table's sequence first.
+            ids = list(conn.scalars(text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) "
+                                         "FROM generate_series(1, :count)"), {"table": table.name, "count": len(rows)}))
+            columns = ("id", *columns)
+            rows = [(row_id, *row) for row_id, row in zip(ids, rows)]
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        copy_sql = f"COPY {table.name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)"
+        raw = conn.connection.driver_connection
+        if dialect.is_async:
+            # Called through AsyncSession.run_sync: drive psycopg's async COPY from this greenlet.
+            await_only(_copy_async(raw, copy_sql, buffer.getvalue()))
+            return ids
+        with raw.cursor() as cursor:
+            if dialect.driver == "psycopg2":
+                buffer.seek(0)
+                cursor.copy_expert(copy_sql, buffer)
+            else:
+                with cursor.copy(copy_sql) as copy:
+                    copy.write(buffer.getvalue())
+        return ids
+    if return_ids:
+        stmt = insert(table).returning(table.c.id, sort_by_parameter_order=True)
+        return list(conn.execute(stmt, [dict(zip(columns, row)) for row in rows]).scalars())
+    # Driver-level executemany: no per-row parameter processing in SQLAlchemy,
+    # except the type conversions the dialect needs (e.g. SQLite datetimes).
+    processors = [table.c[name].type.dialect_impl(dialect).bind_processor(dialect) for name in columns]
+    if any(processors):
+        rows = [tuple(value if process is None or value is None else process(value)
+                      for process, value in zip(processors, row)) for row in rows]
+    placeholder = PLACEHOLDERS[dialect.paramstyle]
+    conn.exec_driver_sql(
+        f"INSERT INTO {table.name} ({', '.join(columns)}) VALUES ({', '.join([placeholder] * len(columns))})",
+        rows,
+    )
+
+
+async def _copy_async(raw, copy_sql: str, data: str):
+    async with raw.cursor() as cursor:
+        async with cursor.copy(copy_sql) as copy:
+            await copy.write(data)
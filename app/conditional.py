@@ -0,0 +1,79 @@
+import hashlib
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Optional
+
+from fastapi import Request, Response
+
+
+# --------------------------
+# VALIDATORS
+# --------------------------
+def make_etag(*parts) -> str:
+    """Weak ETag: the body is equivalent, not byte-identical (it may be compressed)."""
+    digest = hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # SQLite hands back naive timestamps; CURRENT_TIMESTAMP is UTC.
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def latest(*timestamps) -> Optional[datetime]:
+    """Most recent of ``timestamps`` (None entries ignored), in UTC."""
+    values = [_as_utc(value) for value in timestamps if value is not None]
+    return max(values) if values else None
+
+
+def is_conditional(request: Request) -> bool:
+    return "if-none-match" in request.headers or "if-modified-since" in request.headers
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == "*":
+        return True
+    # Weak comparison (RFC 9110 13.1.2): opaque tags equal, W/ prefix ignored.
+    opaque = etag.removeprefix("W/")
+    return any(tag.strip().removeprefix("W/") == opaque for tag in if_none_match.split(","))
+
+
+def is_not_modified(request: Request, etag: str, last_modified: Optional[datetime] = None) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    # If-None-Match wins: If-Modified-Since is only consulted without it.
+    if if_none_match is not None:
+        return _matches(if_none_match, etag)
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    # HTTP dates have whole-second resolution.
+    return _as_utc(last_modified).replace(microsecond=0) <= _as_utc(since)
+
+
+def validator_headers(etag: str, last_modified: Optional[datetime] = None) -> dict:
+    headers = {"ETag": etag}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(_as_utc(last_modified), usegmt=True)
+    return headers
+
+
+# --------------------------
+# ROUTE HELPER
+# --------------------------
+def conditional(request: Request, response: Response, etag: str,
+                last_modified: Optional[datetime] = None) -> Optional[Response]:
+    """Put the validators on ``response``; return a bodyless 304 if the client copy is current.
+
+    Routes return the 304 as-is, so the body is never loaded or serialized.
+    """
+    headers = validator_headers(etag, last_modified)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
@@ -1,11 +1,130 @@
 import os
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, declarative_base
+from .pool_monitor import TimedAsyncQueuePool, TimedQueuePool, monitor_pool
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
-engine = create_engine(DATABASE_URL)
+# "sync" serves the API from app/routers (threadpool + Session),
+# "async" from app/async_routers (event loop + AsyncSession).
+DB_MODE = os.getenv("DB_MODE", "sync")
+
+# --------------------------
+# CONNECTION POOL SETTINGS
+# --------------------------
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "10"))
+# Longest a request may wait for a pooled connection before failing with 503.
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5"))
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# Server-side statement timeout (PostgreSQL only); 0 disables it.
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "0"))
+
+
+def engine_options(url, async_driver: bool = False) -> dict:
+    url = make_url(url)
+    options = {"pool_pre_ping": DB_POOL_PRE_PING}
+    # In-memory SQLite keeps a single connection per thread and has no queue to size.
+    if not (url.get_backend_name() == "sqlite" and url.database in (None, "", ":memory:")):
+        options.update(
+            poolclass=TimedAsyncQueuePool if async_driver else TimedQueuePool,
+            pool_size=DB_POOL_SIZE,
+            max_overflow=DB_MAX_OVERFLOW,
+            pool_timeout=DB_POOL_TIMEOUT,
+            pool_recycle=DB_POOL_RECYCLE,
+        )
+    if url.get_backend_name() == "postgresql" and DB_STATEMENT_TIMEOUT_MS:
+        options["connect_args"] = {"options": f"-c statement_timeout={DB_STATEMENT_TIMEOUT_MS}"}
+    return options
+
+
+engine = create_engine(DATABASE_URL, pool_logging_name="primary", **engine_options(DATABASE_URL))
+monitor_pool(engine, "primary")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
 Base = declarative_base()
 
+
+# --------------------------
+# ASYNC ENGINE
+# --------------------------
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+psycopg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_database_url(url: str):
+    url = make_url(url)
+    return url.set(drivername=ASYNC_DRIVERS.get(url.get_backend_name(), url.drivername))
+
+
+async_engine = None
+AsyncSessionLocal = None
+
+if DB_MODE == "async":
+    ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_database_url(DATABASE_URL)
+    async_engine = create_async_engine(ASYNC_DATABASE_URL, pool_logging_name="primary_async",
+                                       **engine_options(ASYNC_DATABASE_URL, async_driver=True))
+    monitor_pool(async_engine.sync_engine, "primary_async")
+    # Objects stay loaded after commit: expiring them would force lazy IO
+    # outside the event loop when the response is serialized.
+    AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
+
+# --------------------------
+# READ REPLICA
+# --------------------------
+# Safe GET/HEAD requests read from REPLICA_DATABASE_URL (see app/read_routing.py);
+# unset, the replica names below are the primary's engine and sessions.
+REPLICA_DATABASE_URL = os.getenv("REPLICA_DATABASE_URL")
+
+
+class ReplicaWriteError(RuntimeError):
+    pass
+
+
+def _refuse_writes(conn, cursor, statement, parameters, context, executemany):
+    # A write routed to the replica is a routing bug: fail it loudly, even
+    # on a local stand-in database that would accept it.
+    if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+        raise ReplicaWriteError(f"Write sent to the read replica: {statement.split(None, 1)[0]}")
+
+
+replica_engine = engine
+ReplicaSessionLocal = SessionLocal
+async_replica_engine = async_engine
+AsyncReplicaSessionLocal = AsyncSessionLocal
+
+if REPLICA_DATABASE_URL:
+    replica_engine = create_engine(REPLICA_DATABASE_URL, pool_logging_name="replica",
+                                   **engine_options(REPLICA_DATABASE_URL))
+    monitor_pool(replica_engine, "replica")
+    event.listen(replica_engine, "before_cursor_execute", _refuse_writes)
+    ReplicaSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=replica_engine)
+    if DB_MODE == "async":
+        ASYNC_REPLICA_DATABASE_URL = (os.getenv("ASYNC_REPLICA_DATABASE_URL")
+                                      or async_database_url(REPLICA_DATABASE_URL))
+        async_replica_engine = create_async_engine(ASYNC_REPLICA_DATABASE_URL, pool_logging_name="replica_async",
+                                                   **engine_options(ASYNC_REPLICA_DATABASE_URL, async_driver=True))
+        monitor_pool(async_replica_engine.sync_engine, "replica_async")
+        event.listen(async_replica_engine.sync_engine, "before_cursor_execute", _refuse_writes)
+        AsyncReplicaSessionLocal = async_sessionmaker(async_replica_engine, autoflush=False, expire_on_commit=False)
+
+# --------------------------
+# FORK SAFETY
+# --------------------------
+# A forked worker must never reuse the parent's pooled connections (two
+# processes on one socket corrupt the protocol): it starts with empty pools
+# and leaves the inherited connections to the parent.
+def _reset_pools_after_fork():
+    for each in {engine, replica_engine}:
+        each.dispose(close=False)
+    for each in {async_engine, async_replica_engine} - {None}:
+        each.sync_engine.dispose(close=False)
+
+
+os.register_at_fork(after_in_child=_reset_pools_after_fork)
@@ -0,0 +1,129 @@
+"""The signed-in user's event stream, as Server-Sent Events or over a WebSocket.
+
+Instead of polling ``GET /appointments/{id}``, a citizen keeps one stream
+open and receives ``appointment.status`` and ``vaccination.*`` events as
+they commit (see app/events.py). Both transports resume after a reconnect:
+events after ``Last-Event-ID`` (header, or ``?last_event_id=``) are replayed
+from the table before live delivery starts. The replay overlaps the events
+just before that id, since ids do not commit in order: clients skip an id
+they have already handled.
+
+Browsers cannot set an Authorization header on EventSource or WebSocket,
+so the token may also come as ``?access_token=``.
+"""
+import os
+from typing import Optional
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from .database import SessionLocal
+from .events import HEARTBEAT, broker, replay
+from .query_budget import query_budget
+from .utils import Principal, get_current_user
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+# Idle seconds before a keep-alive (SSE comment / WebSocket ping message), so
+# proxies keep the connection and dead clients are noticed.
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+# Reconnect delay suggested to EventSource clients (milliseconds).
+SSE_RETRY_MS = 3000
+
+
+def _bearer(authorization: Optional[str], access_token: Optional[str]) -> Optional[str]:
+    if authorization and authorization.lower().startswith("bearer "):
+        return authorization[7:]
+    return access_token
+
+
+def _authenticate(token: Optional[str]) -> Principal:
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated",
+                            headers={"WWW-Authenticate": "Bearer"})
+    # A session of its own, closed before streaming: the stream never holds a pooled connection.
+    db = SessionLocal()
+    try:
+        return get_current_user(token, db)
+    finally:
+        db.close()
+
+
+def _last_event_id(header: Optional[str], query: Optional[int]) -> int:
+    if header:
+        try:
+            return int(header)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="Invalid Last-Event-ID")
+    return query or 0
+
+
+async def _subscribe(user: Principal, after_id: int):
+    """Subscribe before reading the backlog, so nothing committed in between is lost."""
+    subscription = broker.subscribe(user.id)
+    try:
+        backlog = await run_in_threadpool(replay, user.id, after_id)
+    except BaseException:
+        broker.unsubscribe(subscription)
+        raise
+    return subscription, backlog
+
+
+# GET own event stream (Server-Sent Events)
+@router.get("/stream", dependencies=[query_budget(None)])
+async def event_stream(request: Request, access_token: Optional[str] = None, last_event_id: Optional[int] = None):
+    user = await run_in_threadpool(_authenticate, _bearer(request.headers.get("authorization"), access_token))
+    after_id = _last_event_id(request.headers.get("last-event-id"), last_event_id)
+    subscription, backlog = await _subscribe(user, after_id)
+
+    async def body():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n".encode()
+            for item in backlog:
+                yield item.sse()
+            replayed = {item.id for item in backlog}
+            while True:
+                item = await subscription.next(EVENT_HEARTBEAT_SECONDS)
+                if item is None:  # dropped as a slow consumer, or shutting down: the client resumes
+                    return
+                if item is HEARTBEAT:
+                    yield b": ping\n\n"
+                elif item.id not in replayed:
+                    yield item.sse()
+        finally:
+            broker.unsubscribe(subscription)
+
+    return StreamingResponse(body(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+# WebSocket own event stream: one JSON message per event
+@router.websocket("/ws")
+async def event_socket(websocket: WebSocket, access_token: Optional[str] = None, last_event_id: Optional[int] = None):
+    try:
+        user = await run_in_threadpool(
+            _authenticate, _bearer(websocket.headers.get("authorization"), access_token))
+    except HTTPException:
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+    await websocket.accept()
+    subscription, backlog = await _subscribe(user, last_event_id or 0)
+    try:
+        for item in backlog:
+            await websocket.send_text(item.json())
+        replayed = {item.id for item in backlog}
+        while True:
+            item = await subscription.next(EVENT_HEARTBEAT_SECONDS)
+            if item is None:
+                # 1013 "try again later" for a dropped slow consumer, 1001 on shutdown
+                await websocket.close(code=status.WS_1013_TRY_AGAIN_LATER if subscription.dropped
+                                      else status.WS_1001_GOING_AWAY)
+                return
+            if item is HEARTBEAT:
+                await websocket.send_text('{"type":"ping"}')
+            elif item.id not in replayed:
+                await websocket.send_text(item.json())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,363 @@
+"""Per-user events: appointment status and vaccination changes, pushed as they commit.
+
+Every write that changes an appointment's status or a vaccination records an
+event row in ``user_events`` in the same transaction: ORM writes (both
+stacks) through a session ``after_flush`` hook, set-based writes (bulk status
+changes, bulk vaccination imports) by calling ``record``. Once committed,
+events reach the in-process ``broker``, which fans them out to the citizen's
+open streams (see app/event_stream.py). How a commit reaches the broker of
+every worker is the backend's job (EVENT_BACKEND):
+
+- ``local``: the committing process delivers its own events after commit.
+  Enough for one worker (development, tests); other processes miss them.
+- ``postgres``: a trigger on ``user_events`` sends a NOTIFY that PostgreSQL
+  delivers at commit to a LISTEN connection in every worker. Only workers
+  with a stream open for that user load the events.
+
+A stream that falls EVENT_QUEUE_SIZE events behind is dropped; the client
+reconnects with its last event id and the gap is replayed from the table.
+Ids are taken at insert but transactions commit in any order, so a replay
+also repeats the events created EVENT_REPLAY_OVERLAP_SECONDS before that id:
+delivery is at least once, and clients drop ids they already have.
+
+    python -m app.events --prune
+
+deletes events older than EVENT_RETENTION_HOURS.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from typing import NamedTuple
+
+import orjson
+from sqlalchemy import delete, event, insert, or_, select
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import Session
+from . import database, metrics, models
+from .stats import flush_changed, flush_values
+
+logger = logging.getLogger("app.events")
+
+# --------------------------
+# SETTINGS
+# --------------------------
+# "auto" picks postgres when the primary database is PostgreSQL, local otherwise.
+EVENT_BACKEND = os.getenv("EVENT_BACKEND", "auto")
+# Undelivered events a stream may hold before it is dropped as a slow consumer.
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "100"))
+EVENT_RETENTION_HOURS = float(os.getenv("EVENT_RETENTION_HOURS", "72"))
+# Events loaded per query when a stream resumes.
+EVENT_REPLAY_BATCH = 500
+# A resume also replays events created this long before its Last-Event-ID: one
+# whose transaction committed after a higher id was delivered is not skipped.
+EVENT_REPLAY_OVERLAP_SECONDS = float(os.getenv("EVENT_REPLAY_OVERLAP_SECONDS", "10"))
+
+EVENTS = models.UserEvent.__table__
+PENDING_KEY = "pending_user_events"
+
+APPOINTMENT_EVENT_KEYS = ("citizen_id", "status", "reason_rejection")
+VACCINATION_EVENT_KEYS = ("citizen_id", "appointment_id", "vaccine_id", "dose_number", "batch_number")
+
+
+class Event(NamedTuple):
+    id: int
+    user_id: int
+    type: str
+    payload: str  # JSON object
+
+    def sse(self) -> bytes:
+        return f"id: {self.id}\nevent: {self.type}\ndata: {self.payload}\n\n".encode()
+
+    def json(self) -> str:
+        return f'{{"id":{self.id},"type":"{self.type}","data":{self.payload}}}'
+
+
+# --------------------------
+# RECORDING (in the writing transaction)
+# --------------------------
+def record(db: Session, pending):
+    """Insert ``[(user_id, type, data)]`` as events; they are delivered when the transaction commits."""
+    pending = [item for item in pending if item[0] is not None]
+    if not pending:
+        return
+    now = datetime.now(timezone.utc)
+    rows = [{"user_id": user_id, "type": type_, "created_at": now,
+             "payload": orjson.dumps({**data, "at": now}, option=orjson.OPT_UTC_Z).decode()}
+            for user_id, type_, data in pending]
+    if not backend.delivers_after_commit:
+        db.connection().execute(insert(EVENTS), rows)
+        return
+    stmt = insert(EVENTS).returning(EVENTS.c.id, sort_by_parameter_order=True)
+    ids = db.connection().execute(stmt, rows).scalars().all()
+    db.info.setdefault(PENDING_KEY, []).extend(Event(event_id, row["user_id"], row["type"], row["payload"])
+                                               for event_id, row in zip(ids, rows))
+
+
+def status_event(appointment_id: int, citizen_id: int, status: str, reason_rejection=None):
+    return citizen_id, "appointment.status", {
+        "appointment_id": appointment_id, "status": status, "reason_rejection": reason_rejection}
+
+
+def vaccination_event(type_: str, vaccination_id: int, citizen_id: int, appointment_id: int, vaccine_id: int,
+                      dose_number: int, batch_number=None):
+    return citizen_id, type_, {"vaccination_id": vaccination_id, "appointment_id": appointment_id,
+                               "vaccine_id": vaccine_id, "dose_number": dose_number, "batch_number": batch_number}
+
+
+def _vaccination_event(type_: str, obj, old: bool = False):
+    return vaccination_event(type_, obj.id, *flush_values(obj, VACCINATION_EVENT_KEYS, old))
+
+
+@event.listens_for(Session, "after_flush")
+def _record_writes(session: Session, flush_context):
+    pending = []
+    for obj in session.new:
+        if isinstance(obj, models.Vaccination):
+            pending.append(_vaccination_event("vaccination.recorded", obj))
+    for obj in session.dirty:
+        if isinstance(obj, models.Appointment) and flush_changed(obj, ("status",)):
+            pending.append(status_event(obj.id, *flush_values(obj, APPOINTMENT_EVENT_KEYS, old=False)))
+        elif isinstance(obj, models.Vaccination) and flush_changed(obj, VACCINATION_EVENT_KEYS):
+            pending.append(_vaccination_event("vaccination.updated", obj))
+    for obj in session.deleted:
+        if isinstance(obj, models.Vaccination):
+            pending.append(_vaccination_event("vaccination.deleted", obj, old=True))
+    record(session, pending)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_committed(session: Session):
+    events = session.info.pop(PENDING_KEY, None)
+    if events:
+        broker.publish(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session):
+    session.info.pop(PENDING_KEY, None)
+
+
+# --------------------------
+# READS
+# --------------------------
+def replay(user_id: int, after_id: int):
+    """Committed events of ``user_id`` after ``after_id``, oldest first (read on the primary).
+
+    Events created up to EVENT_REPLAY_OVERLAP_SECONDS before ``after_id`` come
+    again, whatever their id: the client may already have some of them.
+    """
+    events = []
+    with database.engine.connect() as conn:
+        wanted = EVENTS.c.id > after_id
+        since = conn.scalar(select(EVENTS.c.created_at).where(EVENTS.c.id == after_id,
+                                                                EVENTS.c.user_id == user_id)) if after_id else None
+        if since is not None:
+            overlap = since - timedelta(seconds=EVENT_REPLAY_OVERLAP_SECONDS)
+            wanted = or_(wanted, (EVENTS.c.created_at >= overlap) & (EVENTS.c.id != after_id))
+        position = 0
+        while True:
+            rows = conn.execute(
+                select(EVENTS.c.id, EVENTS.c.user_id, EVENTS.c.type, EVENTS.c.payload)
+                .where(EVENTS.c.user_id == user_id, EVENTS.c.id > position, wanted)
+                .order_by(EVENTS.c.id).limit(EVENT_REPLAY_BATCH)
+            ).all()
+            events.extend(Event(*row) for row in rows)
+            if len(rows) < EVENT_REPLAY_BATCH:
+                return events
+            position = rows[-1].id
+
+
+def load(event_ids):
+    with database.engine.connect() as conn:
+        rows = conn.execute(
+            select(EVENTS.c.id, EVENTS.c.user_id, EVENTS.c.type, EVENTS.c.payload)
+            .where(EVENTS.c.id.in_(event_ids)).order_by(EVENTS.c.id)
+        ).all()
+    return [Event(*row) for row in rows]
+
+
+def prune(db: Session, hours: float = EVENT_RETENTION_HOURS) -> int:
+    cutoff = datetime.now(timezone.utc) - timedelta(hours=hours)
+    deleted = db.execute(delete(EVENTS).where(EVENTS.c.created_at < cutoff)).rowcount
+    db.commit()
+    return deleted
+
+
+# --------------------------
+# BROKER (one per process, on the event loop)
+# --------------------------
+CLOSED = object()
+HEARTBEAT = object()
+
+
+class Subscription:
+    def __init__(self, user_id: int, size: int):
+        self.user_id = user_id
+        self.queue = asyncio.Queue(size)
+        self.dropped = False
+
+    def offer(self, item) -> bool:
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except asyncio.QueueFull:
+            return False
+
+    def close(self, dropped: bool = False):
+        self.dropped = dropped
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(CLOSED)
+
+    async def next(self, timeout: float):
+        """The next event, HEARTBEAT after ``timeout`` idle seconds, or None once closed."""
+        try:
+            item = await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return HEARTBEAT
+        return None if item is CLOSED else item
+
+
+class Broker:
+    def __init__(self, queue_size: int):
+        self.queue_size = queue_size
+        self._subscriptions = defaultdict(set)
+        self._loop = None
+
+    async def start(self):
+        self._loop = asyncio.get_running_loop()
+        await backend.start(self)
+
+    async def stop(self):
+        await backend.stop()
+        for subscriptions in self._subscriptions.values():
+            for subscription in subscriptions:
+                subscription.close()
+        self._subscriptions.clear()
+        self._loop = None
+
+    def subscribe(self, user_id: int) -> Subscription:
+        subscription = Subscription(user_id, self.queue_size)
+        self._subscriptions[user_id].add(subscription)
+        metrics.EVENT_STREAMS.inc()
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        subscriptions = self._subscriptions.get(subscription.user_id)
+        if subscriptions is not None and subscription in subscriptions:
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self._subscriptions[subscription.user_id]
+            metrics.EVENT_STREAMS.dec()
+
+    def watching(self, user_id: int) -> bool:
+        return user_id in self._subscriptions
+
+    def publish(self, events):
+        """Hand committed events to the loop; safe from any thread."""
+        loop = self._loop
+        if loop is not None and not loop.is_closed():
+            loop.call_soon_threadsafe(self.deliver, events)
+
+    def deliver(self, events):
+        for item in events:
+            for subscription in list(self._subscriptions.get(item.user_id, ())):
+                if subscription.offer(item):
+                    metrics.EVENTS_DELIVERED.inc()
+                else:
+                    # Slow consumer: drop the stream rather than buffer without bound.
+                    self.unsubscribe(subscription)
+                    subscription.close(dropped=True)
+                    metrics.EVENT_STREAMS_DROPPED.inc()
+
+
+# --------------------------
+# BACKENDS
+# --------------------------
+class LocalBackend:
+    name = "local"
+    # Events are kept on the session (with their ids) and published by the committing process.
+    delivers_after_commit = True
+
+    async def start(self, broker: Broker):
+        pass
+
+    async def stop(self):
+        pass
+
+
+class PostgresBackend:
+    """LISTEN on its own connection; NOTIFY comes from the user_events trigger."""
+    name = "postgres"
+    # The trigger's NOTIFY carries the new ids, so rows are inserted without RETURNING.
+    delivers_after_commit = False
+
+    def __init__(self, url):
+        self.dsn = make_url(url).set(drivername="postgresql").render_as_string(hide_password=False)
+        self._task = None
+
+    async def start(self, broker: Broker):
+        self._task = asyncio.create_task(self._listen(broker))
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _listen(self, broker: Broker):
+        import psycopg
+
+        while True:
+            try:
+                conn = await psycopg.AsyncConnection.connect(self.dsn, autocommit=True)
+                async with conn:
+                    await conn.execute(f"LISTEN {models.USER_EVENT_NOTIFY_CHANNEL}")
+                    async for notification in conn.notifies():
+                        wanted = [event_id for event_id, user_id in json.loads(notification.payload)
+                                  if broker.watching(user_id)]
+                        if wanted:
+                            broker.deliver(await asyncio.to_thread(load, wanted))
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Streams miss what is committed meanwhile; clients resume by event id.
+                logger.exception("event listener failed, reconnecting")
+                await asyncio.sleep(1)
+
+
+def _backend():
+    name = EVENT_BACKEND
+    if name == "auto":
+        name = "postgres" if make_url(database.DATABASE_URL).get_backend_name() == "postgresql" else "local"
+    if name == "postgres":
+        return PostgresBackend(database.DATABASE_URL)
+    if name == "local":
+        return LocalBackend()
+    raise ValueError(f"Unknown EVENT_BACKEND {name!r}")
+
+
+backend = _backend()
+broker = Broker(EVENT_QUEUE_SIZE)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the user event table")
+    parser.add_argument("--prune", action="store_true", help="delete events older than --hours")
+    parser.add_argument("--hours", type=float, default=EVENT_RETENTION_HOURS)
+    args = parser.parse_args(argv)
+    if not args.prune:
+        parser.error("nothing to do (use --prune)")
+    db = database.SessionLocal()
+    try:
+        print(f"deleted {prune(db, args.hours)} events older than {args.hours:g} hours")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,214 @@
+"""Streaming CSV/NDJSON dumps of vaccinations and appointments.
+
+    python -m app.exports vaccinations --from 2030-01-01 --to 2030-02-01 -o january.csv
+
+Rows are selected as plain column tuples (no ORM objects) from a
+server-side cursor and written ``EXPORT_CHUNK_SIZE`` rows at a time, so
+memory stays flat whatever the size of the dump.
+"""
+import argparse
+import csv
+import io
+import json
+import os
+import sys
+from datetime import date, datetime
+from typing import Optional
+
+from fastapi import HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.orm import aliased
+from . import models
+from .pagination import NDJSON_MEDIA_TYPE
+
+# --------------------------
+# SETTINGS
+# --------------------------
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", "5000"))
+
+EXPORT_FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv; charset=utf-8", "ndjson": NDJSON_MEDIA_TYPE}
+
+
+# --------------------------
+# EXPORTABLE DATASETS
+# --------------------------
+class ExportSpec:
+    def __init__(self, name, columns, joins, date_column, vaccine_column, status_column=None):
+        self.name = name
+        self.columns = columns  # output name -> column expression, in default order
+        self.joins = joins  # (target, onclause) pairs from the first column's table
+        self.date_column = date_column
+        self.vaccine_column = vaccine_column
+        self.status_column = status_column
+
+
+_citizen = aliased(models.User, name="citizen")
+
+VACCINATIONS = ExportSpec(
+    "vaccinations",
+    {
+        "id": models.Vaccination.id,
+        "vaccination_date": models.Vaccination.vaccination_date,
+        "dose_number": models.Vaccination.dose_number,
+        "batch_number": models.Vaccination.batch_number,
+        "vaccine_id": models.Vaccination.vaccine_id,
+        "vaccine_name": models.Vaccine.name,
+        "citizen_id": models.Vaccination.citizen_id,
+        "citizen_name": _citizen.full_name,
+        "citizen_email": _citizen.email,
+        "appointment_id": models.Vaccination.appointment_id,
+        "admin_id": models.Vaccination.admin_id,
+    },
+    [(models.Vaccine, models.Vaccine.id == models.Vaccination.vaccine_id),
+     (_citizen, _citizen.id == models.Vaccination.citizen_id)],
+    models.Vaccination.vaccination_date,
+    models.Vaccination.vaccine_id,
+)
+
+APPOINTMENTS = ExportSpec(
+    "appointments",
+    {
+        "id": models.Appointment.id,
+        "preferred_date": models.Appointment.preferred_date,
+        "status": models.Appointment.status,
+        "reason_rejection": models.Appointment.reason_rejection,
+        "vaccine_id": models.Appointment.vaccine_id,
+        "vaccine_name": models.Vaccine.name,
+        "citizen_id": models.Appointment.citizen_id,
+        "citizen_name": _citizen.full_name,
+        "citizen_email": _citizen.email,
+        "admin_id": models.Appointment.admin_id,
+        "created_at": models.Appointment.created_at,
+    },
+    [(models.Vaccine, models.Vaccine.id == models.Appointment.vaccine_id),
+     (_citizen, _citizen.id == models.Appointment.citizen_id)],
+    models.Appointment.preferred_date,
+    models.Appointment.vaccine_id,
+    models.Appointment.status,
+)
+
+EXPORTS = {spec.name: spec for spec in (VACCINATIONS, APPOINTMENTS)}
+
+
+# --------------------------
+# EXPORT PARAMETERS (dependency)
+# --------------------------
+class ExportParams:
+    def __init__(
+        self,
+        format: str = Query("csv", pattern="^(csv|ndjson)$"),
+        columns: Optional[str] = Query(None, description="comma-separated subset of the columns"),
+        date_from: Optional[datetime] = None,
+        date_to: Optional[datetime] = None,
+        vaccine_id: Optional[int] = None,
+        status: Optional[str] = None,
+    ):
+        self.format = format
+        self.columns = [name.strip() for name in columns.split(",") if name.strip()] if columns else None
+        self.date_from = date_from
+        self.date_to = date_to
+        self.vaccine_id = vaccine_id
+        self.status = status
+
+
+def export_statement(spec: ExportSpec, params: ExportParams):
+    """Projected, filtered SELECT for ``spec`` plus the output column names."""
+    names = params.columns or list(spec.columns)
+    unknown = [name for name in names if name not in spec.columns]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}")
+    first = next(iter(spec.columns.values()))
+    stmt = select(*(spec.columns[name].label(name) for name in names)).select_from(first.table)
+    for target, onclause in spec.joins:
+        stmt = stmt.outerjoin(target, onclause)
+    if params.date_from is not None:
+        stmt = stmt.where(spec.date_column >= params.date_from)
+    if params.date_to is not None:
+        stmt = stmt.where(spec.date_column < params.date_to)
+    if params.vaccine_id is not None:
+        stmt = stmt.where(spec.vaccine_column == params.vaccine_id)
+    if params.status is not None:
+        if spec.status_column is None:
+            raise HTTPException(status_code=400, detail=f"{spec.name} cannot be filtered by status")
+        stmt = stmt.where(spec.status_column == params.status)
+    stmt = stmt.order_by(first).execution_options(stream_results=True, yield_per=EXPORT_CHUNK_SIZE)
+    return stmt, names
+
+
+# --------------------------
+# ENCODING
+# --------------------------
+def _json_value(value):
+    return value.isoformat() if isinstance(value, (datetime, date)) else value
+
+
+def encode_partition(rows, names, fmt: str) -> str:
+    if fmt == "ndjson":
+        return "".join(json.dumps(dict(zip(names, map(_json_value, row))), default=str) + "\n" for row in rows)
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(rows)
+    return buffer.getvalue()
+
+
+def _header(names, fmt: str) -> str:
+    return ",".join(names) + "\r\n" if fmt == "csv" else ""
+
+
+def iter_export(db, stmt, names, fmt: str):
+    """Sync generator of text chunks from a server-side cursor."""
+    yield _header(names, fmt)
+    # Core execution on the session's connection: rows skip the ORM loading layer.
+    for partition in db.connection().execute(stmt).partitions():
+        yield encode_partition(partition, names, fmt)
+
+
+async def iter_export_async(db, stmt, names, fmt: str):
+    yield _header(names, fmt)
+    result = await (await db.connection()).stream(stmt)
+    async for partition in result.partitions():
+        yield encode_partition(partition, names, fmt)
+
+
+def export_response(chunks, spec: ExportSpec, params: ExportParams) -> StreamingResponse:
+    filename = f"{spec.name}.{params.format}"
+    return StreamingResponse(chunks, media_type=MEDIA_TYPES[params.format],
+                             headers={"Content-Disposition": f'attachment; filename="{filename}"'})
+
+
+# --------------------------
+# CLI
+# --------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream a CSV/NDJSON export")
+    parser.add_argument("dataset", choices=sorted(EXPORTS))
+    parser.add_argument("--format", choices=EXPORT_FORMATS, default="csv")
+    parser.add_argument("--columns", help="comma-separated subset of the columns")
+    parser.add_argument("--from", dest="date_from", type=datetime.fromisoformat)
+    parser.add_argument("--to", dest="date_to", type=datetime.fromisoformat)
+    parser.add_argument("--vaccine-id", type=int)
+    parser.add_argument("--status")
+    parser.add_argument("-o", "--output", help="default: stdout")
+    args = parser.parse_args(argv)
+    from .database import SessionLocal
+
+    spec = EXPORTS[args.dataset]
+    params = ExportParams(args.format, args.columns, args.date_from, args.date_to, args.vaccine_id, args.status)
+    try:
+        stmt, names = export_statement(spec, params)
+    except HTTPException as error:
+        parser.error(error.detail)
+    out = open(args.output, "w", newline="", encoding="utf-8") if args.output else sys.stdout
+    db = SessionLocal()
+    try:
+        for chunk in iter_export(db, stmt, names, args.format):
+            out.write(chunk)
+    finally:
+        db.close()
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
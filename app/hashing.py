@@ -0,0 +1,119 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from passlib.context import CryptContext
+
+# --------------------------
+# SETTINGS
+# --------------------------
+# PBKDF2 work factor. Hashes stored with other rounds are upgraded on the next successful login.
+PASSWORD_HASH_ROUNDS = int(os.getenv("PASSWORD_HASH_ROUNDS", "29000"))
+# Worker processes doing the hashing; 0 hashes inline in the calling thread.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(os.cpu_count() or 1)))
+# Hash jobs allowed to wait for a worker before new ones are refused.
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(max(PASSWORD_HASH_WORKERS, 1) * 8)))
+# Scheduling priority offset of the workers: when cores are short, serving requests preempts a login storm's hashing.
+PASSWORD_HASH_NICE = int(os.getenv("PASSWORD_HASH_NICE", "10"))
+
+# This module only imports passlib so worker processes stay light.
+pwd_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    deprecated="auto",
+    pbkdf2_sha256__default_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__min_rounds=PASSWORD_HASH_ROUNDS,
+    pbkdf2_sha256__max_rounds=PASSWORD_HASH_ROUNDS,
+)
+
+
+class HashingBusy(RuntimeError):
+    pass
+
+
+def _hash(password: str):
+    return pwd_context.hash(password)
+
+
+def _verify_and_update(plain_password: str, hashed_password: str):
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+def _init_worker(nice: int):
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+
+
+# --------------------------
+# PROCESS POOL
+# --------------------------
+_executor = None
+_executor_pid = None
+_executor_lock = threading.Lock()
+_pending = threading.BoundedSemaphore(PASSWORD_HASH_MAX_PENDING)
+
+
+def _get_executor():
+    global _executor, _executor_pid
+    # A pool inherited through fork() belongs to the parent: start our own.
+    if _executor is None or _executor_pid != os.getpid():
+        with _executor_lock:
+            if _executor is None or _executor_pid != os.getpid():
+                # spawn: forking a server that already runs threads is not safe
+                _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS,
+                                                mp_context=multiprocessing.get_context("spawn"),
+                                                initializer=_init_worker, initargs=(PASSWORD_HASH_NICE,))
+                _executor_pid = os.getpid()
+    return _executor
+
+
+def _submit(fn, *args):
+    if not _pending.acquire(blocking=False):
+        raise HashingBusy("Too many password hashing jobs pending")
+    try:
+        future = _get_executor().submit(fn, *args)
+    except BaseException:
+        _pending.release()
+        raise
+    future.add_done_callback(lambda _: _pending.release())
+    return future
+
+
+def shutdown():
+    global _executor
+    if _executor is not None and _executor_pid == os.getpid():
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+
+
+# --------------------------
+# PUBLIC API
+# --------------------------
+def hash_password(password: str):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return _hash(password)
+    return _submit(_hash, password).result()
+
+
+def verify_and_update_password(plain_password: str, hashed_password: str):
+    """Return ``(valid, new_hash)``; ``new_hash`` is set when the stored hash uses outdated rounds."""
+    if PASSWORD_HASH_WORKERS <= 0:
+        return _verify_and_update(plain_password, hashed_password)
+    return _submit(_verify_and_update, plain_password, hashed_password).result()
+
+
+def verify_password(plain_password: str, hashed_password: str):
+    return verify_and_update_password(plain_password, hashed_password)[0]
+
+
+async def hash_password_async(password: str):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return _hash(password)
+    return await asyncio.wrap_future(_submit(_hash, password))
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str):
+    if PASSWORD_HASH_WORKERS <= 0:
+        return _verify_and_update(plain_password, hashed_password)
+    return await asyncio.wrap_future(_submit(_verify_and_update, plain_password, hashed_password))
@@ -0,0 +1,70 @@
+import asyncio
+import os
+
+from fastapi import APIRouter, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import text
+
+from . import database, migrations
+from .pool_monitor import POOL_STATS
+
+router = APIRouter(tags=["Health"])
+
+# Longest /readyz waits for a pooled connection and SELECT 1 (seconds).
+READY_TIMEOUT = float(os.getenv("READY_TIMEOUT", "2"))
+
+# Cleared by the shutdown hook so load balancers stop routing to a draining worker.
+accepting = True
+
+
+def _pool(name: str) -> dict:
+    stats = POOL_STATS.get(name)
+    return stats.snapshot() if stats is not None else {}
+
+
+def _ping_sync(engine):
+    with engine.connect() as connection:
+        connection.execute(text("SELECT 1"))
+
+
+async def _ping_async(engine):
+    async with engine.connect() as connection:
+        await connection.execute(text("SELECT 1"))
+
+
+async def _ping(primary: bool) -> bool:
+    if database.async_engine is not None:
+        ping = _ping_async(database.async_engine if primary else database.async_replica_engine)
+    else:
+        ping = run_in_threadpool(_ping_sync, database.engine if primary else database.replica_engine)
+    try:
+        await asyncio.wait_for(ping, READY_TIMEOUT)
+        return True
+    except Exception:
+        return False
+
+
+# GET liveness: the process answers; no database access.
+@router.get("/healthz", include_in_schema=False)
+def healthz():
+    return {"status": "ok", "pid": os.getpid()}
+
+
+# GET readiness: schema checked, a pooled connection (and the replica's) answers, not shutting down.
+@router.get("/readyz", include_in_schema=False)
+async def readyz(response: Response):
+    suffix = "_async" if database.async_engine is not None else ""
+    checks = {"schema": migrations.schema_ready, "accepting": accepting, "database": False}
+    if database.REPLICA_DATABASE_URL:
+        checks["replica"] = False
+    if checks["schema"] and accepting:
+        checks["database"] = await _ping(primary=True)
+        if "replica" in checks:
+            checks["replica"] = await _ping(primary=False)
+    ready = all(checks.values())
+    if not ready:
+        response.status_code = 503
+    body = {"status": "ready" if ready else "unavailable", "checks": checks, "pool": _pool("primary" + suffix)}
+    if "replica" in checks:
+        body["replica_pool"] = _pool("replica" + suffix)
+    return body
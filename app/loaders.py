@@ -0,0 +1,15 @@
+import os
+from sqlalchemy.orm import raiseload
+
+# --------------------------
+# EAGER LOADING
+# --------------------------
+# Set RAISE_ON_LAZY_LOAD=1 (tests) to make any relationship that a router did
+# not load explicitly raise instead of silently firing one SELECT per row.
+RAISE_ON_LAZY_LOAD = os.getenv("RAISE_ON_LAZY_LOAD", "0") == "1"
+
+
+def eager(*options):
+    if RAISE_ON_LAZY_LOAD:
+        return (*options, raiseload("*"))
+    return options
@@ -1,14 +1,116 @@
-from fastapi import FastAPI
-from .database import engine, Base
+import os
+
+from fastapi import FastAPI, Request
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
+from sqlalchemy import exc
+from .database import engine, DB_MODE, REPLICA_DATABASE_URL
+from .query_budget import ENFORCE_QUERY_BUDGETS, QueryBudgetMiddleware
+from .metrics import METRICS_ENABLED, MetricsMiddleware
+from .read_routing import ReadRoutingMiddleware
+from .slots import SlotFull
+from .article_search import SearchUnavailable
+from . import admission
+from . import event_stream
+from . import events
+from . import hashing
+from . import health
+from . import metrics
+from . import migrations
 from . import models
-from .routers import users, auth ,vaccine, appointment, vaccination, awareness_article
 
+if DB_MODE == "async":
+    from .async_routers import users, auth, vaccine, appointment, vaccination, awareness_article, stats, appointment_slot, analytics
+else:
+    from .routers import users, auth ,vaccine, appointment, vaccination, awareness_article, stats, appointment_slot, analytics
+
+
+# Responses smaller than this (bytes) are sent uncompressed; 0 disables compression.
+COMPRESSION_MIN_SIZE = int(os.getenv("COMPRESSION_MIN_SIZE", "1024"))
+
+try:  # brotli is optional; gzip covers clients (and installs) without it
+    from brotli_asgi import BrotliMiddleware
+except ImportError:
+    BrotliMiddleware = None
 
 app = FastAPI()
 
+if COMPRESSION_MIN_SIZE > 0:
+    if BrotliMiddleware is not None:
+        app.add_middleware(BrotliMiddleware, minimum_size=COMPRESSION_MIN_SIZE, gzip_fallback=True)
+    else:
+        app.add_middleware(GZipMiddleware, minimum_size=COMPRESSION_MIN_SIZE)
+
+if ENFORCE_QUERY_BUDGETS:
+    app.add_middleware(QueryBudgetMiddleware)
+
+# GET/HEAD read the replica, except shortly after the client's own write.
+if REPLICA_DATABASE_URL:
+    app.add_middleware(ReadRoutingMiddleware)
+
+# Outermost, so latencies include compression.
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
+# A pool checkout that exceeded DB_POOL_TIMEOUT, or a statement cancelled by
+# DB_STATEMENT_TIMEOUT_MS: shed the request instead of letting it queue.
+@app.exception_handler(exc.TimeoutError)
+def database_busy(request: Request, error: exc.TimeoutError):
+    return JSONResponse(status_code=503, content={"detail": "Database busy, retry later"},
+                        headers={"Retry-After": "1"})
+
+@app.exception_handler(exc.OperationalError)
+def database_error(request: Request, error: exc.OperationalError):
+    sqlstate = getattr(error.orig, "pgcode", None) or getattr(error.orig, "sqlstate", None)
+    if sqlstate == "57014":  # query_canceled
+        return JSONResponse(status_code=503, content={"detail": "Database query timed out"},
+                            headers={"Retry-After": "1"})
+    raise error
+
+@app.exception_handler(hashing.HashingBusy)
+def hashing_busy(request: Request, error: hashing.HashingBusy):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, retry later"},
+                        headers={"Retry-After": "1"})
+
+# Admission control (app/admission.py): out of tokens, or the route class is at its in-flight cap.
+@app.exception_handler(admission.RateLimited)
+def rate_limited(request: Request, error: admission.RateLimited):
+    return JSONResponse(status_code=429, content={"detail": "Too many requests"},
+                        headers={"Retry-After": admission.retry_after(error)})
+
+@app.exception_handler(admission.Overloaded)
+def overloaded(request: Request, error: admission.Overloaded):
+    return JSONResponse(status_code=503, content={"detail": "Server busy, retry later"},
+                        headers={"Retry-After": "1"})
+
+# Article search exists on PostgreSQL and SQLite only.
+@app.exception_handler(SearchUnavailable)
+def search_unavailable(request: Request, error: SearchUnavailable):
+    return JSONResponse(status_code=501, content={"detail": str(error)})
+
+# A booking (or a bulk re-approval) that found its vaccine/day slot full.
+@app.exception_handler(SlotFull)
+def slot_full(request: Request, error: SlotFull):
+    return JSONResponse(status_code=409, content={"detail": str(error)})
+
+# Schema changes belong to `alembic upgrade head`: startup only checks the revision.
 @app.on_event("startup")
 def startup():
-    Base.metadata.create_all(bind=engine)
+    migrations.prepare_schema(engine)
+
+@app.on_event("shutdown")
+def shutdown():
+    health.accepting = False
+    hashing.shutdown()
+
+# The event broker lives on this worker's loop (and its LISTEN connection on PostgreSQL).
+@app.on_event("startup")
+async def start_events():
+    await events.broker.start()
+
+@app.on_event("shutdown")
+async def stop_events():
+    await events.broker.stop()
 
 app.include_router(users.router)
 app.include_router(auth.router)
@@ -16,7 +118,26 @@ app.include_router(vaccine.router)
 app.include_router(appointment.router)
 app.include_router(vaccination.router)
 app.include_router(awareness_article.router)
+app.include_router(stats.router)
+app.include_router(appointment_slot.router)
+app.include_router(analytics.router)
+app.include_router(health.router)
+app.include_router(event_stream.router)
 
 @app.get("/")
 def root():
     return {"message": "Vaccination API is running"}
+
+# Prometheus scrape endpoint: this process, or every worker's summed under app.serve (metrics.METRICS_DIR).
+if METRICS_ENABLED:
+    @app.on_event("startup")
+    def start_metrics():
+        metrics.start_flushing()
+
+    @app.on_event("shutdown")
+    def stop_metrics():
+        metrics.stop_flushing()
+
+    @app.get("/metrics", include_in_schema=False)
+    def prometheus_metrics():
+        return Response(metrics.render(), media_type=metrics.CONTENT_TYPE)
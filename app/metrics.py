@@ -0,0 +1,470 @@
+import json
+import logging
+import os
+import re
+import threading
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from .pool_monitor import POOL_STATS
+
+logger = logging.getLogger("app.metrics")
+slow_query_logger = logging.getLogger("app.slow_queries")
+
+# --------------------------
+# SETTINGS
+# --------------------------
+# METRICS_ENABLED=0 removes the middleware and the /metrics endpoint.
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") == "1"
+# Statements slower than this are logged (normalized) to "app.slow_queries"; 0 disables the log.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "200"))
+# Shared directory of per-worker snapshots (see MULTIPROCESS); app/serve.py creates one when unset.
+METRICS_DIR = os.getenv("METRICS_DIR") or None
+# How often a worker writes its snapshot, i.e. how stale another worker's figures can be in a scrape.
+METRICS_FLUSH_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "1"))
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 50, 100)
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+# --------------------------
+# METRIC TYPES
+# --------------------------
+# Values are per process; with METRICS_DIR set, /metrics sums every worker's (see MULTIPROCESS).
+class _Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = labels
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def _label_text(self, values, extra=()):
+        pairs = list(zip(self.labels, values)) + list(extra)
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in pairs) + "}"
+
+    def collect(self) -> dict:
+        with self._lock:
+            return {values: self._copy(value) for values, value in self._values.items()}
+
+    def render(self, series=None):
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        for values, value in sorted((self.collect() if series is None else series).items()):
+            yield from self._samples(values, value)
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    @staticmethod
+    def _copy(value):
+        return value
+
+    @staticmethod
+    def _add(series: dict, values, value):
+        series[values] = series.get(values, 0) + value
+
+    def _samples(self, values, value):
+        yield f"{self.name}{self._label_text(values)} {_number(value)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *labels):
+        self.inc(*labels, amount=-1)
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = buckets
+
+    def observe(self, value, *labels):
+        with self._lock:
+            series = self._values.get(labels)
+            if series is None:
+                series = self._values[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for n, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][n] += 1
+                    break
+            series[1] += value
+            series[2] += 1
+
+    @staticmethod
+    def _copy(value):
+        return [list(value[0]), value[1], value[2]]
+
+    @staticmethod
+    def _add(series: dict, values, value):
+        total = series.get(values)
+        if total is None:
+            series[values] = Histogram._copy(value)
+            return
+        total[0] = [a + b for a, b in zip(total[0], value[0])]
+        total[1] += value[1]
+        total[2] += value[2]
+
+    def _samples(self, values, series):
+        cumulative = 0
+        for bound, count in zip(self.buckets, series[0]):
+            cumulative += count
+            yield f"{self.name}_bucket{self._label_text(values, [('le', _number(bound))])} {cumulative}"
+        yield f"{self.name}_bucket{self._label_text(values, [('le', '+Inf')])} {series[2]}"
+        yield f"{self.name}_sum{self._label_text(values)} {_number(series[1])}"
+        yield f"{self.name}_count{self._label_text(values)} {series[2]}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _number(value) -> str:
+    return repr(round(value, 6)) if isinstance(value, float) else str(value)
+
+
+REQUESTS = Counter("http_requests_total", "HTTP requests by route and status code.",
+                   ("method", "route", "status"))
+REQUEST_DURATION = Histogram("http_request_duration_seconds", "Time from request start to the last body byte.",
+                             ("method", "route"))
+IN_FLIGHT = Gauge("http_requests_in_flight", "Requests currently being served.")
+REQUEST_QUERIES = Histogram("http_request_db_queries", "SQL statements issued per request.",
+                            ("method", "route"), buckets=QUERY_COUNT_BUCKETS)
+REQUEST_DB_SECONDS = Counter("http_request_db_seconds_total", "Time spent in SQL statements, by route.",
+                             ("method", "route"))
+QUERY_DURATION = Histogram("db_query_duration_seconds", "SQL statement execution time.", ("operation",))
+SLOW_QUERIES = Counter("db_slow_queries_total", "Statements slower than SLOW_QUERY_MS.", ("operation",))
+EVENT_STREAMS = Gauge("event_streams_open", "Open SSE/WebSocket event streams.")
+EVENTS_DELIVERED = Counter("events_delivered_total", "Events handed to open streams.")
+EVENT_STREAMS_DROPPED = Counter("event_streams_dropped_total", "Streams dropped for falling EVENT_QUEUE_SIZE behind.")
+ADMISSION_REJECTED = Counter("admission_rejected_total", "Requests turned away by admission control.",
+                             ("route_class", "reason"))
+ADMISSION_IN_FLIGHT = Gauge("admission_in_flight", "Admitted requests in flight, by route class.", ("route_class",))
+PRINCIPAL_CACHE_HITS = Counter("principal_cache_hits_total", "Bearer tokens resolved from the principal cache.")
+PRINCIPAL_CACHE_MISSES = Counter("principal_cache_misses_total", "Bearer tokens not (or no longer) in the principal cache.")
+
+METRICS = [REQUESTS, REQUEST_DURATION, IN_FLIGHT, REQUEST_QUERIES, REQUEST_DB_SECONDS, QUERY_DURATION, SLOW_QUERIES,
+           EVENT_STREAMS, EVENTS_DELIVERED, EVENT_STREAMS_DROPPED, ADMISSION_REJECTED, ADMISSION_IN_FLIGHT,
+           PRINCIPAL_CACHE_HITS, PRINCIPAL_CACHE_MISSES]
+
+
+# --------------------------
+# STATEMENT NORMALIZATION
+# --------------------------
+_LITERALS = [
+    (re.compile(r"'(?:[^']|'')*'"), "?"),                       # string literals
+    (re.compile(r"\$\d+|%\(\w+\)s|%s|(?<!:):\w+"), "?"),        # driver placeholders
+    (re.compile(r"(?<![\w.])-?\d+(?:\.\d+)?\b"), "?"),          # numbers (not inside identifiers)
+    (re.compile(r"\s+"), " "),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(...)"),       # IN lists / VALUES rows
+    (re.compile(r"(\(\.\.\.\)|\(\?\))(?:\s*,\s*\1)+"), r"\1, ..."),  # executemany-style row lists
+]
+
+
+@lru_cache(maxsize=1024)
+def normalize(statement: str) -> str:
+    """Statement text with literals and parameter lists folded, so slow queries group by shape."""
+    for pattern, replacement in _LITERALS:
+        statement = pattern.sub(replacement, statement)
+    return statement.strip()
+
+
+def _operation(statement: str) -> str:
+    word = statement.lstrip().split(None, 1)[:1]
+    return word[0].lower() if word else "other"
+
+
+# --------------------------
+# PER-REQUEST ATTRIBUTION
+# --------------------------
+class RequestDbStats:
+    __slots__ = ("label", "queries", "seconds")
+
+    def __init__(self, label: str):
+        self.label = label
+        self.queries = 0
+        self.seconds = 0.0
+
+
+_current_request: ContextVar = ContextVar("request_db_stats", default=None)
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _start_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start", []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _record_query(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info["query_start"].pop()
+    operation = _operation(statement)
+    QUERY_DURATION.observe(elapsed, operation)
+    request = _current_request.get()
+    if request is not None:
+        request.queries += 1
+        request.seconds += elapsed
+    if SLOW_QUERY_MS and elapsed * 1000 >= SLOW_QUERY_MS:
+        SLOW_QUERIES.inc(operation)
+        slow_query_logger.warning("%.1f ms%s%s: %s", elapsed * 1000, " executemany" if executemany else "",
+                                  f" ({request.label})" if request is not None else "", normalize(statement))
+
+
+@event.listens_for(Engine, "handle_error")
+def _drop_timer(context):
+    # after_cursor_execute does not run for failed statements
+    if context.cursor is None or context.connection is None:
+        return
+    starts = context.connection.info.get("query_start")
+    if starts:
+        starts.pop()
+
+
+# --------------------------
+# MIDDLEWARE
+# --------------------------
+class MetricsMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        method = scope["method"]
+        db_stats = RequestDbStats(f"{method} {scope['path']}")
+        token = _current_request.set(db_stats)
+        IN_FLIGHT.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            IN_FLIGHT.dec()
+            _current_request.reset(token)
+            # The route template, filled into the scope by the router; raw paths would explode cardinality.
+            route = getattr(scope.get("route"), "path", UNMATCHED_ROUTE)
+            REQUESTS.inc(method, route, status)
+            REQUEST_DURATION.observe(elapsed, method, route)
+            REQUEST_QUERIES.observe(db_stats.queries, method, route)
+            REQUEST_DB_SECONDS.inc(method, route, amount=db_stats.seconds)
+
+
+# --------------------------
+# MULTIPROCESS
+# --------------------------
+# Under app/serve.py every worker accepts on one shared socket, so a scrape reaches a random worker. Each worker
+# writes a snapshot of its metrics to METRICS_DIR every METRICS_FLUSH_SECONDS (and when it stops), and /metrics
+# sums all of them after writing its own. When a worker exits, the master folds its counters and histograms into
+# FOLDED_FILE and deletes its snapshot, so totals never go backwards; its gauges are dropped with it. Only
+# snapshots are summed, never live values, so every series a scrape sees is at least as new as the last one.
+FOLDED_FILE = "folded.json"
+_SNAPSHOT_FILE = re.compile(r"(\d+)-\d+\.json")
+
+_snapshot_name = None
+_flusher = None
+_stop_flushing = threading.Event()
+
+
+def _reset_after_fork():
+    # A worker counts from zero: what it inherited from the master would be summed once per worker.
+    for metric in METRICS:
+        metric._lock = threading.Lock()
+        metric._values = {}
+    for stats in POOL_STATS.values():
+        stats.reset()
+
+
+os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+def prepare_directory(path: str):
+    """Master side, before the forks: use ``path`` and drop the snapshots of a previous run."""
+    global METRICS_DIR
+    os.makedirs(path, exist_ok=True)
+    for name in os.listdir(path):
+        if name == FOLDED_FILE or _SNAPSHOT_FILE.fullmatch(name) or name.endswith(".tmp"):
+            os.remove(os.path.join(path, name))
+    METRICS_DIR = path
+
+
+def _snapshot() -> dict:
+    return {
+        "metrics": {metric.name: [[list(values), value] for values, value in metric.collect().items()]
+                    for metric in METRICS},
+        "pools": {name: stats.snapshot() for name, stats in POOL_STATS.items()},
+    }
+
+
+def _write(name: str, data: dict):
+    path = os.path.join(METRICS_DIR, name)
+    with open(path + ".tmp", "w") as file:
+        json.dump(data, file)
+    os.replace(path + ".tmp", path)  # readers see the old snapshot or the new one, never half of one
+
+
+def _read(name: str) -> dict:
+    with open(os.path.join(METRICS_DIR, name)) as file:
+        return json.load(file)
+
+
+def flush():
+    """Write this worker's snapshot (named by pid and start time, so a reused pid never aliases)."""
+    global _snapshot_name
+    if _snapshot_name is None or not _snapshot_name.startswith(f"{os.getpid()}-"):
+        _snapshot_name = f"{os.getpid()}-{time.time_ns()}.json"
+    _write(_snapshot_name, _snapshot())
+
+
+def _flush_forever():
+    while not _stop_flushing.wait(METRICS_FLUSH_SECONDS):
+        try:
+            flush()
+        except OSError:
+            logger.exception("could not write the metrics snapshot to %s", METRICS_DIR)
+
+
+def start_flushing():
+    global _flusher
+    if not METRICS_DIR or _flusher is not None:
+        return
+    _stop_flushing.clear()
+    flush()
+    _flusher = threading.Thread(target=_flush_forever, name="metrics-flush", daemon=True)
+    _flusher.start()
+
+
+def stop_flushing():
+    global _flusher
+    if _flusher is None:
+        return
+    _stop_flushing.set()
+    _flusher.join()
+    _flusher = None
+    flush()
+
+
+def fold_worker(pid: int):
+    """Master side, once worker ``pid`` is reaped: keep its counters and histograms, delete its snapshot."""
+    names = [name for name in os.listdir(METRICS_DIR)
+             if (match := _SNAPSHOT_FILE.fullmatch(name)) and int(match.group(1)) == pid]
+    if not names:
+        return
+    folded = _load_folded()
+    for name in names:
+        _merge(folded, _read(name), alive=False)
+    folded["files"] += names
+    _write(FOLDED_FILE, _dump(folded))
+    for name in names:
+        os.remove(os.path.join(METRICS_DIR, name))
+
+
+def _empty() -> dict:
+    return {"metrics": {metric.name: {} for metric in METRICS}, "pools": {}, "files": []}
+
+
+def _load_folded() -> dict:
+    folded = _empty()
+    if os.path.exists(os.path.join(METRICS_DIR, FOLDED_FILE)):
+        data = _read(FOLDED_FILE)
+        _merge(folded, data, alive=False)
+        folded["files"] = data["files"]
+    return folded
+
+
+def _dump(merged: dict) -> dict:
+    return {"metrics": {name: [[list(values), value] for values, value in series.items()]
+                        for name, series in merged["metrics"].items()},
+            "pools": merged["pools"], "files": merged["files"]}
+
+
+def _merge(into: dict, snapshot: dict, alive: bool):
+    """Add ``snapshot`` to ``into``; gauges only count while their worker is alive."""
+    for metric in METRICS:
+        if metric.kind == "gauge" and not alive:
+            continue
+        series = into["metrics"][metric.name]
+        for values, value in snapshot["metrics"].get(metric.name, []):
+            metric._add(series, tuple(values), value)
+    for pool, stats in snapshot["pools"].items():
+        total = into["pools"].setdefault(pool, dict.fromkeys(_POOL_GAUGES + _POOL_COUNTERS, 0))
+        for key in _POOL_COUNTERS + (_POOL_GAUGES if alive else ()):
+            total[key] += stats[key]
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def collect_workers() -> dict:
+    """Every worker's metrics, summed: this one's fresh snapshot, the others' latest, the folded dead ones."""
+    flush()
+    for _ in range(5):
+        # List first: a snapshot folded after the listing is skipped through FOLDED_FILE, one folded
+        # between reading FOLDED_FILE and opening it is gone, and the whole read starts again.
+        names = [name for name in os.listdir(METRICS_DIR) if _SNAPSHOT_FILE.fullmatch(name)]
+        merged = _load_folded()
+        try:
+            for name in set(names) - set(merged["files"]):
+                _merge(merged, _read(name), alive=_alive(int(_SNAPSHOT_FILE.fullmatch(name).group(1))))
+        except FileNotFoundError:
+            continue
+        return merged
+    raise RuntimeError(f"metrics snapshots in {METRICS_DIR} kept changing during the scrape")
+
+
+# --------------------------
+# EXPOSITION
+# --------------------------
+_POOL_GAUGES = ("size", "in_use", "idle", "overflow")
+_POOL_COUNTERS = ("checkouts", "connects", "invalidations", "timeouts", "wait_seconds_total")
+
+
+def _pool_metrics(snapshots: dict):
+    for key in _POOL_GAUGES + _POOL_COUNTERS:
+        counter = key in _POOL_COUNTERS
+        name = f"db_pool_{key}" if key.endswith("_total") or not counter else f"db_pool_{key}_total"
+        yield f"# TYPE {name} {'counter' if counter else 'gauge'}"
+        for pool, snapshot in sorted(snapshots.items()):
+            yield f'{name}{{pool="{_escape(pool)}"}} {_number(snapshot[key])}'
+
+
+def render() -> str:
+    merged = collect_workers() if METRICS_DIR else None
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render(merged["metrics"][metric.name] if merged else None))
+    lines.extend(_pool_metrics(merged["pools"] if merged else
+                               {name: stats.snapshot() for name, stats in POOL_STATS.items()}))
+    return "\n".join(lines) + "\n"
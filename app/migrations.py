@@ -0,0 +1,54 @@
+import os
+
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from alembic.script import ScriptDirectory
+
+# --------------------------
+# SETTINGS
+# --------------------------
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+# AUTO_CREATE_SCHEMA=1 (tests, throwaway SQLite files) builds missing tables with
+# create_all at startup instead of requiring `alembic upgrade head`.
+AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "0") == "1"
+# SCHEMA_CHECK=0 skips the revision check (e.g. while a migration is rolled out).
+SCHEMA_CHECK = os.getenv("SCHEMA_CHECK", "1") == "1"
+
+
+class SchemaOutOfDate(RuntimeError):
+    pass
+
+
+# Set once the schema was checked in this process; forked workers inherit it
+# from a preloading launcher and skip the check.
+schema_ready = False
+
+
+def head_revisions() -> set:
+    return set(ScriptDirectory.from_config(Config(ALEMBIC_INI)).get_heads())
+
+
+def current_revisions(connection) -> set:
+    return set(MigrationContext.configure(connection).get_current_heads())
+
+
+def prepare_schema(engine):
+    """Verify the database is at the Alembic head revision; never issues DDL unless AUTO_CREATE_SCHEMA."""
+    global schema_ready
+    if schema_ready:
+        return
+    if AUTO_CREATE_SCHEMA:
+        from .database import Base
+        from . import models  # noqa: F401
+
+        Base.metadata.create_all(bind=engine)
+    elif SCHEMA_CHECK:
+        expected = head_revisions()
+        with engine.connect() as connection:
+            current = current_revisions(connection)
+        if current != expected:
+            raise SchemaOutOfDate(
+                f"Database is at revision {', '.join(sorted(current)) or '<none>'}, "
+                f"the code expects {', '.join(sorted(expected))}: run `alembic upgrade head`"
+            )
+    schema_ready = True
@@ -1,4 +1,7 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Float, Text, Index
+import re
+from typing import Optional
+
+from sqlalchemy import Column, Integer, String, Boolean, Date, DateTime, ForeignKey, Float, Text, Index, DDL, event
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from .database import Base
@@ -19,6 +22,7 @@ class User(Base):
     role = Column(String, nullable=False, default="citizen")
 
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     # Relationships (IMPORTANT FIX)
     appointments = relationship(
@@ -52,11 +56,33 @@ class Vaccine(Base):
     name = Column(String, nullable=False, unique=True)
     price = Column(Float, nullable=True)
     availability = Column(Boolean, default=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     appointments = relationship("Appointment", back_populates="vaccine")
     vaccinations = relationship("Vaccination", back_populates="vaccine")
 
 
+# =========================
+# CATALOG VERSIONS TABLE
+# =========================
+# One row per cached collection; writers bump the version so every worker
+# knows its in-memory snapshot is stale (see app/vaccine_catalog.py) and
+# clients get a new ETag for the collection (see app/conditional.py).
+class CatalogVersion(Base):
+    __tablename__ = "catalog_versions"
+
+    name = Column(String, primary_key=True)
+    version = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
+
+event.listen(
+    CatalogVersion.__table__,
+    "after_create",
+    DDL("INSERT INTO catalog_versions (name, version) VALUES ('vaccines', 0), ('articles', 0)"),
+)
+
+
 # =========================
 # APPOINTMENTS TABLE
 # =========================
@@ -70,20 +96,30 @@ class Appointment(Base):
 
     preferred_date = Column(DateTime(timezone=True), nullable=False)
 
-    status = Column(String, nullable=False, default="pending", index=True)
+    status = Column(String, nullable=False, default="pending")
 
     admin_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"), nullable=True)
 
     reason_rejection = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     citizen = relationship("User", foreign_keys=[citizen_id], back_populates="appointments")
     admin = relationship("User", foreign_keys=[admin_id])
     vaccine = relationship("Vaccine", back_populates="appointments")
-    vaccination = relationship("Vaccination", back_populates="appointment", uselist=False)
+    # Deleted with the appointment through the session, so dose rollups and events follow. SQL deletes
+    # rely on the foreign key, or on partitioned PostgreSQL on a trigger (migration b8d4f1a6c3e2).
+    vaccination = relationship("Vaccination", back_populates="appointment", uselist=False,
+                               cascade="save-update, merge, delete")
 
 
-Index("idx_appointment_user_status", "citizen_id", "status")
+# Indexes for the access paths (see the index pack migration); built from the
+# columns so they belong to the table. tests/test_query_plans.py fails if a
+# hot query stops using them.
+Index("idx_appointment_user_status", Appointment.citizen_id, Appointment.status)
+Index("idx_appointment_vaccine_date", Appointment.vaccine_id, Appointment.preferred_date)
+Index("idx_appointment_status_created", Appointment.status, Appointment.created_at)
+Index("idx_appointment_admin", Appointment.admin_id)
 
 
 # =========================
@@ -94,6 +130,7 @@ class Vaccination(Base):
 
     id = Column(Integer, primary_key=True, nullable=False)
 
+    # Not enforced on PostgreSQL: a partitioned appointments table has no unique id alone.
     appointment_id = Column(Integer, ForeignKey("appointments.id", ondelete="CASCADE"))
     citizen_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"))
     vaccine_id = Column(Integer, ForeignKey("vaccines.id", ondelete="CASCADE"), nullable=False)
@@ -101,9 +138,10 @@ class Vaccination(Base):
     dose_number = Column(Integer, nullable=False)
     batch_number = Column(String, nullable=True)
 
-    vaccination_date = Column(DateTime(timezone=True), server_default=func.now())
+    vaccination_date = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
 
     admin_id = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     appointment = relationship("Appointment", back_populates="vaccination")
     citizen = relationship("User", foreign_keys=[citizen_id], back_populates="vaccinations")
@@ -111,6 +149,36 @@ class Vaccination(Base):
     vaccine = relationship("Vaccine", back_populates="vaccinations")
 
 
+Index("idx_vaccination_citizen_date", Vaccination.citizen_id, Vaccination.vaccination_date)
+Index("idx_vaccination_appointment", Vaccination.appointment_id)
+Index("idx_vaccination_vaccine", Vaccination.vaccine_id)
+Index("idx_vaccination_admin", Vaccination.admin_id)
+
+
+# =========================
+# MONTHLY PARTITIONS (PostgreSQL)
+# =========================
+# appointments and vaccinations are range-partitioned by month on these
+# columns (see app/partitions.py); their primary keys include the column.
+# Partitions are made by the migration and app/partitions.py, not by the
+# metadata. A column added to either table must be added to archive.<table> too.
+PARTITIONED_TABLES = {"appointments": "preferred_date", "vaccinations": "vaccination_date"}
+
+_PARTITION_NAME = re.compile(r"^(%s)_(p\d{4}_\d{2}|default)(_|$)" % "|".join(PARTITIONED_TABLES))
+
+
+def is_partition_object(name: Optional[str]) -> bool:
+    """True for month/default partitions and their indexes; the metadata does not know them (see alembic/env.py)."""
+    return bool(name) and _PARTITION_NAME.match(name) is not None
+
+
+def is_unenforced_foreign_key(constraint) -> bool:
+    """vaccinations.appointment_id: declared for the ORM, absent from a partitioned PostgreSQL schema.
+
+    There, a trigger on appointments deletes the vaccinations of deleted appointments instead."""
+    return constraint.parent.name == "vaccinations" and constraint.referred_table.name == "appointments"
+
+
 # =========================
 # AWARENESS ARTICLES TABLE
 # =========================
@@ -124,6 +192,7 @@ class AwarenessArticle(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     created_by = Column(Integer, ForeignKey("users.id", ondelete="SET NULL"))
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
 
     author = relationship(
         "User",
@@ -132,3 +201,141 @@ class AwarenessArticle(Base):
     )
 
 
+Index("idx_article_author", AwarenessArticle.created_by)
+
+
+
+
+# =========================
+# ARTICLE FULL-TEXT INDEX
+# =========================
+# Maintained by the database on every insert/update/delete (see app/article_search.py).
+# PostgreSQL: a generated, weighted tsvector column with a GIN index.
+# SQLite: an external-content FTS5 table kept in sync by triggers.
+# Every statement is idempotent so `python -m app.article_search --rebuild` can
+# replay them against an existing database.
+ARTICLE_SEARCH_CONFIG = "english"
+
+ARTICLE_SEARCH_DDL = {
+    "postgresql": [
+        "ALTER TABLE awareness_articles ADD COLUMN IF NOT EXISTS search_vector tsvector "
+        f"GENERATED ALWAYS AS (setweight(to_tsvector('{ARTICLE_SEARCH_CONFIG}', coalesce(title, '')), 'A') || "
+        f"setweight(to_tsvector('{ARTICLE_SEARCH_CONFIG}', coalesce(content, '')), 'B')) STORED",
+        "CREATE INDEX IF NOT EXISTS ix_awareness_articles_search_vector "
+        "ON awareness_articles USING GIN (search_vector)",
+    ],
+    "sqlite": [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS awareness_articles_fts USING fts5("
+        "title, content, content='awareness_articles', content_rowid='id', tokenize='porter unicode61')",
+        "CREATE TRIGGER IF NOT EXISTS awareness_articles_fts_ai AFTER INSERT ON awareness_articles BEGIN "
+        "INSERT INTO awareness_articles_fts (rowid, title, content) VALUES (new.id, new.title, new.content); END",
+        "CREATE TRIGGER IF NOT EXISTS awareness_articles_fts_ad AFTER DELETE ON awareness_articles BEGIN "
+        "INSERT INTO awareness_articles_fts (awareness_articles_fts, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); END",
+        "CREATE TRIGGER IF NOT EXISTS awareness_articles_fts_au AFTER UPDATE OF title, content "
+        "ON awareness_articles BEGIN "
+        "INSERT INTO awareness_articles_fts (awareness_articles_fts, rowid, title, content) "
+        "VALUES ('delete', old.id, old.title, old.content); "
+        "INSERT INTO awareness_articles_fts (rowid, title, content) VALUES (new.id, new.title, new.content); END",
+    ],
+}
+
+for _dialect, _statements in ARTICLE_SEARCH_DDL.items():
+    for _statement in _statements:
+        event.listen(AwarenessArticle.__table__, "after_create", DDL(_statement).execute_if(dialect=_dialect))
+
+def is_article_search_object(name: str) -> bool:
+    """True for objects made by ARTICLE_SEARCH_DDL; the metadata does not know them (see alembic/env.py)."""
+    return name.startswith("awareness_articles_fts") or name in ("search_vector", "ix_awareness_articles_search_vector")
+
+
+event.listen(
+    AwarenessArticle.__table__,
+    "before_drop",
+    DDL("DROP TABLE IF EXISTS awareness_articles_fts").execute_if(dialect="sqlite"),
+)
+
+
+# =========================
+# DASHBOARD ROLLUPS
+# =========================
+# Counters maintained on every appointment/vaccination write (see app/stats.py);
+# `python -m app.stats --rebuild` recomputes them from the base tables.
+class AppointmentDailyStats(Base):
+    __tablename__ = "appointment_daily_stats"
+
+    vaccine_id = Column(Integer, ForeignKey("vaccines.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)  # day of preferred_date as stored (UTC on PostgreSQL)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+
+
+class VaccineDoseStats(Base):
+    __tablename__ = "vaccine_dose_stats"
+
+    vaccine_id = Column(Integer, ForeignKey("vaccines.id", ondelete="CASCADE"), primary_key=True)
+    doses = Column(Integer, nullable=False, default=0)
+
+
+# =========================
+# APPOINTMENT SLOTS
+# =========================
+# Capacity per vaccine and day. `booked` counts pending and approved
+# appointments and only grows through conditional increments (see app/slots.py).
+class AppointmentSlot(Base):
+    __tablename__ = "appointment_slots"
+
+    vaccine_id = Column(Integer, ForeignKey("vaccines.id", ondelete="CASCADE"), primary_key=True)
+    day = Column(Date, primary_key=True)  # same bucketing as appointment_daily_stats
+    capacity = Column(Integer, nullable=True)  # NULL: unlimited
+    booked = Column(Integer, nullable=False, default=0)
+
+
+# =========================
+# USER EVENTS
+# =========================
+# Appointment status and vaccination changes for the citizen's event stream
+# (see app/events.py). Rows are written in the same transaction as the change
+# and kept for EVENT_RETENTION_HOURS so a reconnecting stream can resume from
+# its last event id.
+class UserEvent(Base):
+    __tablename__ = "user_events"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    type = Column(String, nullable=False)
+    payload = Column(Text, nullable=False)  # JSON object sent as the event data
+    created_at = Column(DateTime(timezone=True), nullable=False)
+
+
+Index("idx_user_event_user", UserEvent.user_id, UserEvent.id)
+Index("idx_user_event_created", UserEvent.created_at)
+
+# PostgreSQL: one NOTIFY per inserting statement, sent at commit to every
+# worker listening on the channel. The payload holds [event id, user id]
+# pairs, at most 200 per notification to stay under the 8000-byte limit.
+USER_EVENT_NOTIFY_CHANNEL = "user_events"
+
+USER_EVENT_NOTIFY_DDL = [
+    "CREATE OR REPLACE FUNCTION notify_user_events() RETURNS trigger AS $$ "
+    "DECLARE chunk text; "
+    "BEGIN "
+    "FOR chunk IN SELECT json_agg(json_build_array(id, user_id) ORDER BY id)::text FROM "
+    "(SELECT id, user_id, (row_number() OVER (ORDER BY id) - 1) / 200 AS part FROM new_events) numbered "
+    "GROUP BY part LOOP "
+    f"PERFORM pg_notify('{USER_EVENT_NOTIFY_CHANNEL}', chunk); "
+    "END LOOP; "
+    "RETURN NULL; "
+    "END $$ LANGUAGE plpgsql",
+    "CREATE OR REPLACE TRIGGER user_events_notify AFTER INSERT ON user_events "
+    "REFERENCING NEW TABLE AS new_events FOR EACH STATEMENT EXECUTE FUNCTION notify_user_events()",
+]
+
+for _statement in USER_EVENT_NOTIFY_DDL:
+    event.listen(UserEvent.__table__, "after_create", DDL(_statement).execute_if(dialect="postgresql"))
+
+event.listen(
+    UserEvent.__table__,
+    "before_drop",
+    DDL("DROP FUNCTION IF EXISTS notify_user_events() CASCADE").execute_if(dialect="postgresql"),
+)
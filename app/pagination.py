@@ -0,0 +1,160 @@
+import base64
+import json
+import os
+from typing import Optional
+
+from fastapi import HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+
+# --------------------------
+# SETTINGS
+# --------------------------
+DEFAULT_PAGE_SIZE = int(os.getenv("DEFAULT_PAGE_SIZE", "50"))
+MAX_PAGE_SIZE = int(os.getenv("MAX_PAGE_SIZE", "500"))
+STREAM_CHUNK_SIZE = int(os.getenv("STREAM_CHUNK_SIZE", "1000"))
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+# Batch fetches (?ids=) list the requested ids that do not exist here.
+MISSING_IDS_HEADER = "X-Missing-Ids"
+# Collection HEAD requests answer with the row count.
+TOTAL_COUNT_HEADER = "X-Total-Count"
+
+
+# --------------------------
+# OPAQUE CURSORS
+# --------------------------
+# A cursor is the keyset position of the last row of a page ({"id": 42}),
+# base64url encoded so clients treat it as an opaque token.
+def encode_cursor(position: dict) -> str:
+    raw = json.dumps(position, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b"=").decode()
+
+
+def decode_cursor(cursor: str, key: str = "id") -> dict:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        position = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(position, dict) or not isinstance(position.get(key), int):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return position
+
+
+# --------------------------
+# BATCH IDS
+# --------------------------
+def parse_ids(ids: str) -> list:
+    """``"3,1,3"`` -> ``[3, 1]``: distinct ids in request order, at most MAX_PAGE_SIZE of them."""
+    try:
+        parsed = list(dict.fromkeys(int(part) for part in ids.split(",")))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="ids must be a comma-separated list of integers")
+    if len(parsed) > MAX_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_PAGE_SIZE} ids per request")
+    return parsed
+
+
+def set_missing_ids(response: Response, requested: list, found):
+    missing = sorted(set(requested).difference(found))
+    if missing:
+        response.headers[MISSING_IDS_HEADER] = ",".join(map(str, missing))
+
+
+# --------------------------
+# PAGE PARAMETERS (dependency)
+# --------------------------
+class PageParams:
+    def __init__(
+        self,
+        request: Request,
+        cursor: Optional[str] = None,
+        limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+        format: str = Query("json", pattern="^(json|ndjson)$"),
+        ids: Optional[str] = Query(None, description="Comma-separated ids to fetch in one request"),
+    ):
+        if ids is not None and cursor:
+            raise HTTPException(status_code=400, detail="ids cannot be combined with cursor")
+        self.after_id = decode_cursor(cursor)["id"] if cursor else None
+        self.limit = limit
+        self.stream = format == "ndjson" or NDJSON_MEDIA_TYPE in request.headers.get("accept", "")
+        self.ids = parse_ids(ids) if ids is not None else None
+
+
+# --------------------------
+# KEYSET PAGINATION
+# --------------------------
+# Pages are selected as column tuples through a Projection and rendered
+# straight to JSON: no ORM objects, no per-row schema validation.
+def paginate(db, projection, page: PageParams, response: Response):
+    """Return one keyset page of ``projection`` ordered by its id.
+
+    The next cursor is sent in the ``X-Next-Cursor`` header so the body keeps
+    its list shape. With ``format=ndjson`` every remaining row is streamed
+    instead, ``STREAM_CHUNK_SIZE`` rows at a time. With ``?ids=`` the
+    requested rows are fetched by one ``IN`` query instead, ordered by id,
+    and the ids not found are listed in ``X-Missing-Ids``.
+    """
+    stmt = _page_statement(projection, page)
+    if page.ids is not None:
+        return _batch_response(db.connection().execute(stmt).all(), projection, page, response)
+    if page.stream:
+        rows = db.connection().execute(stmt.execution_options(yield_per=STREAM_CHUNK_SIZE))
+        return StreamingResponse(_ndjson_rows(rows, projection), media_type=NDJSON_MEDIA_TYPE)
+    rows = db.connection().execute(stmt.limit(page.limit + 1)).all()
+    return _page_response(rows, projection, page, response)
+
+
+async def paginate_async(db, projection, page: PageParams, response: Response):
+    """``paginate`` for an ``AsyncSession``."""
+    stmt = _page_statement(projection, page)
+    connection = await db.connection()
+    if page.ids is not None:
+        return _batch_response((await connection.execute(stmt)).all(), projection, page, response)
+    if page.stream:
+        rows = await connection.stream(stmt.execution_options(yield_per=STREAM_CHUNK_SIZE))
+        return StreamingResponse(_ndjson_rows_async(rows, projection), media_type=NDJSON_MEDIA_TYPE)
+    rows = (await connection.execute(stmt.limit(page.limit + 1))).all()
+    return _page_response(rows, projection, page, response)
+
+
+def _page_statement(projection, page: PageParams):
+    stmt = projection.statement()
+    if page.ids is not None:
+        stmt = stmt.where(projection.entity.id.in_(page.ids))
+    if page.after_id is not None:
+        stmt = stmt.where(projection.entity.id > page.after_id)
+    return stmt.order_by(projection.entity.id)
+
+
+def _page_response(rows, projection, page: PageParams, response: Response):
+    if len(rows) > page.limit:
+        rows = rows[:page.limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"id": projection.key(rows[-1])})
+    return _rendered(projection.render(rows), "application/json", response)
+
+
+def _batch_response(rows, projection, page: PageParams, response: Response):
+    set_missing_ids(response, page.ids, (projection.key(row) for row in rows))
+    if page.stream:
+        return _rendered(projection.render_lines(rows), NDJSON_MEDIA_TYPE, response)
+    return _rendered(projection.render(rows), "application/json", response)
+
+
+def _rendered(body: bytes, media_type: str, response: Response):
+    rendered = Response(body, media_type=media_type)
+    # FastAPI only merges the injected response's headers (cursor, ETag) into
+    # responses it renders itself.
+    rendered.headers.raw.extend(response.headers.raw)
+    return rendered
+
+
+def _ndjson_rows(rows, projection):
+    for partition in rows.partitions():
+        yield projection.render_lines(partition)
+
+
+async def _ndjson_rows_async(rows, projection):
+    async for partition in rows.partitions():
+        yield projection.render_lines(partition)
@@ -0,0 +1,390 @@
+"""Monthly partitions of appointments and vaccinations (PostgreSQL): the months ahead, and archival.
+
+    python -m app.partitions --status
+    python -m app.partitions --maintain          # create the coming months' partitions
+    python -m app.partitions --archive [--dry-run]
+    python -m app.partitions --check-pruning     # date-filtered queries read one month; by-id reads all
+
+On PostgreSQL the migration b8d4f1a6c3e2 turns ``appointments`` (by
+``preferred_date``) and ``vaccinations`` (by ``vaccination_date``) into
+range-partitioned tables with one partition per calendar month (UTC) named
+``<table>_pYYYY_MM``, plus ``<table>_default`` for rows outside every
+month. Maintenance keeps ``PARTITION_MONTHS_AHEAD`` months ready and moves
+rows stranded in the default partition into a month of their own; the
+server runs it every ``PARTITION_MAINTENANCE_SECONDS`` (app/serve.py), or
+run ``--maintain`` from cron.
+
+Archival detaches months older than ``ARCHIVE_<TABLE>_AFTER_MONTHS`` (0:
+never) and attaches them to ``archive.<table>``: write indexes are dropped
+for a single citizen index, the table is frozen and optionally moved to
+``ARCHIVE_TABLESPACE``. Archived rows leave the live tables (and every
+query of the API) but stay queryable for audits through ``archive.<table>``;
+a live vaccination of an archived appointment keeps its ``appointment_id``,
+which only ``archive.appointments`` resolves.
+Elsewhere (SQLite) the tables are plain and every command is a no-op.
+"""
+import argparse
+import json
+import logging
+import os
+import re
+import sys
+import time
+from contextlib import contextmanager
+from datetime import date, datetime, timezone
+from typing import NamedTuple, Optional
+
+from sqlalchemy import text
+from . import models
+
+logger = logging.getLogger("app.partitions")
+
+# --------------------------
+# SETTINGS
+# --------------------------
+PARTITION_MONTHS_AHEAD = int(os.getenv("PARTITION_MONTHS_AHEAD", "12"))
+# 0 disables the maintenance process of app/serve.py.
+PARTITION_MAINTENANCE_SECONDS = int(os.getenv("PARTITION_MAINTENANCE_SECONDS", "3600"))
+# DDL on a busy parent gives up instead of queueing every query behind its lock; the next run retries.
+PARTITION_LOCK_TIMEOUT = os.getenv("PARTITION_LOCK_TIMEOUT", "5s")
+ARCHIVE_SCHEMA = os.getenv("ARCHIVE_SCHEMA", "archive")
+ARCHIVE_TABLESPACE = os.getenv("ARCHIVE_TABLESPACE")
+ARCHIVE_APPOINTMENTS_AFTER_MONTHS = int(os.getenv("ARCHIVE_APPOINTMENTS_AFTER_MONTHS", "24"))
+# Vaccinations feed the dose rollups and analytics: kept live unless set.
+ARCHIVE_VACCINATIONS_AFTER_MONTHS = int(os.getenv("ARCHIVE_VACCINATIONS_AFTER_MONTHS", "0"))
+
+# pg_advisory_lock key: one maintenance run at a time across workers and hosts.
+MAINTENANCE_LOCK_KEY = 0x70617274
+
+
+class PartitionedTable(NamedTuple):
+    name: str
+    key: str
+    archive_after_months: int
+    archive_indexes: tuple = ("citizen_id",)
+
+
+TABLES = [
+    PartitionedTable("appointments", models.PARTITIONED_TABLES["appointments"], ARCHIVE_APPOINTMENTS_AFTER_MONTHS),
+    PartitionedTable("vaccinations", models.PARTITIONED_TABLES["vaccinations"], ARCHIVE_VACCINATIONS_AFTER_MONTHS),
+]
+
+_MONTH_SUFFIX = re.compile(r"_p(\d{4})_(\d{2})$")
+
+
+# --------------------------
+# MONTHS
+# --------------------------
+def month_start(day: date) -> date:
+    return date(day.year, day.month, 1)
+
+
+def add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table: str, month: date) -> str:
+    return f"{table}_p{month:%Y_%m}"
+
+
+def partition_month(name: str) -> Optional[date]:
+    match = _MONTH_SUFFIX.search(name)
+    return date(int(match.group(1)), int(match.group(2)), 1) if match else None
+
+
+def _bounds(month: date) -> str:
+    # ':' would read as a bind parameter in text(); the day and zone are enough.
+    return f"FOR VALUES FROM ('{month} UTC') TO ('{add_months(month, 1)} UTC')"
+
+
+def _today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+# --------------------------
+# CATALOG
+# --------------------------
+def is_partitioned(conn, table: str, schema: str = "public") -> bool:
+    if conn.dialect.name != "postgresql":
+        return False
+    return conn.execute(text("SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass(:name))"),
+                        {"name": f"{schema}.{table}"}).scalar()
+
+
+def partitions(conn, table: str, schema: str = "public") -> list:
+    return list(conn.execute(text(
+        "SELECT child.relname FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "WHERE pg_inherits.inhparent = to_regclass(:name) ORDER BY child.relname"
+    ), {"name": f"{schema}.{table}"}).scalars())
+
+
+@contextmanager
+def _maintenance_lock(engine):
+    """An autocommit connection holding the maintenance lock, or None when another run holds it."""
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        if not conn.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": MAINTENANCE_LOCK_KEY}).scalar():
+            yield None
+            return
+        try:
+            yield conn
+        finally:
+            conn.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MAINTENANCE_LOCK_KEY})
+
+
+# --------------------------
+# MAINTENANCE (months ahead)
+# --------------------------
+def create_partition(conn, table: PartitionedTable, month: date):
+    """Create ``month``'s partition, taking over its rows from the default partition, in the caller's transaction.
+
+    Built detached and attached afterwards: ATTACH takes a lighter lock on the
+    parent than CREATE TABLE ... PARTITION OF, so reads and writes go on."""
+    name = partition_name(table.name, month)
+    conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+    conn.execute(text("SET LOCAL statement_timeout = 0"))
+    conn.execute(text(f"CREATE TABLE {name} (LIKE {table.name} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+    moved = conn.execute(text(
+        f"WITH moved AS (DELETE FROM {table.name}_default "
+        f"WHERE {table.key} >= CAST(:lower AS timestamptz) AND {table.key} < CAST(:upper AS timestamptz) "
+        f"RETURNING *) INSERT INTO {name} SELECT * FROM moved"
+    ), {"lower": f"{month} UTC", "upper": f"{add_months(month, 1)} UTC"}).rowcount
+    # Indexes, primary key and foreign keys come from the parent here.
+    conn.execute(text(f"ALTER TABLE {table.name} ATTACH PARTITION {name} {_bounds(month)}"))
+    return name, moved
+
+
+def _stranded_months(conn, table: PartitionedTable) -> set:
+    return set(conn.execute(text(
+        f"SELECT DISTINCT CAST(date_trunc('month', {table.key} AT TIME ZONE 'UTC') AS date) "
+        f"FROM {table.name}_default"
+    )).scalars())
+
+
+def maintain(engine, months_ahead: int = PARTITION_MONTHS_AHEAD, today: Optional[date] = None) -> list:
+    """Create the partitions missing for this month and ``months_ahead`` after it, and for rows in the
+    default partitions. One short transaction per partition; returns (partition, rows moved) pairs."""
+    if engine.dialect.name != "postgresql":
+        return []
+    this_month = month_start(today or _today())
+    created = []
+    with _maintenance_lock(engine) as lock:
+        if lock is None:
+            logger.info("partition maintenance is running elsewhere, skipping")
+            return []
+        for table in TABLES:
+            if not is_partitioned(lock, table.name):
+                continue
+            existing = set(partitions(lock, table.name))
+            months = {add_months(this_month, n) for n in range(months_ahead + 1)} | _stranded_months(lock, table)
+            for month in sorted(months):
+                if partition_name(table.name, month) in existing:
+                    continue
+                with engine.begin() as conn:
+                    created.append(create_partition(conn, table, month))
+    return created
+
+
+# --------------------------
+# ARCHIVAL (old months)
+# --------------------------
+def archive_candidates(conn, today: Optional[date] = None) -> list:
+    """(table, partition, month) for every live month older than its table's archive age."""
+    this_month = month_start(today or _today())
+    candidates = []
+    for table in TABLES:
+        if table.archive_after_months <= 0 or not is_partitioned(conn, table.name):
+            continue
+        cutoff = add_months(this_month, -table.archive_after_months)
+        for name in partitions(conn, table.name):
+            month = partition_month(name)
+            if month is not None and month < cutoff:
+                candidates.append((table, name, month))
+    return candidates
+
+
+def archive_partition(engine, lock, table: PartitionedTable, name: str, month: date):
+    """Move one month from ``<table>`` to ``archive.<table>`` and compact it.
+
+    Not DETACH CONCURRENTLY: PostgreSQL refuses it while a default partition
+    exists, so the detach takes a brief exclusive lock on the parent, bounded
+    by ``PARTITION_LOCK_TIMEOUT``. Foreign keys to users and vaccines stay, so
+    deleting a user still removes their archived rows."""
+    archived = f"{ARCHIVE_SCHEMA}.{name}"
+    with engine.begin() as conn:
+        conn.execute(text(f"SET LOCAL lock_timeout = '{PARTITION_LOCK_TIMEOUT}'"))
+        conn.execute(text(f"ALTER TABLE {table.name} DETACH PARTITION {name}"))
+        conn.execute(text(f"ALTER TABLE {name} SET SCHEMA {ARCHIVE_SCHEMA}"))
+        indexes = conn.execute(text(
+            "SELECT CAST(CAST(indexrelid AS regclass) AS text) FROM pg_index "
+            "WHERE indrelid = to_regclass(:name) AND NOT indisprimary"
+        ), {"name": archived}).scalars().all()
+        for index in indexes:
+            conn.execute(text(f"DROP INDEX {index}"))
+        for column in table.archive_indexes:
+            conn.execute(text(f"CREATE INDEX {name}_{column} ON {archived} ({column})"))
+        conn.execute(text(f"ALTER TABLE {ARCHIVE_SCHEMA}.{table.name} ATTACH PARTITION {archived} {_bounds(month)}"))
+    # Rewrites and vacuums run outside a transaction, on the lock's autocommit connection.
+    if ARCHIVE_TABLESPACE:
+        lock.execute(text(f"ALTER TABLE {archived} SET TABLESPACE {ARCHIVE_TABLESPACE}"))
+    lock.execute(text(f"VACUUM (FREEZE, ANALYZE) {archived}"))
+    return archived
+
+
+def archive(engine, dry_run: bool = False, today: Optional[date] = None) -> list:
+    if engine.dialect.name != "postgresql":
+        return []
+    with _maintenance_lock(engine) as lock:
+        if lock is None:
+            logger.info("partition maintenance is running elsewhere, skipping")
+            return []
+        candidates = archive_candidates(lock, today)
+        if dry_run:
+            return [f"{ARCHIVE_SCHEMA}.{name}" for _, name, _ in candidates]
+        return [archive_partition(engine, lock, table, name, month) for table, name, month in candidates]
+
+
+def run_forever(interval: int = PARTITION_MAINTENANCE_SECONDS):
+    """The maintenance loop app/serve.py runs in its own process."""
+    from .database import engine
+
+    while True:
+        try:
+            for name, moved in maintain(engine):
+                logger.info("created partition %s (%d rows from the default partition)", name, moved)
+            for name in archive(engine):
+                logger.info("archived %s", name)
+        except Exception:
+            logger.exception("partition maintenance failed")
+        time.sleep(interval)
+
+
+# --------------------------
+# STATUS & PRUNING CHECK
+# --------------------------
+def status(conn) -> list:
+    """(schema, partition, estimated rows, bytes, bounds) of every live and archived partition."""
+    parents = [f"{schema}.{table.name}" for table in TABLES for schema in ("public", ARCHIVE_SCHEMA)]
+    return [tuple(row) for row in conn.execute(text(
+        "SELECT namespace.nspname, child.relname, CAST(child.reltuples AS bigint), "
+        "pg_total_relation_size(child.oid), pg_get_expr(child.relpartbound, child.oid) "
+        "FROM pg_inherits JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+        "JOIN pg_namespace namespace ON namespace.oid = child.relnamespace "
+        "WHERE pg_inherits.inhparent IN (SELECT to_regclass(parent) FROM unnest(CAST(:parents AS text[])) AS parent) "
+        "ORDER BY namespace.nspname, child.relname"
+    ), {"parents": parents})]
+
+
+def pruning_statements(month: date) -> dict:
+    """The date-filtered statements of the API for one month, by route, with the table they filter."""
+    from sqlalchemy import update
+    from . import analytics, exports, schemas
+    from .appointment_status import STATUS_TRANSITIONS, _batch_filter
+
+    lower = datetime.combine(month, datetime.min.time(), tzinfo=timezone.utc)
+    upper = datetime.combine(add_months(month, 1), datetime.min.time(), tzinfo=timezone.utc)
+
+    def export(spec):
+        params = exports.ExportParams(format="csv", columns=None, date_from=lower, date_to=upper,
+                                      vaccine_id=None, status=None)
+        return exports.export_statement(spec, params)[0]
+
+    batch = schemas.AppointmentStatusBatch(status="approved", date_from=lower, date_to=upper)
+    analytics_params = analytics.AnalyticsParams(format="json", date_from=month, date_to=add_months(month, 1),
+                                                 vaccine_id=None, as_of=None, limit=100)
+    return {
+        "GET /appointments/export": ("appointments", export(exports.APPOINTMENTS)),
+        "GET /vaccinations/export": ("vaccinations", export(exports.VACCINATIONS)),
+        "GET /analytics/{report}": ("vaccinations", analytics.vaccination_statement("postgresql", analytics_params)),
+        "PATCH /appointments/status": ("appointments", update(models.Appointment).where(
+            *_batch_filter(batch, STATUS_TRANSITIONS["approved"]), models.Appointment.status == "pending",
+        ).values(status="approved")),
+    }
+
+
+def scanned_partitions(conn, stmt) -> set:
+    compiled = stmt.compile(conn)
+    plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + str(compiled), compiled.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    scanned, stack = set(), [plan[0]["Plan"]]
+    while stack:
+        node = stack.pop()
+        if "Relation Name" in node and models.is_partition_object(node["Relation Name"]):
+            scanned.add(node["Relation Name"])
+        stack.extend(node.get("Plans", []))
+    return scanned
+
+
+def check_pruning(conn, month: Optional[date] = None) -> list:
+    """One result per statement: ok when its plan reads ``month``'s partition and no other."""
+    month = month or month_start(_today())
+    results = []
+    for route, (table, stmt) in pruning_statements(month).items():
+        scanned = scanned_partitions(conn, stmt)
+        expected = {partition_name(table, month)}
+        results.append({"request": route, "status": "ok" if scanned == expected else "FAIL",
+                        "expected": sorted(expected), "scanned": sorted(scanned)})
+    return results
+
+
+def by_id_partitions(conn) -> dict:
+    """Table -> partitions a lookup by id alone reads: all of them, as id carries no date to prune on.
+
+    GET/HEAD/PATCH/DELETE by id and ``?ids=`` pay for it, in planning mostly, so
+    the cost follows the number of live months (see Partitions & Archive in README.md)."""
+    from sqlalchemy import select
+
+    counts = {}
+    for table in TABLES:
+        if is_partitioned(conn, table.name):
+            columns = models.Base.metadata.tables[table.name].c
+            counts[table.name] = len(scanned_partitions(conn, select(columns.id).where(columns.id == 1)))
+    return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    group = parser.add_mutually_exclusive_group(required=True)
+    group.add_argument("--status", action="store_true", help="list live and archived partitions")
+    group.add_argument("--maintain", action="store_true", help="create the coming months' partitions")
+    group.add_argument("--archive", action="store_true", help="move old months to the archive schema")
+    group.add_argument("--check-pruning", action="store_true", help="EXPLAIN date-filtered queries of the API")
+    parser.add_argument("--dry-run", action="store_true", help="with --archive: only list what would move")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [partitions] %(message)s")
+    from .database import engine
+
+    if engine.dialect.name != "postgresql":
+        print(f"{engine.dialect.name}: tables are not partitioned, nothing to do")
+        return
+    if args.maintain:
+        created = maintain(engine)
+        for name, moved in created:
+            print(f"created {name} ({moved} rows from the default partition)")
+        print(f"{len(created)} partitions created")
+    elif args.archive:
+        names = archive(engine, dry_run=args.dry_run)
+        for name in names:
+            print(f"{'would archive' if args.dry_run else 'archived'} {name}")
+        print(f"{len(names)} partitions {'to archive' if args.dry_run else 'archived'}")
+    elif args.status:
+        with engine.connect() as conn:
+            print(f"{'partition':<40} {'rows':>12} {'size':>12}  bounds")
+            for schema, name, rows, size, bounds in status(conn):
+                print(f"{schema + '.' + name:<40} {rows:>12} {size:>12}  {bounds}")
+    else:
+        with engine.connect() as conn:
+            results = check_pruning(conn)
+            by_id = by_id_partitions(conn)
+        for result in results:
+            mark = "  " if result["status"] == "ok" else "!!"
+            print(f"{mark} {result['status']} {result['request']} (scans {', '.join(result['scanned']) or 'nothing'})")
+        for table, count in by_id.items():
+            print(f"   by id: {table} lookups read all {count} partitions")
+        if any(result["status"] != "ok" for result in results):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
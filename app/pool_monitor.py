@@ -0,0 +1,114 @@
+import logging
+import os
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+logger = logging.getLogger(__name__)
+
+# Checkouts that wait longer than this are logged as pool saturation warnings.
+DB_POOL_SLOW_CHECKOUT_MS = float(os.getenv("DB_POOL_SLOW_CHECKOUT_MS", "100"))
+
+
+# --------------------------
+# POOL STATISTICS
+# --------------------------
+class PoolStats:
+    def __init__(self, name: str):
+        self.name = name
+        self.pool = None
+        self.reset()
+
+    def reset(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record_wait(self, seconds: float):
+        with self._lock:
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+        if seconds * 1000 >= DB_POOL_SLOW_CHECKOUT_MS:
+            logger.warning("pool %s: checkout waited %.1f ms (%s)", self.name, seconds * 1000, self.snapshot())
+
+    def snapshot(self) -> dict:
+        pool = self.pool
+        return {
+            "size": pool.size() if pool is not None else 0,
+            "in_use": pool.checkedout() if pool is not None else 0,
+            "idle": pool.checkedin() if pool is not None else 0,
+            "overflow": max(pool.overflow(), 0) if pool is not None else 0,
+            "checkouts": self.checkouts,
+            "checkins": self.checkins,
+            "connects": self.connects,
+            "invalidations": self.invalidations,
+            "timeouts": self.timeouts,
+            "wait_seconds_total": round(self.wait_seconds_total, 6),
+            "wait_seconds_max": round(self.wait_seconds_max, 6),
+        }
+
+
+POOL_STATS: dict = {}
+
+
+def pool_stats(name: str) -> PoolStats:
+    if name not in POOL_STATS:
+        POOL_STATS[name] = PoolStats(name)
+    return POOL_STATS[name]
+
+
+# --------------------------
+# INSTRUMENTED POOLS
+# --------------------------
+# Pool events only fire once a connection is handed out, so the time spent
+# queueing for one is measured around Pool.connect() itself.
+class _TimedCheckout:
+    def connect(self):
+        stats = pool_stats(getattr(self, "logging_name", None) or "default")
+        stats.pool = self
+        start = time.perf_counter()
+        try:
+            return super().connect()
+        except exc.TimeoutError:
+            stats.timeouts += 1
+            raise
+        finally:
+            stats.record_wait(time.perf_counter() - start)
+
+
+class TimedQueuePool(_TimedCheckout, QueuePool):
+    pass
+
+
+class TimedAsyncQueuePool(_TimedCheckout, AsyncAdaptedQueuePool):
+    pass
+
+
+def monitor_pool(engine, name: str) -> PoolStats:
+    stats = pool_stats(name)
+    stats.pool = engine.pool
+
+    @event.listens_for(engine, "connect")
+    def on_connect(dbapi_connection, connection_record):
+        stats.connects += 1
+
+    @event.listens_for(engine, "checkout")
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        stats.checkouts += 1
+
+    @event.listens_for(engine, "checkin")
+    def on_checkin(dbapi_connection, connection_record):
+        stats.checkins += 1
+
+    @event.listens_for(engine, "invalidate")
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        stats.invalidations += 1
+
+    return stats
@@ -0,0 +1,140 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import NamedTuple, Optional
+
+from sqlalchemy import event, inspect
+from . import metrics, models
+from .auth_handler import ACCESS_TOKEN_EXPIRE_MINUTES
+
+# --------------------------
+# SETTINGS
+# --------------------------
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "10000"))
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))
+# Trust the role claim of tokens issued by /auth/login instead of loading the user.
+# Revocations are only seen by the process that made the change, so this is
+# only safe with a single worker: elsewhere a demoted or deleted user keeps the
+# token's role until it expires (ACCESS_TOKEN_EXPIRE_MINUTES).
+TRUST_ROLE_CLAIM = os.getenv("TRUST_ROLE_CLAIM", "0") == "1"
+
+
+class Principal(NamedTuple):
+    id: int
+    role: str
+
+
+# --------------------------
+# TTL LRU CACHE (token -> principal)
+# --------------------------
+class PrincipalCache:
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # token -> (expires_at, principal)
+        self._tokens_by_user = {}       # user_id -> {token, ...}
+        self._revoked_at = {}           # user_id -> time of last role change / deletion
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[Principal]:
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None or entry[0] <= now:
+                if entry is not None:
+                    self._remove(token)
+                self.misses += 1
+                metrics.PRINCIPAL_CACHE_MISSES.inc()
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            metrics.PRINCIPAL_CACHE_HITS.inc()
+            return entry[1]
+
+    def put(self, token: str, principal: Principal, token_expires_at: float):
+        expires_at = min(time.time() + self.ttl, token_expires_at)
+        with self._lock:
+            if token in self._entries:
+                self._remove(token)
+            self._entries[token] = (expires_at, principal)
+            self._tokens_by_user.setdefault(principal.id, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int):
+        now = time.time()
+        with self._lock:
+            for token in self._tokens_by_user.pop(user_id, ()):
+                self._entries.pop(token, None)
+            self._revoked_at[user_id] = now
+            # Tokens issued before this horizon have expired anyway
+            horizon = now - ACCESS_TOKEN_EXPIRE_MINUTES * 60
+            for revoked_user, revoked_at in list(self._revoked_at.items()):
+                if revoked_at < horizon:
+                    del self._revoked_at[revoked_user]
+            self.invalidations += 1
+
+    def claims_outdated(self, user_id: int, issued_at: float) -> bool:
+        revoked_at = self._revoked_at.get(user_id)
+        return revoked_at is not None and issued_at <= revoked_at
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+            self._revoked_at.clear()
+
+    def stats(self) -> dict:
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+    def _remove(self, token: str):
+        _, principal = self._entries.pop(token)
+        tokens = self._tokens_by_user.get(principal.id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens_by_user[principal.id]
+
+
+principal_cache = PrincipalCache(PRINCIPAL_CACHE_SIZE, PRINCIPAL_CACHE_TTL)
+
+
+def principal_from_claims(payload: dict) -> Optional[Principal]:
+    """Principal carried by the token itself, or None when the user must be loaded."""
+    user_id, role = payload.get("user_id"), payload.get("role")
+    if not TRUST_ROLE_CLAIM or user_id is None or role is None:
+        return None
+    if principal_cache.claims_outdated(user_id, payload.get("iat", 0)):
+        return None
+    return Principal(user_id, role)
+
+
+# --------------------------
+# INVALIDATION
+# --------------------------
+# Mapper events fire for every flush, sync or async, so no ORM write can
+# change a role or delete a user without dropping its cached principals in
+# this process. Other workers, and deletes cascaded by the database, are only
+# seen when the cached principal expires (PRINCIPAL_CACHE_TTL) and the user is
+# loaded again.
+@event.listens_for(models.User, "after_update")
+def _user_updated(mapper, connection, target):
+    if inspect(target).attrs.role.history.has_changes():
+        principal_cache.invalidate_user(target.id)
+
+
+@event.listens_for(models.User, "after_delete")
+def _user_deleted(mapper, connection, target):
+    principal_cache.invalidate_user(target.id)
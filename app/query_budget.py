@@ -0,0 +1,107 @@
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from fastapi import Depends
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# --------------------------
+# SETTINGS
+# --------------------------
+# ENFORCE_QUERY_BUDGETS=1 (tests) makes a request fail once it has issued
+# more SQL statements than its route declared with query_budget().
+ENFORCE_QUERY_BUDGETS = os.getenv("ENFORCE_QUERY_BUDGETS", "0") == "1"
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class QueryStats:
+    __slots__ = ("count", "budget", "extra", "statements")
+
+    def __init__(self):
+        self.count = 0
+        self.budget = None
+        self.extra = 0  # statements allowed on top of the budget, see allow_extra()
+        self.statements = []
+
+
+_current_stats: ContextVar = ContextVar("query_stats", default=None)
+
+
+# --------------------------
+# STATEMENT COUNTING
+# --------------------------
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany):
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.count += 1
+        stats.statements.append(statement)
+
+
+@contextmanager
+def count_queries():
+    """Count every statement executed in this context (and threads started from it).
+
+        with count_queries() as stats:
+            client.get("/appointments/")
+        assert stats.count <= 1
+    """
+    stats = QueryStats()
+    token = _current_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def check_budget(stats: QueryStats, label: str = "request"):
+    if stats.budget is not None and stats.count > stats.budget + stats.extra:
+        extra = f" + {stats.extra}" if stats.extra else ""
+        raise QueryBudgetExceeded(
+            f"{label} issued {stats.count} SQL statements, budget is {stats.budget}{extra}:\n"
+            + "\n".join(stats.statements)
+        )
+
+
+# --------------------------
+# PER-ROUTE BUDGETS
+# --------------------------
+def query_budget(limit: Optional[int]):
+    """Route dependency declaring how many statements the endpoint may issue.
+
+    ``None`` marks bulk endpoints whose statement count grows with the input
+    (one or two per chunk, never per row).
+    """
+    def declare():
+        stats = _current_stats.get()
+        if stats is not None:
+            stats.budget = limit
+    return Depends(declare)
+
+
+def allow_extra(count: int = 1):
+    """Let the current request issue ``count`` statements beyond its route budget.
+
+    For work that does not belong to the route, such as loading the user on a
+    principal cache miss (once per token and PRINCIPAL_CACHE_TTL).
+    """
+    stats = _current_stats.get()
+    if stats is not None:
+        stats.extra += count
+
+
+class QueryBudgetMiddleware:
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        with count_queries() as stats:
+            await self.app(scope, receive, send)
+        check_budget(stats, f"{scope['method']} {scope['path']}")
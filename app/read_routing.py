@@ -0,0 +1,66 @@
+import math
+import os
+import time
+from contextvars import ContextVar
+
+from starlette.requests import cookie_parser
+
+# --------------------------
+# SETTINGS
+# --------------------------
+# After a client's own write its reads stay on the primary this long (seconds),
+# so replica lag never hides the write from the client that made it.
+READ_YOUR_WRITES_SECONDS = float(os.getenv("READ_YOUR_WRITES_SECONDS", "5"))
+
+PRIMARY_COOKIE = "read_primary_until"
+SAFE_METHODS = ("GET", "HEAD")
+
+_read_from_replica: ContextVar = ContextVar("read_from_replica", default=False)
+
+
+def reading_from_replica() -> bool:
+    """True while serving a request that get_db/get_async_db should send to the replica."""
+    return _read_from_replica.get()
+
+
+def _primary_until(scope) -> float:
+    for name, value in scope["headers"]:
+        if name == b"cookie":
+            try:
+                return float(cookie_parser(value.decode("latin-1")).get(PRIMARY_COOKIE, 0))
+            except ValueError:
+                return 0.0
+    return 0.0
+
+
+# --------------------------
+# MIDDLEWARE
+# --------------------------
+class ReadRoutingMiddleware:
+    """Routes safe requests to the replica, unless the client wrote within READ_YOUR_WRITES_SECONDS.
+
+    A successful unsafe request (POST/PUT/PATCH/DELETE) sets a short-lived
+    cookie holding the end of the client's primary window.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        safe = scope["method"] in SAFE_METHODS
+
+        async def send_with_window(message):
+            if message["type"] == "http.response.start" and message["status"] < 400:
+                until = time.time() + READ_YOUR_WRITES_SECONDS
+                cookie = (f"{PRIMARY_COOKIE}={until:.3f}; Max-Age={math.ceil(READ_YOUR_WRITES_SECONDS)}; "
+                          "Path=/; HttpOnly; SameSite=Lax")
+                message = {**message, "headers": [*message.get("headers", []), (b"set-cookie", cookie.encode())]}
+            await send(message)
+
+        token = _read_from_replica.set(safe and _primary_until(scope) <= time.time())
+        try:
+            await self.app(scope, receive, send if safe else send_with_window)
+        finally:
+            _read_from_replica.reset(token)
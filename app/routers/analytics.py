@@ -0,0 +1,17 @@
+from fastapi import APIRouter, Depends, Path
+from sqlalchemy.orm import Session
+from .. import analytics
+from ..analytics import AnalyticsParams
+from ..utils import get_db, require_admin, Principal
+from ..admission import admission
+from ..query_budget import query_budget
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+# Vaccinations are read as column batches and aggregated with NumPy (see app/analytics.py).
+
+# GET a coverage report as JSON, Parquet or Arrow (admin only)
+@router.get("/{report}", dependencies=[admission("bulk"), query_budget(3)])
+def get_report(report: str = Path(pattern=analytics.REPORT_PATTERN), params: AnalyticsParams = Depends(),
+               db: Session = Depends(get_db), admin: Principal = Depends(require_admin)):
+    return analytics.report_response(report, analytics.load(db, params), params)
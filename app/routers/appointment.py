@@ -1,39 +1,70 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
-from sqlalchemy.orm import Session
-from .. import models, schemas
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from sqlalchemy import exists, func
+from sqlalchemy.orm import Session, joinedload
+from .. import exports, models, projections, schemas
+from ..appointment_status import apply_status_batch
 from ..database import SessionLocal
-from ..utils import get_db, require_admin, require_citizen
+from ..utils import get_db, require_admin, require_citizen, Principal
+from ..pagination import TOTAL_COUNT_HEADER, PageParams, paginate
+from ..loaders import eager
+from ..admission import admission
+from ..query_budget import query_budget
+from ..exports import ExportParams
+from ..conditional import conditional, latest, make_etag
+from ..vaccine_catalog import vaccine_catalog
 
 router = APIRouter(prefix="/appointments", tags=["Appointments"])
 
+# Relationships serialized by AppointmentOut
+LOAD_OPTIONS = eager(joinedload(models.Appointment.vaccine))
+
 # GET all appointments
-@router.get("/", response_model=list[schemas.AppointmentOut])
-def get_appointments(db: Session = Depends(get_db)):
-    return db.query(models.Appointment).all()
+@router.get("/", response_model=list[schemas.AppointmentOut], dependencies=[query_budget(1)])
+def get_appointments(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    return paginate(db, projections.APPOINTMENTS, page, response)
+
+# HEAD all appointments: row count in X-Total-Count, no body
+@router.head("/", dependencies=[query_budget(1)])
+def count_appointments(db: Session = Depends(get_db)):
+    total = db.query(func.count(models.Appointment.id)).scalar()
+    return Response(status_code=200, headers={TOTAL_COUNT_HEADER: str(total)})
+
+# GET export (admin only), declared before /{appointment_id}
+# Column tuples streamed from a server-side cursor; no ORM objects are built.
+@router.get("/export", dependencies=[admission("bulk"), query_budget(2)])
+def export_appointments(params: ExportParams = Depends(), db: Session = Depends(get_db),
+                        admin: Principal = Depends(require_admin)):
+    stmt, names = exports.export_statement(exports.APPOINTMENTS, params)
+    return exports.export_response(exports.iter_export(db, stmt, names, params.format), exports.APPOINTMENTS, params)
 
-# HEAD appointment
-@router.head("/{appointment_id}")
+# HEAD appointment: EXISTS probe on the primary key, the row is never loaded
+@router.head("/{appointment_id}", dependencies=[query_budget(1)])
 def head_appointment(appointment_id: int, db: Session = Depends(get_db)):
-    exists = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
-    if not exists:
+    found = db.query(exists().where(models.Appointment.id == appointment_id)).scalar()
+    if not found:
         raise HTTPException(status_code=404)
     return Response(status_code=200)
 
 # GET appointment by ID
-@router.get("/{appointment_id}", response_model=schemas.AppointmentOut)
-def get_appointment(appointment_id: int, db: Session = Depends(get_db)):
-    appointment = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
+@router.get("/{appointment_id}", response_model=schemas.AppointmentOut, dependencies=[query_budget(1)])
+def get_appointment(appointment_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    appointment = db.query(models.Appointment).options(*LOAD_OPTIONS).filter(
+        models.Appointment.id == appointment_id).first()
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
+    last_modified = latest(appointment.updated_at, appointment.vaccine.updated_at if appointment.vaccine else None)
+    not_modified = conditional(request, response, make_etag("appointment", appointment_id, last_modified), last_modified)
+    if not_modified:
+        return not_modified
     return appointment
 
 # POST appointment (citizen only)
-@router.post("/", response_model=schemas.AppointmentOut)
+@router.post("/", response_model=schemas.AppointmentOut, dependencies=[admission("booking"), query_budget(8)])
 def create_appointment(appointment: schemas.AppointmentCreate, db: Session = Depends(get_db),
-                       citizen: models.User = Depends(require_citizen)):
+                       citizen: Principal = Depends(require_citizen)):
     if appointment.citizen_id != citizen.id:
         raise HTTPException(status_code=403, detail="You can only book for yourself")
-    vaccine = db.query(models.Vaccine).filter(models.Vaccine.id == appointment.vaccine_id).first()
+    vaccine = vaccine_catalog.get(db, appointment.vaccine_id)
     if not vaccine:
         raise HTTPException(status_code=404, detail="Vaccine not found")
     new_appointment = models.Appointment(**appointment.dict())
@@ -42,10 +73,21 @@ def create_appointment(appointment: schemas.AppointmentCreate, db: Session = Dep
     db.refresh(new_appointment)
     return new_appointment
 
+# PATCH many appointment statuses (admin only)
+# Set-based UPDATE ... RETURNING per source status, one rollup upsert, up to two
+# slot statements, one event INSERT and one SELECT to explain ids left
+# untouched: constant whatever the batch size.
+@router.patch("/status", response_model=schemas.AppointmentStatusBatchOut, dependencies=[admission("bulk"), query_budget(8)])
+def update_appointment_statuses(batch: schemas.AppointmentStatusBatch, db: Session = Depends(get_db),
+                                admin: Principal = Depends(require_admin)):
+    result = apply_status_batch(db, batch, admin.id)
+    db.commit()
+    return result
+
 # PATCH appointment status (admin only)
-@router.patch("/{appointment_id}/status", response_model=schemas.AppointmentOut)
+@router.patch("/{appointment_id}/status", response_model=schemas.AppointmentOut, dependencies=[query_budget(7)])
 def update_appointment_status(appointment_id: int, status: str, reason_rejection: str = None,
-                              db: Session = Depends(get_db), admin: models.User = Depends(require_admin)):
+                              db: Session = Depends(get_db), admin: Principal = Depends(require_admin)):
     appointment = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
@@ -58,10 +100,10 @@ def update_appointment_status(appointment_id: int, status: str, reason_rejection
     db.refresh(appointment)
     return appointment
 
-# DELETE appointment (citizen or admin)
-@router.delete("/{appointment_id}", status_code=204)
+# DELETE appointment (citizen or admin), with its vaccination (session cascade)
+@router.delete("/{appointment_id}", status_code=204, dependencies=[query_budget(8)])
 def delete_appointment(appointment_id: int, db: Session = Depends(get_db),
-                       user: models.User = Depends(require_citizen)):
+                       user: Principal = Depends(require_citizen)):
     appointment = db.query(models.Appointment).filter(models.Appointment.id == appointment_id).first()
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
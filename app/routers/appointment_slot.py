@@ -0,0 +1,29 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from .. import schemas, slots
+from ..utils import get_db, require_admin, Principal
+from ..query_budget import query_budget
+from ..vaccine_catalog import vaccine_catalog
+
+router = APIRouter(prefix="/slots", tags=["Appointment Slots"])
+
+# Places per vaccine and day; bookings take them with a conditional increment (see app/slots.py).
+
+# GET slots with capacity and booked places (admin only)
+@router.get("/", response_model=list[schemas.AppointmentSlotOut], dependencies=[query_budget(1)])
+def get_slots(vaccine_id: Optional[int] = None, date_from: Optional[date] = None, date_to: Optional[date] = None,
+              db: Session = Depends(get_db), admin: Principal = Depends(require_admin)):
+    return slots.list_slots(db, vaccine_id, date_from, date_to)
+
+# PUT slot capacity (admin only)
+@router.put("/{vaccine_id}/{day}", response_model=schemas.AppointmentSlotOut, dependencies=[query_budget(3)])
+def set_slot_capacity(vaccine_id: int, day: date, body: schemas.AppointmentSlotCapacity,
+                      db: Session = Depends(get_db), admin: Principal = Depends(require_admin)):
+    if not vaccine_catalog.get(db, vaccine_id):
+        raise HTTPException(status_code=404, detail="Vaccine not found")
+    slot = slots.set_capacity(db, vaccine_id, day, body.capacity)
+    db.commit()
+    return slot
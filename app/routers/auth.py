@@ -3,8 +3,10 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from ..database import SessionLocal
 from .. import models, schemas
-from ..utils import verify_password
+from ..utils import verify_and_update_password
 from ..auth_handler import create_access_token
+from ..admission import admission
+from ..query_budget import query_budget
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
@@ -16,19 +18,28 @@ def get_db():
         db.close()
 
 
-@router.post("/login", response_model=schemas.Token)
+@router.post("/login", response_model=schemas.Token, dependencies=[admission("auth"), query_budget(2)])
 def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = db.query(models.User).filter(
+    user = db.query(models.User.id, models.User.password_hash, models.User.role).filter(
         models.User.email == form_data.username
     ).first()
+    # End the read transaction: the connection goes back to the pool while PBKDF2 runs.
+    db.rollback()
 
-    if not user or not verify_password(form_data.password, user.password_hash):
+    valid, new_hash = verify_and_update_password(form_data.password, user.password_hash) if user else (False, None)
+    if not valid:
         raise HTTPException(status_code=400, detail="Invalid credentials")
 
-    token = create_access_token({"user_id": user.id})
+    # Rehash with the current PASSWORD_HASH_ROUNDS
+    if new_hash:
+        db.query(models.User).filter(models.User.id == user.id).update(
+            {"password_hash": new_hash}, synchronize_session=False)
+        db.commit()
+
+    token = create_access_token({"user_id": user.id, "role": user.role})
     return {"access_token": token, "token_type": "bearer"}
 
 
@@ -1,62 +1,121 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
-from sqlalchemy.orm import Session
-from .. import models, schemas
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from sqlalchemy import exists, func
+from sqlalchemy.orm import Session, joinedload
+from .. import article_search, models, projections, schemas
 from ..database import SessionLocal
-from ..utils import get_db, require_admin, get_current_user
+from ..utils import get_db, require_admin, get_current_user, Principal
+from ..pagination import (DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, NEXT_CURSOR_HEADER, TOTAL_COUNT_HEADER, PageParams,
+                          decode_cursor, encode_cursor, paginate)
+from ..loaders import eager
+from ..query_budget import query_budget
+from ..conditional import conditional, is_conditional, latest, make_etag
+from ..versions import bump_version, read_version
 
 router = APIRouter(prefix="/articles", tags=["AwarenessArticles"])
 
+# Relationships serialized by AwarenessArticleOut
+LOAD_OPTIONS = eager(joinedload(models.AwarenessArticle.author))
+# catalog_versions row bumped by every article write; drives the list ETag.
+VERSION_NAME = "articles"
+
+
+def _article_validators(article_id: int, article_updated_at, author_updated_at):
+    last_modified = latest(article_updated_at, author_updated_at)
+    return make_etag("article", article_id, last_modified), last_modified
+
 # GET all articles
-@router.get("/", response_model=list[schemas.AwarenessArticleOut])
-def get_articles(db: Session = Depends(get_db)):
-    return db.query(models.AwarenessArticle).all()
+@router.get("/", response_model=list[schemas.AwarenessArticleOut], dependencies=[query_budget(2)])
+def get_articles(request: Request, response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    version, updated_at = read_version(db, VERSION_NAME)
+    etag = make_etag(VERSION_NAME, version, page.after_id, page.limit, page.stream, page.ids)
+    not_modified = conditional(request, response, etag, updated_at)
+    if not_modified:
+        return not_modified
+    return paginate(db, projections.ARTICLES, page, response)
 
-# HEAD article
-@router.head("/{article_id}")
+# HEAD all articles: row count in X-Total-Count, no body
+@router.head("/", dependencies=[query_budget(1)])
+def count_articles(db: Session = Depends(get_db)):
+    total = db.query(func.count(models.AwarenessArticle.id)).scalar()
+    return Response(status_code=200, headers={TOTAL_COUNT_HEADER: str(total)})
+
+# GET search articles (ranked full-text search, declared before /{article_id})
+# The cursor is the offset of the next page: ranked results have no stable keyset.
+@router.get("/search", response_model=list[schemas.AwarenessArticleSearchHit], dependencies=[query_budget(1)])
+def search_articles(response: Response, q: str = Query(..., min_length=1, max_length=200),
+                    cursor: Optional[str] = None, limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+                    db: Session = Depends(get_db)):
+    offset = max(decode_cursor(cursor, "offset")["offset"], 0) if cursor else 0
+    hits = article_search.search_articles(db, q, limit + 1, offset)
+    if len(hits) > limit:
+        hits = hits[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor({"offset": offset + limit})
+    return hits
+
+# HEAD article: EXISTS probe on the primary key, the row is never loaded
+@router.head("/{article_id}", dependencies=[query_budget(1)])
 def head_article(article_id: int, db: Session = Depends(get_db)):
-    exists = db.query(models.AwarenessArticle).filter(models.AwarenessArticle.id == article_id).first()
-    if not exists:
+    found = db.query(exists().where(models.AwarenessArticle.id == article_id)).scalar()
+    if not found:
         raise HTTPException(status_code=404)
     return Response(status_code=200)
 
 # GET article by ID
-@router.get("/{article_id}", response_model=schemas.AwarenessArticleOut)
-def get_article(article_id: int, db: Session = Depends(get_db)):
-    article = db.query(models.AwarenessArticle).filter(models.AwarenessArticle.id == article_id).first()
+# Revalidation reads only the timestamps, so a 304 never loads the article content.
+@router.get("/{article_id}", response_model=schemas.AwarenessArticleOut, dependencies=[query_budget(2)])
+def get_article(article_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    if is_conditional(request):
+        stamps = db.query(models.AwarenessArticle.updated_at, models.User.updated_at).outerjoin(
+            models.AwarenessArticle.author).filter(models.AwarenessArticle.id == article_id).first()
+        not_modified = stamps and conditional(request, response, *_article_validators(article_id, *stamps))
+        if not_modified:
+            return not_modified
+    article = db.query(models.AwarenessArticle).options(*LOAD_OPTIONS).filter(
+        models.AwarenessArticle.id == article_id).first()
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
+    author_updated_at = article.author.updated_at if article.author else None
+    not_modified = conditional(request, response,
+                               *_article_validators(article_id, article.updated_at, author_updated_at))
+    if not_modified:
+        return not_modified
     return article
 
 # POST article (admin only)
-@router.post("/", response_model=schemas.AwarenessArticleOut)
+@router.post("/", response_model=schemas.AwarenessArticleOut, dependencies=[query_budget(5)])
 def create_article(article: schemas.AwarenessArticleBase, db: Session = Depends(get_db),
-                   admin: models.User = Depends(require_admin)):
+                   admin: Principal = Depends(require_admin)):
     new_article = models.AwarenessArticle(**article.dict(), created_by=admin.id)
     db.add(new_article)
+    bump_version(db, VERSION_NAME)
     db.commit()
     db.refresh(new_article)
     return new_article
 
 # PATCH article (admin only)
-@router.patch("/{article_id}", response_model=schemas.AwarenessArticleOut)
+@router.patch("/{article_id}", response_model=schemas.AwarenessArticleOut, dependencies=[query_budget(6)])
 def update_article(article_id: int, article: schemas.AwarenessArticleBase, db: Session = Depends(get_db),
-                   admin: models.User = Depends(require_admin)):
+                   admin: Principal = Depends(require_admin)):
     db_article = db.query(models.AwarenessArticle).filter(models.AwarenessArticle.id == article_id).first()
     if not db_article:
         raise HTTPException(status_code=404, detail="Article not found")
     for key, value in article.dict(exclude_unset=True).items():
         setattr(db_article, key, value)
+    bump_version(db, VERSION_NAME)
     db.commit()
     db.refresh(db_article)
     return db_article
 
 # DELETE article (admin only)
-@router.delete("/{article_id}", status_code=204)
+@router.delete("/{article_id}", status_code=204, dependencies=[query_budget(4)])
 def delete_article(article_id: int, db: Session = Depends(get_db),
-                   admin: models.User = Depends(require_admin)):
+                   admin: Principal = Depends(require_admin)):
     article = db.query(models.AwarenessArticle).filter(models.AwarenessArticle.id == article_id).first()
     if not article:
         raise HTTPException(status_code=404, detail="Article not found")
     db.delete(article)
+    bump_version(db, VERSION_NAME)
     db.commit()
     return Response(status_code=204)
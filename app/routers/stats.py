@@ -0,0 +1,25 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from .. import schemas, stats
+from ..utils import get_db, require_admin, Principal
+from ..query_budget import query_budget
+
+router = APIRouter(prefix="/stats", tags=["Stats"])
+
+# Dashboard reads come from rollup rows maintained on every write: O(buckets), not O(rows).
+
+# GET appointments per vaccine, day and status (admin only)
+@router.get("/appointments", response_model=list[schemas.AppointmentDayStatsOut], dependencies=[query_budget(1)])
+def get_appointment_stats(vaccine_id: Optional[int] = None, date_from: Optional[date] = None,
+                          date_to: Optional[date] = None, db: Session = Depends(get_db),
+                          admin: Principal = Depends(require_admin)):
+    return stats.appointment_stats(db, vaccine_id, date_from, date_to)
+
+# GET doses administered per vaccine (admin only)
+@router.get("/vaccinations", response_model=list[schemas.VaccineDoseStatsOut], dependencies=[query_budget(1)])
+def get_dose_stats(vaccine_id: Optional[int] = None, db: Session = Depends(get_db),
+                   admin: Principal = Depends(require_admin)):
+    return stats.dose_stats(db, vaccine_id)
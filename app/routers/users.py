@@ -1,25 +1,21 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import func
 from sqlalchemy.orm import Session
-from ..database import SessionLocal
 from .. import models
+from .. import projections
 from .. import schemas
 from ..utils import hash_password ,get_db, require_admin
+from ..pagination import TOTAL_COUNT_HEADER, PageParams, paginate
+from ..admission import admission
+from ..query_budget import query_budget
 
 router = APIRouter(prefix="/users", tags=["Users"])
 
 
-def get_db():
-    db = SessionLocal()
-    try:
-        yield db
-    finally:
-        db.close()
-
-
 # =========================
 # REGISTER USER
 # =========================
-@router.post("/register", response_model=schemas.UserOut)
+@router.post("/register", response_model=schemas.UserOut, dependencies=[admission("auth"), query_budget(3)])
 def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
 
     existing_user = db.query(models.User).filter(models.User.email == user.email).first()
@@ -44,7 +40,12 @@ def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
 # =========================
 # GET ALL USERS (Admin later)
 # =========================
-@router.get("/", response_model=list[schemas.UserOut])
-def get_users(db: Session = Depends(get_db)):
-    users = db.query(models.User).all()
-    return users
+@router.get("/", response_model=list[schemas.UserOut], dependencies=[query_budget(1)])
+def get_users(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    return paginate(db, projections.USERS, page, response)
+
+# HEAD all users: row count in X-Total-Count, no body
+@router.head("/", dependencies=[query_budget(1)])
+def count_users(db: Session = Depends(get_db)):
+    total = db.query(func.count(models.User.id)).scalar()
+    return Response(status_code=200, headers={TOTAL_COUNT_HEADER: str(total)})
@@ -1,36 +1,68 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
-from sqlalchemy.orm import Session
-from .. import models, schemas
+import io
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, Response, UploadFile
+from sqlalchemy import exists, func
+from sqlalchemy.orm import Session, joinedload
+from .. import exports, models, projections, schemas, vaccination_import
 from ..database import SessionLocal
-from ..utils import get_db, require_admin
+from ..utils import get_db, require_admin, Principal
+from ..pagination import TOTAL_COUNT_HEADER, PageParams, paginate
+from ..loaders import eager
+from ..admission import admission
+from ..query_budget import query_budget
+from ..exports import ExportParams
+from ..conditional import conditional, latest, make_etag
 
 router = APIRouter(prefix="/vaccinations", tags=["Vaccinations"])
 
+# Relationships serialized by VaccinationOut
+LOAD_OPTIONS = eager(joinedload(models.Vaccination.vaccine))
+
 # GET all vaccinations
-@router.get("/", response_model=list[schemas.VaccinationOut])
-def get_vaccinations(db: Session = Depends(get_db)):
-    return db.query(models.Vaccination).all()
+@router.get("/", response_model=list[schemas.VaccinationOut], dependencies=[query_budget(1)])
+def get_vaccinations(response: Response, page: PageParams = Depends(), db: Session = Depends(get_db)):
+    return paginate(db, projections.VACCINATIONS, page, response)
+
+# HEAD all vaccinations: row count in X-Total-Count, no body
+@router.head("/", dependencies=[query_budget(1)])
+def count_vaccinations(db: Session = Depends(get_db)):
+    total = db.query(func.count(models.Vaccination.id)).scalar()
+    return Response(status_code=200, headers={TOTAL_COUNT_HEADER: str(total)})
 
-# HEAD vaccination
-@router.head("/{vaccination_id}")
+# GET export (admin only), declared before /{vaccination_id}
+# Column tuples streamed from a server-side cursor; no ORM objects are built.
+@router.get("/export", dependencies=[admission("bulk"), query_budget(2)])
+def export_vaccinations(params: ExportParams = Depends(), db: Session = Depends(get_db),
+                        admin: Principal = Depends(require_admin)):
+    stmt, names = exports.export_statement(exports.VACCINATIONS, params)
+    return exports.export_response(exports.iter_export(db, stmt, names, params.format), exports.VACCINATIONS, params)
+
+# HEAD vaccination: EXISTS probe on the primary key, the row is never loaded
+@router.head("/{vaccination_id}", dependencies=[query_budget(1)])
 def head_vaccination(vaccination_id: int, db: Session = Depends(get_db)):
-    exists = db.query(models.Vaccination).filter(models.Vaccination.id == vaccination_id).first()
-    if not exists:
+    found = db.query(exists().where(models.Vaccination.id == vaccination_id)).scalar()
+    if not found:
         raise HTTPException(status_code=404)
     return Response(status_code=200)
 
 # GET vaccination by ID
-@router.get("/{vaccination_id}", response_model=schemas.VaccinationOut)
-def get_vaccination(vaccination_id: int, db: Session = Depends(get_db)):
-    vaccination = db.query(models.Vaccination).filter(models.Vaccination.id == vaccination_id).first()
+@router.get("/{vaccination_id}", response_model=schemas.VaccinationOut, dependencies=[query_budget(1)])
+def get_vaccination(vaccination_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    vaccination = db.query(models.Vaccination).options(*LOAD_OPTIONS).filter(
+        models.Vaccination.id == vaccination_id).first()
     if not vaccination:
         raise HTTPException(status_code=404, detail="Vaccination not found")
+    last_modified = latest(vaccination.updated_at, vaccination.vaccine.updated_at if vaccination.vaccine else None)
+    not_modified = conditional(request, response, make_etag("vaccination", vaccination_id, last_modified), last_modified)
+    if not_modified:
+        return not_modified
     return vaccination
 
 # POST vaccination (admin only)
-@router.post("/", response_model=schemas.VaccinationOut)
+@router.post("/", response_model=schemas.VaccinationOut, dependencies=[query_budget(6)])
 def create_vaccination(vaccination: schemas.VaccinationCreate, db: Session = Depends(get_db),
-                       admin: models.User = Depends(require_admin)):
+                       admin: Principal = Depends(require_admin)):
     appointment = db.query(models.Appointment).filter(models.Appointment.id == vaccination.appointment_id).first()
     if not appointment:
         raise HTTPException(status_code=404, detail="Appointment not found")
@@ -40,10 +72,25 @@ def create_vaccination(vaccination: schemas.VaccinationCreate, db: Session = Dep
     db.refresh(new_vaccination)
     return new_vaccination
 
+# POST bulk import (admin only)
+# Streamed in chunks: each costs one appointment lookup, a citizen lookup for rows
+# not owned by their appointment's citizen, one COPY/executemany and one event insert.
+@router.post("/import", response_model=schemas.VaccinationImportOut, dependencies=[admission("bulk"), query_budget(None)])
+def import_vaccinations(file: UploadFile = File(...), format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+                        db: Session = Depends(get_db), admin: Principal = Depends(require_admin)):
+    fmt = format or vaccination_import.detect_format(file.filename, file.content_type)
+    stream = io.TextIOWrapper(file.file, encoding="utf-8", newline="")
+    try:
+        result = vaccination_import.import_vaccinations(db, stream, fmt, admin.id)
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File is not UTF-8 encoded")
+    db.commit()
+    return result
+
 # PATCH vaccination (admin only)
-@router.patch("/{vaccination_id}", response_model=schemas.VaccinationOut)
+@router.patch("/{vaccination_id}", response_model=schemas.VaccinationOut, dependencies=[query_budget(6)])
 def update_vaccination(vaccination_id: int, vaccination: schemas.VaccinationCreate, db: Session = Depends(get_db),
-                       admin: models.User = Depends(require_admin)):
+                       admin: Principal = Depends(require_admin)):
     db_vacc = db.query(models.Vaccination).filter(models.Vaccination.id == vaccination_id).first()
     if not db_vacc:
         raise HTTPException(status_code=404, detail="Vaccination not found")
@@ -54,9 +101,9 @@ def update_vaccination(vaccination_id: int, vaccination: schemas.VaccinationCrea
     return db_vacc
 
 # DELETE vaccination (admin only)
-@router.delete("/{vaccination_id}", status_code=204)
+@router.delete("/{vaccination_id}", status_code=204, dependencies=[query_budget(4)])
 def delete_vaccination(vaccination_id: int, db: Session = Depends(get_db),
-                       admin: models.User = Depends(require_admin)):
+                       admin: Principal = Depends(require_admin)):
     vacc = db.query(models.Vaccination).filter(models.Vaccination.id == vaccination_id).first()
     if not vacc:
         raise HTTPException(status_code=404, detail="Vaccination not found")
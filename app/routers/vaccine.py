@@ -1,67 +1,101 @@
-from fastapi import APIRouter, Depends, HTTPException, Response
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
 from sqlalchemy.orm import Session
 from .. import models, schemas
 from ..database import SessionLocal
-from ..utils import get_db, require_admin
+from ..utils import get_db, require_admin, Principal
+from ..pagination import TOTAL_COUNT_HEADER, parse_ids, set_missing_ids
+from ..query_budget import query_budget
+from ..vaccine_catalog import vaccine_catalog
+from ..conditional import conditional, make_etag
 
 router = APIRouter(prefix="/vaccines", tags=["Vaccines"])
 
-# GET all vaccines
-@router.get("/", response_model=list[schemas.VaccineOut])
-def get_vaccines(db: Session = Depends(get_db)):
-    return db.query(models.Vaccine).all()
+# GET all vaccines, or ?ids=1,2,3 (missing ids listed in X-Missing-Ids)
+# Catalog reads are served from the in-memory snapshot; the budget covers a refresh.
+# The ETag follows the shared catalog version, so a 304 costs no serialization.
+@router.get("/", response_model=list[schemas.VaccineOut], dependencies=[query_budget(2)])
+def get_vaccines(request: Request, response: Response, ids: Optional[str] = None, db: Session = Depends(get_db)):
+    wanted = parse_ids(ids) if ids is not None else None
+    version, updated_at = vaccine_catalog.validators(db)
+    etag = make_etag("vaccines", version) if wanted is None else make_etag("vaccines", version, wanted)
+    not_modified = conditional(request, response, etag, updated_at)
+    if not_modified:
+        return not_modified
+    if wanted is None:
+        return vaccine_catalog.all(db)
+    vaccines = vaccine_catalog.many(db, wanted)
+    set_missing_ids(response, wanted, (vaccine.id for vaccine in vaccines))
+    return vaccines
+
+# HEAD all vaccines: catalog size in X-Total-Count
+@router.head("/", dependencies=[query_budget(2)])
+def count_vaccines(db: Session = Depends(get_db)):
+    total = vaccine_catalog.count(db)
+    return Response(status_code=200, headers={TOTAL_COUNT_HEADER: str(total)})
 
-# HEAD vaccine
-@router.head("/{vaccine_id}")
+# HEAD vaccine: a snapshot lookup, or an EXISTS probe with the cache off
+@router.head("/{vaccine_id}", dependencies=[query_budget(2)])
 def head_vaccine(vaccine_id: int, db: Session = Depends(get_db)):
-    exists = db.query(models.Vaccine).filter(models.Vaccine.id == vaccine_id).first()
-    if not exists:
+    found = vaccine_catalog.exists(db, vaccine_id)
+    if not found:
         raise HTTPException(status_code=404)
     return Response(status_code=200)
 
 # GET vaccine by ID
-@router.get("/{vaccine_id}", response_model=schemas.VaccineOut)
-def get_vaccine(vaccine_id: int, db: Session = Depends(get_db)):
-    vaccine = db.query(models.Vaccine).filter(models.Vaccine.id == vaccine_id).first()
+@router.get("/{vaccine_id}", response_model=schemas.VaccineOut, dependencies=[query_budget(2)])
+def get_vaccine(vaccine_id: int, request: Request, response: Response, db: Session = Depends(get_db)):
+    vaccine = vaccine_catalog.get(db, vaccine_id)
     if not vaccine:
         raise HTTPException(status_code=404, detail="Vaccine not found")
+    version, updated_at = vaccine_catalog.validators(db)
+    not_modified = conditional(request, response, make_etag("vaccines", version, vaccine_id), updated_at)
+    if not_modified:
+        return not_modified
     return vaccine
 
 # POST vaccine (admin only)
-@router.post("/", response_model=schemas.VaccineOut)
+@router.post("/", response_model=schemas.VaccineOut, dependencies=[query_budget(5)])
 def create_vaccine(vaccine: schemas.VaccineCreate, db: Session = Depends(get_db),
-                   admin: models.User = Depends(require_admin)):
+                   admin: Principal = Depends(require_admin)):
     exists = db.query(models.Vaccine).filter(models.Vaccine.name == vaccine.name).first()
     if exists:
         raise HTTPException(status_code=400, detail="Vaccine already exists")
     new_vaccine = models.Vaccine(**vaccine.dict())
     db.add(new_vaccine)
+    vaccine_catalog.bump(db)
     db.commit()
+    vaccine_catalog.invalidate()
     db.refresh(new_vaccine)
     return new_vaccine
 
 # PATCH vaccine (admin only)
-@router.patch("/{vaccine_id}", response_model=schemas.VaccineOut)
+@router.patch("/{vaccine_id}", response_model=schemas.VaccineOut, dependencies=[query_budget(5)])
 def update_vaccine(vaccine_id: int, vaccine: schemas.VaccineCreate, db: Session = Depends(get_db),
-                   admin: models.User = Depends(require_admin)):
+                   admin: Principal = Depends(require_admin)):
     db_vaccine = db.query(models.Vaccine).filter(models.Vaccine.id == vaccine_id).first()
     if not db_vaccine:
         raise HTTPException(status_code=404, detail="Vaccine not found")
     for key, value in vaccine.dict(exclude_unset=True).items():
         setattr(db_vaccine, key, value)
+    vaccine_catalog.bump(db)
     db.commit()
+    vaccine_catalog.invalidate()
     db.refresh(db_vaccine)
     return db_vaccine
 
 # DELETE vaccine (admin only)
-@router.delete("/{vaccine_id}", status_code=204)
+@router.delete("/{vaccine_id}", status_code=204, dependencies=[query_budget(6)])
 def delete_vaccine(vaccine_id: int, db: Session = Depends(get_db),
-                   admin: models.User = Depends(require_admin)):
+                   admin: Principal = Depends(require_admin)):
     vaccine = db.query(models.Vaccine).filter(models.Vaccine.id == vaccine_id).first()
     if not vaccine:
         raise HTTPException(status_code=404, detail="Vaccine not found")
     if vaccine.appointments or vaccine.vaccinations:
         raise HTTPException(status_code=400, detail="Cannot delete vaccine linked to appointments or vaccinations")
     db.delete(vaccine)
+    vaccine_catalog.bump(db)
     db.commit()
+    vaccine_catalog.invalidate()
     return Response(status_code=204)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 from typing import Optional, List
-from datetime import datetime
+from datetime import date, datetime
 
 
 # =========================
@@ -70,6 +70,30 @@ class AppointmentOut(AppointmentBase):
         orm_mode = True
 
 
+class AppointmentStatusBatch(BaseModel):
+    status: str
+    reason_rejection: Optional[str] = None
+    # Either explicit ids...
+    ids: Optional[List[int]] = None
+    # ...or a filter (preferred_date in [date_from, date_to))
+    vaccine_id: Optional[int] = None
+    date_from: Optional[datetime] = None
+    date_to: Optional[datetime] = None
+    current_status: Optional[str] = None
+
+
+class AppointmentStatusResult(BaseModel):
+    id: int
+    result: str  # "updated", "not_found" or "invalid_transition"
+    status: Optional[str] = None  # status after the batch
+
+
+class AppointmentStatusBatchOut(BaseModel):
+    status: str
+    updated: int
+    results: List[AppointmentStatusResult]
+
+
 # =========================
 # VACCINATION SCHEMAS
 # =========================
@@ -95,6 +119,18 @@ class VaccinationOut(VaccinationBase):
         orm_mode = True
 
 
+class VaccinationImportError(BaseModel):
+    line: int  # line number in the uploaded file
+    errors: List[str]
+
+
+class VaccinationImportOut(BaseModel):
+    inserted: int
+    failed: int
+    errors: List[VaccinationImportError]
+    errors_truncated: bool  # more rows failed than are listed in errors
+
+
 # =========================
 # AWARENESS ARTICLE SCHEMAS
 # =========================
@@ -110,7 +146,18 @@ class AwarenessArticleCreate(AwarenessArticleBase):
 class AwarenessArticleOut(AwarenessArticleBase):
     id: int
     created_at: datetime
-    author: UserOut
+    author: Optional[UserOut] = None  # None once the author is deleted (created_by is SET NULL)
+
+    class Config:
+        orm_mode = True
+
+
+class AwarenessArticleSearchHit(BaseModel):
+    id: int
+    title: str
+    snippet: str  # matched fragment as HTML: text escaped, terms wrapped in <mark></mark>
+    rank: float  # higher is more relevant
+    created_at: datetime
 
     class Config:
         orm_mode = True
@@ -128,3 +175,35 @@ class Token(BaseModel):
     access_token: str
     token_type: str = "bearer"
 
+
+
+# =========================
+# DASHBOARD SCHEMAS
+# =========================
+class AppointmentDayStatsOut(BaseModel):
+    vaccine_id: int
+    day: date
+    pending: int
+    approved: int
+    rejected: int
+    total: int
+
+
+class VaccineDoseStatsOut(BaseModel):
+    vaccine_id: int
+    doses: int
+
+
+# =========================
+# APPOINTMENT SLOT SCHEMAS
+# =========================
+class AppointmentSlotCapacity(BaseModel):
+    capacity: Optional[int] = Field(None, ge=0)  # None: unlimited
+
+
+class AppointmentSlotOut(BaseModel):
+    vaccine_id: int
+    day: date
+    capacity: Optional[int]
+    booked: int
+    available: Optional[int]  # None: unlimited
@@ -1,32 +1,36 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from .database import SessionLocal
 from . import models
+from .vaccine_catalog import vaccine_catalog
 
+VACCINES = [
+    {"name": "Fièvre Jaune", "price": 92},
+    {"name": "Hépatite A", "price": 100},
+    {"name": "Hépatite B", "price": 65},
+    {"name": "Typhoïde", "price": 33},
+    {"name": "Méningite", "price": 120},
+    {"name": "Grippe", "price": 35},
+    {"name": "Antirabique", "price": 180},
+    {"name": "RRO (Rougeole – Rubéole – Oreillons)", "price": 70},
+]
 
-def seed_vaccines():
-    db: Session = SessionLocal()
 
-    vaccines = [
-        {"name": "Fièvre Jaune", "price": 92},
-        {"name": "Hépatite A", "price": 100},
-        {"name": "Hépatite B", "price": 65},
-        {"name": "Typhoïde", "price": 33},
-        {"name": "Méningite", "price": 120},
-        {"name": "Grippe", "price": 35},
-        {"name": "Antirabique", "price": 180},
-        {"name": "RRO (Rougeole – Rubéole – Oreillons)", "price": 70},
-    ]
+def insert_missing_vaccines(db: Session):
+    """One SELECT for the names already there, one multi-row INSERT for the rest."""
+    names = [v["name"] for v in VACCINES]
+    existing = set(db.scalars(select(models.Vaccine.name).where(models.Vaccine.name.in_(names))))
+    missing = [models.Vaccine(name=v["name"], price=v["price"], availability=True)
+               for v in VACCINES if v["name"] not in existing]
+    db.add_all(missing)
+    if missing:
+        vaccine_catalog.bump(db)
+    return len(missing)
 
-    for v in vaccines:
-        exists = db.query(models.Vaccine).filter(models.Vaccine.name == v["name"]).first()
-        if not exists:
-            vaccine = models.Vaccine(
-                name=v["name"],
-                price=v["price"],
-                availability=True
-            )
-            db.add(vaccine)
 
+def seed_vaccines():
+    db: Session = SessionLocal()
+    insert_missing_vaccines(db)
     db.commit()
     db.close()
     print("🎉 Vaccines inserted successfully!")
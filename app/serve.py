@@ -0,0 +1,175 @@
+"""Production server: the app preloaded once, then forked into N uvicorn workers.
+
+    python -m app.serve --workers 4 --host 0.0.0.0 --port 8000
+
+The master process imports the app (routers, schemas, projections), checks
+the Alembic revision once and opens the listening socket; each worker is a
+fork() of it, so workers start in milliseconds and share the preloaded pages.
+Pools are emptied in every child (see database._reset_pools_after_fork), so
+no pooled connection is ever shared between processes. On PostgreSQL one
+more child runs partition maintenance (app/partitions.py) every
+PARTITION_MAINTENANCE_SECONDS. A child that dies is replaced; SIGTERM/SIGINT
+drain every worker gracefully. Unless PASSWORD_HASH_WORKERS is set, each
+worker gets an equal share of the cores for its password hashing pool.
+Workers publish their metrics to METRICS_DIR
+(a fresh temporary directory unless set), so /metrics on any worker reports
+the sum over all of them.
+"""
+import argparse
+import logging
+import os
+import shutil
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+logger = logging.getLogger("app.serve")
+
+# --------------------------
+# SETTINGS
+# --------------------------
+WEB_CONCURRENCY = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+# Seconds a stopping worker gets to finish in-flight requests before it is killed.
+GRACEFUL_TIMEOUT = int(os.getenv("GRACEFUL_TIMEOUT", "30"))
+# A worker dying sooner than this after its fork is restarted with a pause (crash loop).
+MIN_WORKER_LIFETIME = 5.0
+
+
+def _listen(host: str, port: int, backlog: int) -> socket.socket:
+    family = socket.AF_INET6 if ":" in host else socket.AF_INET
+    sock = socket.socket(family, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(config, sock):
+    import uvicorn
+
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGALRM):
+        signal.signal(signum, signal.SIG_DFL)
+    code = 1
+    try:
+        uvicorn.Server(config).run(sockets=[sock])
+        code = 0
+    finally:
+        # never fall back into the master's loop
+        os._exit(code)
+
+
+def _run_maintenance():
+    from . import partitions
+
+    for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGALRM):
+        signal.signal(signum, signal.SIG_DFL)
+    try:
+        partitions.run_forever()
+    finally:
+        os._exit(1)
+
+
+def serve(workers: int, host: str, port: int, backlog: int = 2048, log_level: str = "info", access_log: bool = True):
+    # One host's hashing processes, split across the workers (each would otherwise start one per core); set
+    # before app.hashing is imported, as the admission "auth" in_flight cap follows it.
+    os.environ.setdefault("PASSWORD_HASH_WORKERS", str(max((os.cpu_count() or 1) // workers, 1)))
+    import uvicorn
+    from . import database, metrics, migrations, partitions
+    from .main import app
+
+    # Preload: everything importable is imported once, before the forks.
+    migrations.prepare_schema(database.engine)
+    database.engine.dispose()
+    metrics_dir = None
+    if metrics.METRICS_ENABLED:
+        metrics_dir = metrics.METRICS_DIR or tempfile.mkdtemp(prefix="vaccination-metrics-")
+        metrics.prepare_directory(metrics_dir)
+    sock = _listen(host, port, backlog)
+    config = uvicorn.Config(app, log_level=log_level, access_log=access_log, proxy_headers=True,
+                            timeout_graceful_shutdown=GRACEFUL_TIMEOUT)
+
+    children = {}
+    stopping = False
+
+    def spawn(kind="worker"):
+        pid = os.fork()
+        if pid == 0:
+            if kind == "maintenance":
+                _run_maintenance()
+            _run_worker(config, sock)
+        children[pid] = (time.monotonic(), kind)
+
+    def stop(signum, frame):
+        nonlocal stopping
+        if not stopping:
+            logger.info("stopping %d workers", len(children))
+            stopping = True
+            signal.alarm(GRACEFUL_TIMEOUT + 5)
+        for pid in list(children):
+            _signal(pid, signal.SIGTERM)
+
+    def kill(signum, frame):
+        for pid in list(children):
+            _signal(pid, signal.SIGKILL)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGALRM, kill)
+
+    logger.info("listening on %s:%d with %d workers (pid %d)", host, port, workers, os.getpid())
+    for _ in range(workers):
+        spawn()
+    if partitions.PARTITION_MAINTENANCE_SECONDS > 0 and database.engine.dialect.name == "postgresql":
+        spawn("maintenance")
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        child = children.pop(pid, None)
+        if child is None:
+            continue
+        started, kind = child
+        if kind == "worker" and metrics_dir:
+            metrics.fold_worker(pid)
+        if stopping:
+            continue
+        logger.warning("%s %d exited with status %d, restarting", kind, pid, os.waitstatus_to_exitcode(status))
+        if time.monotonic() - started < MIN_WORKER_LIFETIME:
+            time.sleep(1)
+        if not stopping:
+            spawn(kind)
+    sock.close()
+    if metrics_dir and not os.getenv("METRICS_DIR"):
+        shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+def _signal(pid: int, signum: int):
+    try:
+        os.kill(pid, signum)
+    except ProcessLookupError:
+        pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, default=WEB_CONCURRENCY, help="default: WEB_CONCURRENCY or the core count")
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--no-access-log", action="store_true")
+    args = parser.parse_args(argv)
+    handler = logging.StreamHandler(sys.stderr)
+    handler.setFormatter(logging.Formatter("%(asctime)s [serve] %(message)s"))
+    for name in ("app.serve", "app.partitions"):
+        logging.getLogger(name).addHandler(handler)
+        logging.getLogger(name).setLevel(args.log_level.upper())
+    serve(max(args.workers, 1), args.host, args.port, args.backlog, args.log_level, not args.no_access_log)
+
+
+if __name__ == "__main__":
+    main()
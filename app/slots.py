@@ -0,0 +1,220 @@
+"""Appointment capacity per vaccine and day.
+
+Every slot is one counter row (capacity, booked). A booking is a single
+conditional increment on its own slot row, so bookings for different slots
+never wait on each other and a full slot fails at once with ``SlotFull``
+(409) instead of counting appointments under a lock. Pending and approved
+appointments hold a place; deletes and rejections give it back.
+
+ORM writes are reserved/released by a session ``after_flush`` hook in the
+writing transaction; the bulk status change calls ``adjust`` itself.
+
+    python -m app.slots --rebuild
+
+recomputes ``booked`` from the appointments table, keeping capacities.
+"""
+import argparse
+import os
+from collections import Counter
+from datetime import date
+from typing import Optional
+
+from sqlalchemy import bindparam, event, or_, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from . import models, schemas
+from .stats import APPOINTMENT_KEYS, flush_changed, flush_values, stored_day
+
+# --------------------------
+# SETTINGS
+# --------------------------
+# Capacity given to a slot on its first booking; 0 means unlimited. Admins
+# override it per slot with PUT /slots/{vaccine_id}/{day}.
+APPOINTMENT_SLOT_CAPACITY = int(os.getenv("APPOINTMENT_SLOT_CAPACITY", "0"))
+
+HOLDING_STATUSES = ("pending", "approved")
+
+SLOTS = models.AppointmentSlot.__table__
+_UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+
+
+class SlotFull(Exception):
+    def __init__(self, vaccine_id: int, day: date):
+        super().__init__(f"No capacity left for vaccine {vaccine_id} on {day.isoformat()}")
+        self.vaccine_id = vaccine_id
+        self.day = day
+
+
+def default_capacity() -> Optional[int]:
+    return APPOINTMENT_SLOT_CAPACITY or None
+
+
+def holding_slot(dialect: str, vaccine_id, preferred_date, status):
+    """(vaccine_id, day) of the slot an appointment occupies, or None if it holds no place."""
+    if vaccine_id is None or preferred_date is None or (status or "pending") not in HOLDING_STATUSES:
+        return None
+    return vaccine_id, stored_day(preferred_date, dialect)
+
+
+# --------------------------
+# RESERVE / RELEASE
+# --------------------------
+_RELEASE = (
+    update(SLOTS)
+    .where(SLOTS.c.vaccine_id == bindparam("slot_vaccine"), SLOTS.c.day == bindparam("slot_day"))
+    .values(booked=SLOTS.c.booked - bindparam("released"))
+)
+
+
+def _reserve_one(conn: Connection, vaccine_id: int, day: date, count: int):
+    stmt = _UPSERTS[conn.dialect.name](SLOTS).values(
+        vaccine_id=vaccine_id, day=day, capacity=default_capacity(), booked=count)
+    wanted = SLOTS.c.booked + stmt.excluded.booked
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["vaccine_id", "day"],
+        set_={"booked": wanted},
+        where=or_(SLOTS.c.capacity.is_(None), wanted <= SLOTS.c.capacity),
+    ).returning(SLOTS.c.booked, SLOTS.c.capacity)
+    row = conn.execute(stmt).first()
+    # No row: the increment was refused. A new slot may start over capacity.
+    if row is None or (row.capacity is not None and row.booked > row.capacity):
+        raise SlotFull(vaccine_id, day)
+
+
+def _reserve_many(conn: Connection, reservations):
+    stmt = _UPSERTS[conn.dialect.name](SLOTS)
+    stmt = stmt.on_conflict_do_update(index_elements=["vaccine_id", "day"],
+                                      set_={"booked": SLOTS.c.booked + stmt.excluded.booked})
+    conn.execute(stmt, [{"vaccine_id": vaccine_id, "day": day, "capacity": default_capacity(), "booked": count}
+                        for (vaccine_id, day), count in reservations])
+    # The increments hold the row locks, so this check sees every competing booking.
+    over = conn.execute(
+        select(SLOTS.c.vaccine_id, SLOTS.c.day)
+        .where(tuple_(SLOTS.c.vaccine_id, SLOTS.c.day).in_([key for key, _ in reservations]),
+               SLOTS.c.capacity.is_not(None), SLOTS.c.booked > SLOTS.c.capacity)
+        .limit(1)
+    ).first()
+    if over is not None:
+        raise SlotFull(over.vaccine_id, over.day)
+
+
+def adjust(conn: Connection, deltas: Counter):
+    """Apply net place changes per (vaccine_id, day); raise SlotFull if a slot would overflow.
+
+    Releases are one executemany. One reservation (the common case) is one
+    conditional upsert; several are one upsert plus one over-capacity check.
+    Either way the caller's transaction must be rolled back on SlotFull.
+    """
+    releases = [{"slot_vaccine": vaccine_id, "slot_day": day, "released": -count}
+                for (vaccine_id, day), count in sorted(deltas.items()) if count < 0]
+    reservations = [(key, count) for key, count in sorted(deltas.items()) if count > 0]
+    if releases:
+        conn.execute(_RELEASE, releases)
+    if len(reservations) == 1:
+        (vaccine_id, day), count = reservations[0]
+        _reserve_one(conn, vaccine_id, day, count)
+    elif reservations:
+        _reserve_many(conn, reservations)
+
+
+@event.listens_for(Session, "after_flush")
+def _hold_places(session: Session, flush_context):
+    deltas = Counter()
+    dialect = session.get_bind().dialect.name
+
+    def add(obj, sign, old):
+        slot = holding_slot(dialect, *flush_values(obj, APPOINTMENT_KEYS, old))
+        if slot is not None:
+            deltas[slot] += sign
+
+    for obj in session.new:
+        if isinstance(obj, models.Appointment):
+            add(obj, +1, old=False)
+    for obj in session.deleted:
+        if isinstance(obj, models.Appointment):
+            add(obj, -1, old=True)
+    for obj in session.dirty:
+        if isinstance(obj, models.Appointment) and flush_changed(obj, APPOINTMENT_KEYS):
+            add(obj, -1, old=True)
+            add(obj, +1, old=False)
+    if any(deltas.values()):
+        adjust(session.connection(), deltas)
+
+
+# --------------------------
+# ADMIN
+# --------------------------
+def _slot_out(row) -> schemas.AppointmentSlotOut:
+    available = None if row.capacity is None else max(row.capacity - row.booked, 0)
+    return schemas.AppointmentSlotOut(vaccine_id=row.vaccine_id, day=row.day, capacity=row.capacity,
+                                      booked=row.booked, available=available)
+
+
+def list_slots(db: Session, vaccine_id: Optional[int] = None, date_from: Optional[date] = None,
+               date_to: Optional[date] = None):
+    stmt = select(SLOTS)
+    if vaccine_id is not None:
+        stmt = stmt.where(SLOTS.c.vaccine_id == vaccine_id)
+    if date_from is not None:
+        stmt = stmt.where(SLOTS.c.day >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(SLOTS.c.day < date_to)
+    return [_slot_out(row) for row in db.execute(stmt.order_by(SLOTS.c.day, SLOTS.c.vaccine_id))]
+
+
+def set_capacity(db: Session, vaccine_id: int, day: date, capacity: Optional[int]):
+    """Create or resize a slot; lowering capacity below ``booked`` only stops new bookings. The caller commits."""
+    stmt = _UPSERTS[db.get_bind().dialect.name](SLOTS).values(
+        vaccine_id=vaccine_id, day=day, capacity=capacity, booked=0)
+    stmt = stmt.on_conflict_do_update(index_elements=["vaccine_id", "day"], set_={"capacity": capacity})
+    return _slot_out(db.execute(stmt.returning(*SLOTS.c)).one())
+
+
+# --------------------------
+# REBUILD
+# --------------------------
+def rebuild(db: Session):
+    """Recompute ``booked`` for every slot from the appointments table, then commit."""
+    conn = db.connection()
+    if conn.dialect.name == "postgresql":
+        conn.exec_driver_sql("LOCK TABLE appointments IN SHARE MODE")
+    conn.execute(update(SLOTS).values(booked=0))
+    booked = Counter()
+    rows = conn.execute(
+        select(models.Appointment.vaccine_id, models.Appointment.preferred_date)
+        .where(models.Appointment.status.in_(HOLDING_STATUSES))
+        .execution_options(stream_results=True, yield_per=10000)
+    )
+    for partition in rows.partitions():
+        booked.update(holding_slot(conn.dialect.name, vaccine_id, preferred_date, None)
+                      for vaccine_id, preferred_date in partition)
+    if booked:
+        stmt = _UPSERTS[conn.dialect.name](SLOTS)
+        stmt = stmt.on_conflict_do_update(index_elements=["vaccine_id", "day"],
+                                          set_={"booked": stmt.excluded.booked})
+        conn.execute(stmt, [{"vaccine_id": vaccine_id, "day": day, "capacity": default_capacity(), "booked": count}
+                            for (vaccine_id, day), count in sorted(booked.items())])
+    db.commit()
+    return len(booked)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain appointment slot counters")
+    parser.add_argument("--rebuild", action="store_true", help="recompute booked places from the appointments")
+    args = parser.parse_args(argv)
+    if not args.rebuild:
+        parser.print_help()
+        return
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        slots = rebuild(db)
+    finally:
+        db.close()
+    print(f"rebuilt {slots} slots")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""Dashboard rollups: appointments per vaccine/day/status and doses per vaccine.
+
+ORM writes (both stacks) are counted by a session ``after_flush`` hook, in
+the same transaction as the write. Set-based writes that bypass the ORM
+(bulk status changes, vaccination import) call ``apply_deltas`` themselves.
+
+    python -m app.stats --rebuild
+
+recomputes every counter from the base tables (repair after manual SQL,
+cascading deletes done by the database, or a restore).
+"""
+import argparse
+from collections import Counter
+from datetime import date, timezone
+from typing import Optional
+
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+from . import models, schemas
+
+APPOINTMENT_STATS = models.AppointmentDailyStats.__table__
+DOSE_STATS = models.VaccineDoseStats.__table__
+APPOINTMENT_STATUSES = ("pending", "approved", "rejected")
+
+_UPSERTS = {"postgresql": postgresql.insert, "sqlite": sqlite.insert}
+APPOINTMENT_KEYS = ("vaccine_id", "preferred_date", "status")
+
+
+def stored_day(value, dialect: str) -> date:
+    """Day of ``value`` as the database stores it, so write-time and rebuild buckets agree.
+
+    PostgreSQL keeps timestamptz in UTC; SQLite drops the offset and keeps the wall-clock time.
+    """
+    if value.tzinfo is not None and dialect != "sqlite":
+        value = value.astimezone(timezone.utc)
+    return value.date()
+
+
+def appointment_bucket(dialect: str, vaccine_id: int, preferred_date, status: Optional[str]):
+    return vaccine_id, stored_day(preferred_date, dialect), status or "pending"
+
+
+# --------------------------
+# APPLYING DELTAS
+# --------------------------
+def _upsert(conn: Connection, table, keys, counter: str, rows):
+    stmt = _UPSERTS[conn.dialect.name](table)
+    stmt = stmt.on_conflict_do_update(index_elements=keys, set_={counter: table.c[counter] + stmt.excluded[counter]})
+    conn.execute(stmt, rows)
+
+
+def apply_deltas(conn: Connection, appointments: Counter = None, doses: Counter = None):
+    """Add the deltas to the rollup rows: one upsert statement per table at most.
+
+    Keys are applied in sorted order so concurrent transactions lock the
+    shared counter rows in the same order and cannot deadlock.
+    """
+    rows = [{"vaccine_id": vaccine_id, "day": day, "status": status, "count": delta}
+            for (vaccine_id, day, status), delta in sorted((appointments or {}).items()) if delta]
+    if rows:
+        _upsert(conn, APPOINTMENT_STATS, ["vaccine_id", "day", "status"], "count", rows)
+    rows = [{"vaccine_id": vaccine_id, "doses": delta} for vaccine_id, delta in sorted((doses or {}).items()) if delta]
+    if rows:
+        _upsert(conn, DOSE_STATS, ["vaccine_id"], "doses", rows)
+
+
+# --------------------------
+# ORM WRITES
+# --------------------------
+def flush_values(obj, keys, old: bool):
+    """Attribute values before (``old``) or after the flush, without loading anything."""
+    state = inspect(obj)
+    values = []
+    for key in keys:
+        history = state.attrs[key].history
+        current = history.deleted if old else history.added
+        current = current or history.unchanged or (history.added if old else ())
+        values.append(current[0] if current else None)
+    return values
+
+
+def flush_changed(obj, keys) -> bool:
+    state = inspect(obj)
+    return any(state.attrs[key].history.has_changes() for key in keys)
+
+
+@event.listens_for(Session, "after_flush")
+def _count_writes(session: Session, flush_context):
+    appointments, doses = Counter(), Counter()
+    dialect = session.get_bind().dialect.name
+
+    def add(obj, sign, old):
+        if isinstance(obj, models.Appointment):
+            vaccine_id, preferred_date, status = flush_values(obj, APPOINTMENT_KEYS, old)
+            if vaccine_id is not None and preferred_date is not None:
+                appointments[appointment_bucket(dialect, vaccine_id, preferred_date, status)] += sign
+        elif isinstance(obj, models.Vaccination):
+            vaccine_id, = flush_values(obj, ("vaccine_id",), old)
+            if vaccine_id is not None:
+                doses[vaccine_id] += sign
+
+    for obj in session.new:
+        add(obj, +1, old=False)
+    for obj in session.deleted:
+        add(obj, -1, old=True)
+    for obj in session.dirty:
+        keys = APPOINTMENT_KEYS if isinstance(obj, models.Appointment) else ("vaccine_id",)
+        if isinstance(obj, (models.Appointment, models.Vaccination)) and flush_changed(obj, keys):
+            add(obj, -1, old=True)
+            add(obj, +1, old=False)
+    if appointments or doses:
+        apply_deltas(session.connection(), appointments, doses)
+
+
+# --------------------------
+# DASHBOARD READS (O(buckets))
+# --------------------------
+def appointment_stats(db: Session, vaccine_id: Optional[int] = None, date_from: Optional[date] = None,
+                      date_to: Optional[date] = None):
+    """Per vaccine and day, the number of appointments in each status ([date_from, date_to))."""
+    table = models.AppointmentDailyStats
+    stmt = select(table.vaccine_id, table.day, table.status, table.count)
+    if vaccine_id is not None:
+        stmt = stmt.where(table.vaccine_id == vaccine_id)
+    if date_from is not None:
+        stmt = stmt.where(table.day >= date_from)
+    if date_to is not None:
+        stmt = stmt.where(table.day < date_to)
+    buckets = {}
+    for bucket_vaccine, day, status, count in db.execute(stmt.order_by(table.day, table.vaccine_id)):
+        bucket = buckets.setdefault((bucket_vaccine, day), dict.fromkeys(APPOINTMENT_STATUSES, 0))
+        bucket[status] = bucket.get(status, 0) + count
+    return [schemas.AppointmentDayStatsOut(vaccine_id=key[0], day=key[1], total=sum(counts.values()), **counts)
+            for key, counts in buckets.items() if any(counts.values())]
+
+
+def dose_stats(db: Session, vaccine_id: Optional[int] = None):
+    table = models.VaccineDoseStats
+    stmt = select(table.vaccine_id, table.doses).where(table.doses != 0).order_by(table.vaccine_id)
+    if vaccine_id is not None:
+        stmt = stmt.where(table.vaccine_id == vaccine_id)
+    return [schemas.VaccineDoseStatsOut(vaccine_id=row.vaccine_id, doses=row.doses) for row in db.execute(stmt)]
+
+
+# --------------------------
+# REBUILD
+# --------------------------
+def rebuild(db: Session):
+    """Recompute every rollup row from appointments and vaccinations, then commit."""
+    conn = db.connection()
+    if conn.dialect.name == "postgresql":
+        # Writers wait for the rebuild instead of slipping between scan and swap.
+        conn.exec_driver_sql("LOCK TABLE appointments, vaccinations IN SHARE MODE")
+    conn.execute(delete(APPOINTMENT_STATS))
+    conn.execute(delete(DOSE_STATS))
+    # Buckets are computed in Python so they match the incremental path exactly.
+    appointments = Counter()
+    rows = conn.execute(
+        select(models.Appointment.vaccine_id, models.Appointment.preferred_date, models.Appointment.status)
+        .execution_options(stream_results=True, yield_per=10000)
+    )
+    for partition in rows.partitions():
+        appointments.update(appointment_bucket(conn.dialect.name, *row) for row in partition)
+    doses = Counter(dict(conn.execute(
+        select(models.Vaccination.vaccine_id, func.count()).group_by(models.Vaccination.vaccine_id)
+    ).all()))
+    apply_deltas(conn, appointments, doses)
+    db.commit()
+    return len(appointments), len(doses)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the dashboard rollups")
+    parser.add_argument("--rebuild", action="store_true", help="recompute every counter from the base tables")
+    args = parser.parse_args(argv)
+    if not args.rebuild:
+        parser.print_help()
+        return
+    from .database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        buckets, vaccines = rebuild(db)
+    finally:
+        db.close()
+    print(f"rebuilt {buckets} appointment buckets and {vaccines} dose counters")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,283 @@
+"""Bulk synthetic data: users, appointments, vaccinations and articles at production volumes.
+
+    python -m app.synthetic_data --users 1000000 --appointments 3000000 --articles 50000 --seed 42
+
+Run it against an empty (migrated) database. The same seed always produces the
+same rows. Rows are streamed in ``--batch-size`` batches through COPY on
+PostgreSQL (executemany elsewhere), then the dashboard rollups and slot
+counters are rebuilt and the tables ANALYZEd.
+
+Every user shares SYNTHETIC_PASSWORD. SYNTHETIC_ADMIN_EMAIL and
+SYNTHETIC_CITIZEN_EMAIL are fixed accounts for the benchmarks.
+
+Distributions:
+- appointments: 70% come from the 20% most active citizens. Vaccines follow a
+  Zipf-like popularity. Dates fall on working hours in 15-minute slots, and
+  weekends are rarer. Booking lead times are exponential, with a mean of
+  9 days.
+- status: appointments before ``--now`` are mostly approved and the rest are
+  mostly pending.
+- vaccinations: ``--vaccination-rate`` of the approved past appointments,
+  dose 1/2/3 at 60/30/10%.
+- articles: Zipf-distributed vocabulary, log-normal lengths.
+"""
+import argparse
+import math
+import random
+import sys
+import time
+from datetime import date, datetime, timedelta, timezone
+
+from sqlalchemy import func, select, text
+from sqlalchemy.orm import Session
+from . import models, slots, stats
+from .bulk_insert import insert_rows
+from .seed_vaccines import insert_missing_vaccines
+from .versions import bump_version
+
+SYNTHETIC_DOMAIN = "synthetic.example.org"
+SYNTHETIC_PASSWORD = "synthetic-password"
+SYNTHETIC_ADMIN_EMAIL = f"admin@{SYNTHETIC_DOMAIN}"
+SYNTHETIC_CITIZEN_EMAIL = f"citizen@{SYNTHETIC_DOMAIN}"
+
+FIRST_NAMES = ("Yassine Salma Omar Imane Karim Nadia Mehdi Sara Youssef Fatima Hamza Leila Amine Khadija Anas "
+               "Meryem Rachid Hajar Ilyas Zineb Adam Aya Hicham Nora Samir Ines Walid Houda Reda Amal").split()
+LAST_NAMES = ("Alaoui Benali Chraibi Idrissi El Amrani Tazi Berrada Fassi Bennani Lahlou Ouazzani Kettani "
+              "Naciri Sqalli Benjelloun Cherkaoui Filali Hassani Mansouri Rami Saidi Zaki").split()
+REJECTION_REASONS = ("Clinic closed", "Vaccine out of stock", "Duplicate booking", "Missing documents",
+                     "Patient unavailable")
+VOCABULARY = ("vaccine dose immunity booster clinic schedule children travel fever safety influenza hepatitis "
+              "tetanus measles rubella mumps polio rabies typhoid meningitis yellow campaign reminder health "
+              "protection risk symptoms infection prevention community pharmacy appointment season outbreak "
+              "antibodies immune response side effects allergy pregnancy elderly school certificate record "
+              "storage cold chain nurse doctor hospital region rural city free public awareness myth fact").split()
+
+
+def _zipf_weights(n: int, exponent: float = 1.1):
+    return [1 / (rank ** exponent) for rank in range(1, n + 1)]
+
+
+def _next_id(db: Session, model) -> int:
+    return (db.scalar(select(func.max(model.id))) or 0) + 1
+
+
+def _reset_sequence(db: Session, table: str):
+    # Explicit ids bypass the PostgreSQL sequences; move them past the new rows.
+    if db.get_bind().dialect.name == "postgresql":
+        db.execute(text(f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), "
+                        f"(SELECT COALESCE(MAX(id), 1) FROM {table}))"))
+
+
+class Progress:
+    def __init__(self, label: str, total: int):
+        self.label, self.total, self.done, self.start = label, total, 0, time.perf_counter()
+
+    def add(self, rows: int):
+        self.done += rows
+        elapsed = time.perf_counter() - self.start
+        print(f"\r{self.label}: {self.done:,}/{self.total:,} ({self.done / max(elapsed, 1e-9):,.0f} rows/s)",
+              end="", file=sys.stderr)
+
+    def close(self):
+        print(file=sys.stderr)
+
+
+class Generator:
+    def __init__(self, db: Session, seed: int, start: date, days: int, now: datetime, batch_size: int):
+        self.db = db
+        self.rng = random.Random(seed)
+        self.start = datetime.combine(start, datetime.min.time(), tzinfo=timezone.utc)
+        self.days = days
+        self.now = now
+        self.batch_size = batch_size
+        self.admin_ids = []
+        self.citizen_ids = []
+
+    def _insert(self, model, columns, rows, progress: Progress):
+        insert_rows(self.db, model.__table__, columns, rows)
+        self.db.commit()
+        progress.add(len(rows))
+
+    # --------------------------
+    # USERS
+    # --------------------------
+    def users(self, count: int, admins: int, password_hash: str):
+        columns = ("id", "full_name", "email", "password_hash", "role", "created_at")
+        first_id = _next_id(self.db, models.User)
+        progress = Progress("users", count)
+        rows = []
+        for n in range(count):
+            user_id = first_id + n
+            first, last = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            if n == 0:
+                email, role = SYNTHETIC_ADMIN_EMAIL, "admin"
+            elif n == 1:
+                email, role = SYNTHETIC_CITIZEN_EMAIL, "citizen"
+            else:
+                role = "admin" if n < admins + 1 else "citizen"
+                email = f"{first}.{last}.{user_id}@{SYNTHETIC_DOMAIN}".lower()
+            created = self.start - timedelta(days=self.rng.expovariate(1 / 200))
+            rows.append((user_id, f"{first} {last}", email, password_hash, role, created))
+            if role == "admin":
+                self.admin_ids.append(user_id)
+            if len(rows) >= self.batch_size:
+                self._insert(models.User, columns, rows, progress)
+                rows = []
+        if rows:
+            self._insert(models.User, columns, rows, progress)
+        progress.close()
+        _reset_sequence(self.db, "users")
+        # The fixed citizen account, then everyone after the admins.
+        self.citizen_ids = [first_id + 1] + list(range(first_id + admins + 1, first_id + count))
+
+    # --------------------------
+    # APPOINTMENTS + VACCINATIONS
+    # --------------------------
+    def _slot(self) -> datetime:
+        while True:
+            day = self.start + timedelta(days=self.rng.randrange(self.days))
+            if day.weekday() < 5 or self.rng.random() < 0.3:
+                break
+        return day + timedelta(hours=8, minutes=15 * self.rng.randrange(40))
+
+    def _status(self, preferred_date: datetime) -> str:
+        draw = self.rng.random()
+        if preferred_date < self.now:
+            return "approved" if draw < 0.8 else "rejected" if draw < 0.95 else "pending"
+        return "pending" if draw < 0.75 else "approved" if draw < 0.95 else "rejected"
+
+    def appointments(self, count: int, vaccination_rate: float):
+        vaccine_ids = list(self.db.scalars(select(models.Vaccine.id).order_by(models.Vaccine.id)))
+        self.rng.shuffle(vaccine_ids)
+        weights = _zipf_weights(len(vaccine_ids))
+        citizens = self.citizen_ids
+        active = max(len(citizens) // 5, 1)
+        admin_ids = self.admin_ids or [None]
+
+        columns = ("id", "citizen_id", "vaccine_id", "preferred_date", "status", "admin_id", "reason_rejection",
+                   "created_at")
+        vaccination_columns = ("id", "appointment_id", "citizen_id", "vaccine_id", "dose_number", "batch_number",
+                               "vaccination_date", "admin_id")
+        appointment_id = _next_id(self.db, models.Appointment)
+        vaccination_id = _next_id(self.db, models.Vaccination)
+        progress = Progress("appointments", count)
+        done = 0
+        vaccinations = 0
+        while done < count:
+            rows, doses = [], []
+            for _ in range(min(self.batch_size, count - done)):
+                pool = active if self.rng.random() < 0.7 else len(citizens)
+                citizen_id = citizens[self.rng.randrange(pool)]
+                vaccine_id = self.rng.choices(vaccine_ids, weights)[0]
+                preferred_date = self._slot()
+                status = self._status(preferred_date)
+                admin_id = self.rng.choice(admin_ids) if status != "pending" else None
+                reason = self.rng.choice(REJECTION_REASONS) if status == "rejected" else None
+                created_at = preferred_date - timedelta(hours=1 + self.rng.expovariate(1 / (9 * 24)))
+                rows.append((appointment_id, citizen_id, vaccine_id, preferred_date, status, admin_id, reason,
+                             created_at))
+                if status == "approved" and preferred_date < self.now and self.rng.random() < vaccination_rate:
+                    draw = self.rng.random()
+                    dose = 1 if draw < 0.6 else 2 if draw < 0.9 else 3
+                    given = preferred_date + timedelta(minutes=self.rng.randrange(90))
+                    year, week, _ = given.isocalendar()
+                    doses.append((vaccination_id, appointment_id, citizen_id, vaccine_id, dose,
+                                  f"LOT-{vaccine_id:02d}-{year % 100:02d}{week:02d}", given, admin_id))
+                    vaccination_id += 1
+                appointment_id += 1
+            insert_rows(self.db, models.Appointment.__table__, columns, rows)
+            if doses:
+                insert_rows(self.db, models.Vaccination.__table__, vaccination_columns, doses)
+            self.db.commit()
+            done += len(rows)
+            vaccinations += len(doses)
+            progress.add(len(rows))
+        progress.close()
+        _reset_sequence(self.db, "appointments")
+        _reset_sequence(self.db, "vaccinations")
+        return vaccinations
+
+    # --------------------------
+    # ARTICLES
+    # --------------------------
+    def articles(self, count: int):
+        columns = ("id", "title", "content", "created_at", "created_by")
+        weights = _zipf_weights(len(VOCABULARY))
+        authors = self.admin_ids or [None]
+        article_id = _next_id(self.db, models.AwarenessArticle)
+        progress = Progress("articles", count)
+        rows = []
+        for n in range(count):
+            title = " ".join(self.rng.choices(VOCABULARY, weights, k=self.rng.randint(3, 8))).capitalize()
+            length = min(int(self.rng.lognormvariate(math.log(250), 0.6)), 3000)
+            content = " ".join(self.rng.choices(VOCABULARY, weights, k=max(length, 20)))
+            created = self.start + timedelta(minutes=self.rng.randrange(self.days * 24 * 60))
+            rows.append((article_id + n, title, content, created, self.rng.choice(authors)))
+            if len(rows) >= max(self.batch_size // 10, 1):
+                self._insert(models.AwarenessArticle, columns, rows, progress)
+                rows = []
+        if rows:
+            self._insert(models.AwarenessArticle, columns, rows, progress)
+        progress.close()
+        _reset_sequence(self.db, "awareness_articles")
+
+
+def generate(db: Session, users: int, appointments: int, articles: int, admins: int = 20, seed: int = 42,
+             start: date = date(2025, 1, 1), days: int = 730, now: datetime = None,
+             vaccination_rate: float = 0.85, batch_size: int = 10000):
+    from .utils import hash_password
+
+    now = now or datetime.combine(start + timedelta(days=days // 2), datetime.min.time(), tzinfo=timezone.utc)
+    generator = Generator(db, seed, start, days, now, batch_size)
+    insert_missing_vaccines(db)
+    db.commit()
+    generator.users(max(users, admins + 2), admins, hash_password(SYNTHETIC_PASSWORD))
+    vaccinations = generator.appointments(appointments, vaccination_rate)
+    generator.articles(articles)
+
+    bump_version(db, "vaccines")
+    bump_version(db, "articles")
+    db.commit()
+    print("rebuilding counters", file=sys.stderr)
+    stats.rebuild(db)
+    slots.rebuild(db)
+    db.execute(text("ANALYZE"))
+    db.commit()
+    return vaccinations
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100_000)
+    parser.add_argument("--admins", type=int, default=20)
+    parser.add_argument("--appointments", type=int, default=300_000)
+    parser.add_argument("--articles", type=int, default=5_000)
+    parser.add_argument("--vaccination-rate", type=float, default=0.85,
+                        help="share of approved past appointments that got their dose")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--start", type=date.fromisoformat, default=date(2025, 1, 1),
+                        help="first day of the appointment window")
+    parser.add_argument("--days", type=int, default=730, help="length of the appointment window")
+    parser.add_argument("--now", type=datetime.fromisoformat,
+                        help="past/future boundary for statuses (default: middle of the window)")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    args = parser.parse_args(argv)
+    from .database import SessionLocal
+
+    now = args.now
+    if now is not None and now.tzinfo is None:
+        now = now.replace(tzinfo=timezone.utc)
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        vaccinations = generate(db, args.users, args.appointments, args.articles, args.admins, args.seed,
+                                args.start, args.days, now, args.vaccination_rate, args.batch_size)
+    finally:
+        db.close()
+    print(f"{args.users:,} users, {args.appointments:,} appointments, {vaccinations:,} vaccinations, "
+          f"{args.articles:,} articles in {time.perf_counter() - start:.1f}s")
+    print(f"log in as {SYNTHETIC_ADMIN_EMAIL} / {SYNTHETIC_CITIZEN_EMAIL} with password {SYNTHETIC_PASSWORD!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,63 +1,110 @@
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from .database import SessionLocal
+from sqlalchemy.ext.asyncio import AsyncSession
+from .database import SessionLocal, AsyncSessionLocal, ReplicaSessionLocal, AsyncReplicaSessionLocal
 from . import models
 from .auth_handler import decode_access_token
+from .principal_cache import Principal, principal_cache, principal_from_claims
+from .read_routing import reading_from_replica
+from .query_budget import allow_extra
 
 # --------------------------
 # PASSWORD HASHING
 # --------------------------
-pwd_context = CryptContext(
-    schemes=["pbkdf2_sha256"],
-    deprecated="auto"
+# PBKDF2 runs in a dedicated process pool, see app/hashing.py
+from .hashing import (  # noqa: F401
+    hash_password,
+    hash_password_async,
+    verify_password,
+    verify_and_update_password,
+    verify_and_update_password_async,
 )
 
-def hash_password(password: str):
-    return pwd_context.hash(password)
-
-def verify_password(plain_password: str, hashed_password: str):
-    return pwd_context.verify(plain_password, hashed_password)
-
 # --------------------------
 # DATABASE SESSION
 # --------------------------
+# Safe GET/HEAD requests read from the replica (app/read_routing.py);
+# get_primary_db/get_primary_async_db always use the primary.
 def get_db():
+    db = (ReplicaSessionLocal if reading_from_replica() else SessionLocal)()
+    try:
+        yield db
+    finally:
+        db.close()
+
+async def get_async_db():
+    async with (AsyncReplicaSessionLocal if reading_from_replica() else AsyncSessionLocal)() as db:
+        yield db
+
+def get_primary_db():
     db = SessionLocal()
     try:
         yield db
     finally:
         db.close()
 
+async def get_primary_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
 # --------------------------
 # JWT AUTH
 # --------------------------
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+# Authentication reads the primary: a user just created or demoted must not be judged by a lagging replica.
+# The user lookup on a cache miss is not charged to the route's query budget.
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_primary_db)):
+    principal = principal_cache.get(token)
+    if principal:
+        return principal
     payload = decode_access_token(token)
     if not payload:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
-    user_id = payload.get("user_id")
-    user = db.query(models.User).filter(models.User.id == user_id).first()
-    if not user:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
-    return user
+    principal = principal_from_claims(payload)
+    if not principal:
+        user_id = payload.get("user_id")
+        user = db.query(models.User).filter(models.User.id == user_id).first()
+        allow_extra()
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        principal = Principal(user.id, user.role)
+    principal_cache.put(token, principal, payload["exp"])
+    return principal
+
+async def get_current_user_async(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_primary_async_db)):
+    principal = principal_cache.get(token)
+    if principal:
+        return principal
+    payload = decode_access_token(token)
+    if not payload:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    principal = principal_from_claims(payload)
+    if not principal:
+        user = await db.get(models.User, payload.get("user_id"))
+        allow_extra()
+        if not user:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+        principal = Principal(user.id, user.role)
+    principal_cache.put(token, principal, payload["exp"])
+    return principal
 
 # --------------------------
 # ROLE CHECKS
 # --------------------------
-def require_admin(user: models.User = Depends(get_current_user)):
+def require_admin(user: Principal = Depends(get_current_user)):
     if user.role != "admin":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Admin access required")
     return user
 
-def require_citizen(user: models.User = Depends(get_current_user)):
+def require_citizen(user: Principal = Depends(get_current_user)):
     if user.role != "citizen":
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Citizen access required")
     return user
 
+async def require_admin_async(user: Principal = Depends(get_current_user_async)):
+    return require_admin(user)
 
-
-
+async def require_citizen_async(user: Principal = Depends(get_current_user_async)):
+    return require_citizen(user)
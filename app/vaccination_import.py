@@ -0,0 +1,190 @@
+"""Bulk ingest of vaccination records from CSV or NDJSON.
+
+    python -m app.vaccination_import campaign.csv --admin-id 1
+
+Rows are validated against VaccinationCreate in chunks, their appointments,
+citizens and vaccines are checked with set-based lookups per chunk (a row
+must match its appointment's citizen and vaccine), and valid rows
+are written with PostgreSQL COPY (executemany elsewhere), each with its
+``vaccination.recorded`` event for the citizen. Invalid rows are reported by
+line number and skipped; the caller commits.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from collections import Counter
+from typing import Iterator, Optional, TextIO
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from . import events, models, schemas, stats
+from .bulk_insert import insert_rows
+from .vaccine_catalog import vaccine_catalog
+
+# --------------------------
+# SETTINGS
+# --------------------------
+VACCINATION_IMPORT_CHUNK_SIZE = int(os.getenv("VACCINATION_IMPORT_CHUNK_SIZE", "5000"))
+# Error entries kept in the report; further errors are only counted.
+VACCINATION_IMPORT_MAX_ERRORS = int(os.getenv("VACCINATION_IMPORT_MAX_ERRORS", "1000"))
+
+IMPORT_FORMATS = ("csv", "ndjson")
+COLUMNS = ("appointment_id", "citizen_id", "vaccine_id", "dose_number", "batch_number", "admin_id")
+
+
+class ImportReport:
+    def __init__(self, max_errors: int = VACCINATION_IMPORT_MAX_ERRORS):
+        self.max_errors = max_errors
+        self.inserted = 0
+        self.failed = 0
+        self.errors = []
+
+    def reject(self, line: int, *messages: str):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append(schemas.VaccinationImportError(line=line, errors=list(messages)))
+
+    def result(self) -> schemas.VaccinationImportOut:
+        errors = sorted(self.errors, key=lambda error: error.line)
+        return schemas.VaccinationImportOut(inserted=self.inserted, failed=self.failed, errors=errors,
+                                            errors_truncated=self.failed > len(self.errors))
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> str:
+    if (filename or "").endswith((".ndjson", ".jsonl")) or "ndjson" in (content_type or ""):
+        return "ndjson"
+    return "csv"
+
+
+# --------------------------
+# PARSE + VALIDATE
+# --------------------------
+def _records(stream: TextIO, fmt: str, report: ImportReport) -> Iterator:
+    """(line, dict) per input record; malformed lines are rejected here."""
+    if fmt == "csv":
+        # csv.reader + zip: DictReader costs more than validating the row.
+        reader = csv.reader(stream)
+        header = next(reader, [])
+        for row in reader:
+            # Empty CSV cells are missing values, not empty strings.
+            yield reader.line_num, {key: value for key, value in zip(header, row) if value != ""}
+        return
+    for line, text in enumerate(stream, start=1):
+        if not text.strip():
+            continue
+        try:
+            record = json.loads(text)
+        except ValueError as error:
+            report.reject(line, f"invalid JSON: {error}")
+            continue
+        if not isinstance(record, dict):
+            report.reject(line, "expected a JSON object")
+            continue
+        yield line, record
+
+
+def parse_chunks(stream: TextIO, fmt: str, report: ImportReport,
+                 chunk_size: int = VACCINATION_IMPORT_CHUNK_SIZE) -> Iterator[list]:
+    """Lists of (line, VaccinationCreate), at most ``chunk_size`` long."""
+    if fmt not in IMPORT_FORMATS:
+        raise ValueError(f"Unsupported import format: {fmt}")
+    chunk = []
+    for line, record in _records(stream, fmt, report):
+        try:
+            chunk.append((line, schemas.VaccinationCreate.model_validate(record)))
+        except ValidationError as error:
+            report.reject(line, *(f"{'.'.join(map(str, e['loc'])) or 'row'}: {e['msg']}" for e in error.errors()))
+            continue
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+# --------------------------
+# CHECK + INSERT
+# --------------------------
+def store_chunk(db: Session, chunk: list, admin_id: int, report: ImportReport):
+    appointment_ids = {row.appointment_id for _, row in chunk}
+    appointments = {appointment_id: (citizen_id, vaccine_id) for appointment_id, citizen_id, vaccine_id in db.execute(
+        select(models.Appointment.id, models.Appointment.citizen_id, models.Appointment.vaccine_id)
+        .where(models.Appointment.id.in_(appointment_ids)))}
+    # A citizen that owns the row's appointment exists; only the others are looked up.
+    unproven = {row.citizen_id for _, row in chunk
+                if appointments.get(row.appointment_id, (None,))[0] != row.citizen_id}
+    citizens = set(db.scalars(select(models.User.id).where(models.User.id.in_(unproven)))) if unproven else set()
+    # Vaccines come from the in-memory catalog: no query.
+    vaccines = {vaccine_id for vaccine_id in {row.vaccine_id for _, row in chunk}
+                if vaccine_catalog.get(db, vaccine_id)}
+    rows = []
+    for line, row in chunk:
+        errors = []
+        appointment = appointments.get(row.appointment_id)
+        if appointment is None:
+            errors.append("appointment_id: Appointment not found")
+        if row.citizen_id not in citizens and (appointment is None or appointment[0] != row.citizen_id):
+            errors.append("citizen_id: Citizen not found")
+        elif appointment is not None and appointment[0] != row.citizen_id:
+            errors.append(f"citizen_id: Appointment {row.appointment_id} belongs to citizen {appointment[0]}")
+        if row.vaccine_id not in vaccines:
+            errors.append("vaccine_id: Vaccine not found")
+        elif appointment is not None and appointment[1] != row.vaccine_id:
+            errors.append(f"vaccine_id: Appointment {row.appointment_id} is for vaccine {appointment[1]}")
+        if errors:
+            report.reject(line, *errors)
+        else:
+            rows.append((row.appointment_id, row.citizen_id, row.vaccine_id, row.dose_number, row.batch_number,
+                         admin_id))
+    if rows:
+        ids = insert_rows(db, models.Vaccination.__table__, COLUMNS, rows, return_ids=True)
+        stats.apply_deltas(db.connection(), doses=Counter(row[2] for row in rows))
+        events.record(db, [events.vaccination_event("vaccination.recorded", vaccination_id, citizen_id, appointment_id,
+                                                    vaccine_id, dose_number, batch_number)
+                           for vaccination_id, (appointment_id, citizen_id, vaccine_id, dose_number, batch_number, _)
+                           in zip(ids, rows)])
+        report.inserted += len(rows)
+
+
+def import_vaccinations(db: Session, stream: TextIO, fmt: str, admin_id: int,
+                        chunk_size: int = VACCINATION_IMPORT_CHUNK_SIZE) -> schemas.VaccinationImportOut:
+    report = ImportReport()
+    for chunk in parse_chunks(stream, fmt, report, chunk_size):
+        store_chunk(db, chunk, admin_id, report)
+    return report.result()
+
+
+# --------------------------
+# CLI
+# --------------------------
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bulk import vaccination records")
+    parser.add_argument("path", help="CSV or NDJSON file, - for stdin")
+    parser.add_argument("--format", choices=IMPORT_FORMATS, help="default: from the file extension")
+    parser.add_argument("--admin-id", type=int, required=True, help="recorded as admin_id on every row")
+    parser.add_argument("--chunk-size", type=int, default=VACCINATION_IMPORT_CHUNK_SIZE)
+    args = parser.parse_args(argv)
+    from .database import SessionLocal
+
+    fmt = args.format or detect_format(args.path, None)
+    stream = sys.stdin if args.path == "-" else open(args.path, newline="", encoding="utf-8")
+    db = SessionLocal()
+    start = time.perf_counter()
+    try:
+        result = import_vaccinations(db, stream, fmt, args.admin_id, args.chunk_size)
+        db.commit()
+    finally:
+        db.close()
+        stream.close()
+    elapsed = time.perf_counter() - start
+    print(result.model_dump_json(indent=2))
+    rows = result.inserted + result.failed
+    print(f"{rows} rows in {elapsed:.2f}s ({rows / elapsed:,.0f} rows/s)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
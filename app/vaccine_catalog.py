@@ -0,0 +1,122 @@
+import os
+import time
+
+from sqlalchemy import exists, func
+from sqlalchemy.orm import Session
+from . import models, schemas
+from .versions import bump_version, read_version
+
+# --------------------------
+# SETTINGS
+# --------------------------
+# VACCINE_CATALOG_CACHE=0 sends every catalog read to the database (consistency tests).
+VACCINE_CATALOG_CACHE = os.getenv("VACCINE_CATALOG_CACHE", "1") == "1"
+# How long a snapshot is served before the shared version row is checked again.
+VACCINE_CATALOG_CHECK_INTERVAL = float(os.getenv("VACCINE_CATALOG_CHECK_INTERVAL", "1.0"))
+
+CATALOG_NAME = "vaccines"
+
+
+# --------------------------
+# VERSIONED SNAPSHOT
+# --------------------------
+class VaccineCatalog:
+    def __init__(self, enabled: bool, check_interval: float):
+        self.enabled = enabled
+        self.check_interval = check_interval
+        # (version, checked_at, vaccines, vaccines_by_id, updated_at), replaced as a whole
+        self._state = (None, 0.0, [], {}, None)
+        self.version_checks = 0
+        self.reloads = 0
+
+    @property
+    def version(self):
+        return self._state[0]
+
+    def validators(self, db: Session):
+        """``(version, updated_at)`` of the snapshot currently served."""
+        if not self.enabled:
+            return read_version(db, CATALOG_NAME)
+        state = self._snapshot(db)
+        return state[0], state[4]
+
+    def all(self, db: Session):
+        if not self.enabled:
+            return db.query(models.Vaccine).order_by(models.Vaccine.id).all()
+        return self._snapshot(db)[2]
+
+    def get(self, db: Session, vaccine_id: int):
+        if not self.enabled:
+            return db.query(models.Vaccine).filter(models.Vaccine.id == vaccine_id).first()
+        return self._snapshot(db)[3].get(vaccine_id)
+
+    def many(self, db: Session, vaccine_ids):
+        """The vaccines among ``vaccine_ids``, ordered by id."""
+        if not self.enabled:
+            return db.query(models.Vaccine).filter(models.Vaccine.id.in_(vaccine_ids)).order_by(models.Vaccine.id).all()
+        by_id = self._snapshot(db)[3]
+        return [by_id[vaccine_id] for vaccine_id in sorted(vaccine_ids) if vaccine_id in by_id]
+
+    def exists(self, db: Session, vaccine_id: int) -> bool:
+        if not self.enabled:
+            return db.query(exists().where(models.Vaccine.id == vaccine_id)).scalar()
+        return vaccine_id in self._snapshot(db)[3]
+
+    def count(self, db: Session) -> int:
+        if not self.enabled:
+            return db.query(func.count(models.Vaccine.id)).scalar()
+        return len(self._snapshot(db)[2])
+
+    async def all_async(self, db):
+        return await db.run_sync(self.all)
+
+    async def get_async(self, db, vaccine_id: int):
+        return await db.run_sync(self.get, vaccine_id)
+
+    async def many_async(self, db, vaccine_ids):
+        return await db.run_sync(self.many, vaccine_ids)
+
+    async def exists_async(self, db, vaccine_id: int) -> bool:
+        return await db.run_sync(self.exists, vaccine_id)
+
+    async def count_async(self, db) -> int:
+        return await db.run_sync(self.count)
+
+    def bump(self, db: Session):
+        """Bump the shared version inside the caller's transaction (call before commit)."""
+        bump_version(db, CATALOG_NAME)
+
+    def invalidate(self):
+        """Drop the local snapshot so the next read reloads it (call after commit)."""
+        self._state = (None, 0.0, [], {}, None)
+
+    def _snapshot(self, db: Session):
+        # No lock is held across the queries: with AsyncSession.run_sync they
+        # run on the event loop, and a concurrent refresh is merely redundant.
+        state = self._state
+        now = time.monotonic()
+        if state[0] is not None and now - state[1] < self.check_interval:
+            return state
+        version, updated_at = read_version(db, CATALOG_NAME)
+        self.version_checks += 1
+        if version == state[0]:
+            state = (version, now, state[2], state[3], updated_at)
+        else:
+            rows = db.query(models.Vaccine).order_by(models.Vaccine.id).all()
+            vaccines = [schemas.VaccineOut.model_validate(row, from_attributes=True) for row in rows]
+            state = (version, now, vaccines, {vaccine.id: vaccine for vaccine in vaccines}, updated_at)
+            self.reloads += 1
+        self._state = state
+        return state
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "version": self._state[0],
+            "size": len(self._state[2]),
+            "version_checks": self.version_checks,
+            "reloads": self.reloads,
+        }
+
+
+vaccine_catalog = VaccineCatalog(VACCINE_CATALOG_CACHE, VACCINE_CATALOG_CHECK_INTERVAL)
@@ -0,0 +1,53 @@
+from sqlalchemy import event, exists, inspect, update
+from sqlalchemy.orm import Session
+from . import models
+
+
+# --------------------------
+# COLLECTION VERSIONS
+# --------------------------
+# Rows of catalog_versions: a cheap, shared "has this collection changed?"
+# signal for in-memory caches and collection ETags.
+def bump_version(db: Session, name: str):
+    """Bump ``name`` inside the caller's transaction (call before commit)."""
+    db.query(models.CatalogVersion).filter(models.CatalogVersion.name == name).update(
+        {models.CatalogVersion.version: models.CatalogVersion.version + 1}, synchronize_session=False
+    )
+
+
+def read_version(db: Session, name: str):
+    """Return ``(version, updated_at)`` of ``name``."""
+    row = db.query(models.CatalogVersion.version, models.CatalogVersion.updated_at).filter(
+        models.CatalogVersion.name == name).first()
+    return (row.version, row.updated_at) if row else (0, None)
+
+
+# --------------------------
+# ARTICLE AUTHORS
+# --------------------------
+# Article responses embed their author (UserOut, null once deleted), so the
+# article list version moves when an author's visible fields change or a user
+# is deleted. Mapper events cover every ORM flush, sync or async; after manual
+# SQL, bump "articles" by hand.
+AUTHOR_FIELDS = ("full_name", "email", "role")
+
+
+def _bump_articles(connection, author_id=None):
+    stmt = update(models.CatalogVersion).where(models.CatalogVersion.name == "articles").values(
+        version=models.CatalogVersion.version + 1)
+    if author_id is not None:
+        stmt = stmt.where(exists().where(models.AwarenessArticle.created_by == author_id))
+    connection.execute(stmt)
+
+
+@event.listens_for(models.User, "after_update")
+def _author_updated(mapper, connection, target):
+    state = inspect(target)
+    if any(state.attrs[field].history.has_changes() for field in AUTHOR_FIELDS):
+        _bump_articles(connection, target.id)
+
+
+# Unconditional: by now the ORM may already have cleared the articles' created_by.
+@event.listens_for(models.User, "after_delete")
+def _author_deleted(mapper, connection, target):
+    _bump_articles(connection)
@@ -0,0 +1,120 @@
+"""Shared test setup: one scratch database, migrated to head and filled with synthetic data.
+
+    python -m pytest -q
+    DB_MODE=async python -m pytest -q
+    DATABASE_URL=postgresql://…/scratch python -m pytest -q
+
+The app reads its settings when it is imported, so they are set here, before
+any test module imports ``app``. Without DATABASE_URL the database is a
+temporary SQLite file, with a second one as its read replica (see
+tests/test_read_replica.py). Every request runs with ENFORCE_QUERY_BUDGETS=1 and
+RAISE_ON_LAZY_LOAD=1: a route that issues more statements than its
+query_budget(), or lazy loads a relationship, fails the test that called it.
+"""
+import os
+import tempfile
+
+SCRATCH_DIRECTORY = tempfile.mkdtemp(prefix="vaccination-tests-")
+
+if not os.getenv("DATABASE_URL"):
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(SCRATCH_DIRECTORY, 'primary.db')}"
+    os.environ["REPLICA_DATABASE_URL"] = f"sqlite:///{os.path.join(SCRATCH_DIRECTORY, 'replica.db')}"
+    # Short, so the read-your-writes window can be seen to close.
+    os.environ.setdefault("READ_YOUR_WRITES_SECONDS", "1")
+os.environ["ENFORCE_QUERY_BUDGETS"] = "1"
+os.environ["RAISE_ON_LAZY_LOAD"] = "1"
+os.environ["AUTO_CREATE_SCHEMA"] = "0"
+os.environ.setdefault("PASSWORD_HASH_WORKERS", "0")
+# Rate limits would turn the suite's logins into 429s.
+os.environ.setdefault("ADMISSION_ENABLED", "0")
+# Event stream tests wait on heartbeats between messages.
+os.environ.setdefault("EVENT_HEARTBEAT_SECONDS", "1")
+
+import pytest  # noqa: E402
+
+# Small enough to seed in a few seconds, large enough that a full scan shows in a plan.
+SYNTHETIC_USERS = 500
+SYNTHETIC_APPOINTMENTS = 5000
+SYNTHETIC_ARTICLES = 200
+
+
+@pytest.fixture(scope="session")
+def database():
+    """`alembic upgrade head`, then app.synthetic_data; returns the sync engine."""
+    from alembic import command
+    from alembic.config import Config
+    from app import synthetic_data
+    from app.database import SessionLocal, engine
+    from app.migrations import ALEMBIC_INI
+
+    command.upgrade(Config(ALEMBIC_INI), "head")
+    db = SessionLocal()
+    try:
+        synthetic_data.generate(db, SYNTHETIC_USERS, SYNTHETIC_APPOINTMENTS, SYNTHETIC_ARTICLES, admins=2)
+    finally:
+        db.close()
+    return engine
+
+
+@pytest.fixture(scope="session")
+def client(database):
+    """The app's test client. Its reads stay on the primary: only tests/test_read_replica.py reads the replica."""
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from app.read_routing import PRIMARY_COOKIE
+
+    # An explicit Cookie header wins over the window cookies the client's own writes would store.
+    with TestClient(app, headers={"Cookie": f"{PRIMARY_COOKIE}={2 ** 40}"}) as client:
+        yield client
+
+
+def _login(client, email: str) -> dict:
+    from app.synthetic_data import SYNTHETIC_PASSWORD
+
+    response = client.post("/auth/login", data={"username": email, "password": SYNTHETIC_PASSWORD})
+    assert response.status_code == 200, response.text
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+@pytest.fixture(scope="session")
+def admin(client) -> dict:
+    """Authorization header of the synthetic admin."""
+    from app.synthetic_data import SYNTHETIC_ADMIN_EMAIL
+
+    return _login(client, SYNTHETIC_ADMIN_EMAIL)
+
+
+@pytest.fixture(scope="session")
+def citizen(client) -> dict:
+    """Authorization header of the synthetic citizen."""
+    from app.synthetic_data import SYNTHETIC_CITIZEN_EMAIL
+
+    return _login(client, SYNTHETIC_CITIZEN_EMAIL)
+
+
+@pytest.fixture(scope="session")
+def ids(database) -> dict:
+    """Ids of existing rows, looked up once: the synthetic citizen, a vaccine, an appointment, ..."""
+    from sqlalchemy import select
+    from app import models
+    from app.database import SessionLocal
+    from app.synthetic_data import SYNTHETIC_ADMIN_EMAIL, SYNTHETIC_CITIZEN_EMAIL
+
+    db = SessionLocal()
+    try:
+        admin_id, citizen_id = (db.scalar(select(models.User.id).where(models.User.email == email))
+                                for email in (SYNTHETIC_ADMIN_EMAIL, SYNTHETIC_CITIZEN_EMAIL))
+        vaccination = db.execute(select(models.Vaccination.id, models.Vaccination.appointment_id)
+                                 .order_by(models.Vaccination.id).limit(1)).one()
+        return {
+            "admin_id": admin_id,
+            "citizen_id": citizen_id,
+            "vaccine_id": db.scalar(select(models.Vaccine.id).order_by(models.Vaccine.id).limit(1)),
+            "appointment_id": vaccination.appointment_id,
+            "middle_appointment_id": db.scalar(select(models.Appointment.id).order_by(models.Appointment.id)
+                                               .offset(SYNTHETIC_APPOINTMENTS // 2).limit(1)),
+            "vaccination_id": vaccination.id,
+            "article_id": db.scalar(select(models.AwarenessArticle.id).order_by(models.AwarenessArticle.id).limit(1)),
+        }
+    finally:
+        db.close()
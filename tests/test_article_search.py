@@ -0,0 +1,33 @@
+"""Article search snippets are HTML: the article text escaped, only the matches marked."""
+from app import article_search
+
+
+def test_snippet_escapes_the_article_text(client, admin):
+    content = ("Quarantine notes <script>alert('x')</script> & <b>bold</b> claims about "
+               "zanzibarite boosters \ue000unbalanced marker")
+    response = client.post("/articles/", headers=admin, json={"title": "Escaping", "content": content})
+    assert response.status_code == 200, response.text
+
+    response = client.get("/articles/search?q=zanzibarite")
+    assert response.status_code == 200, response.text
+    [hit] = response.json()
+    snippet = hit["snippet"]
+    assert "<mark>zanzibarite</mark>" in snippet
+    # SQLite keeps the tags (escaped); the PostgreSQL parser drops them from headlines.
+    assert "alert(&#x27;x&#x27;)" in snippet and "&amp;" in snippet
+    assert "<" not in snippet.replace("<mark>", "").replace("</mark>", "")
+    assert "\ue000" not in snippet
+
+
+def test_highlight_drops_stray_markers():
+    assert article_search.highlight("a \ue000<i>\ue001 \ue001b\ue000") == "a <mark>&lt;i&gt;</mark> b"
+
+
+def test_unsupported_database_answers_501(client, monkeypatch):
+    def unavailable(db, q, limit, offset=0):
+        raise article_search.SearchUnavailable("Article search is not available on oracle")
+
+    monkeypatch.setattr(article_search, "search_articles", unavailable)
+    response = client.get("/articles/search?q=measles")
+    assert response.status_code == 501
+    assert response.json() == {"detail": "Article search is not available on oracle"}
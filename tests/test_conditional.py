@@ -0,0 +1,55 @@
+"""Conditional GETs: a cached article list is revalidated when an embedded author changes."""
+from app import models
+from app.database import SessionLocal
+from app.synthetic_data import SYNTHETIC_PASSWORD
+from app.utils import hash_password
+
+
+def _author(client):
+    db = SessionLocal()
+    author = models.User(full_name="Etag author", email="etag-author@tests.example.org",
+                         password_hash=hash_password(SYNTHETIC_PASSWORD), role="admin")
+    db.add(author)
+    db.commit()
+    author_id = author.id
+    db.close()
+    response = client.post("/auth/login", data={"username": "etag-author@tests.example.org",
+                                                "password": SYNTHETIC_PASSWORD})
+    return author_id, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def _revalidate(client, path: str, etag: str):
+    return client.get(path, headers={"If-None-Match": etag})
+
+
+def test_article_list_etag_follows_its_authors(client):
+    author_id, token = _author(client)
+    article_id = client.post("/articles/", headers=token, json={"title": "Etag", "content": "Author test"}).json()["id"]
+    path = f"/articles/?ids={article_id}"
+    etag = client.get(path).headers["etag"]
+    assert _revalidate(client, path, etag).status_code == 304
+
+    db = SessionLocal()
+    db.get(models.User, author_id).full_name = "Renamed author"
+    db.commit()
+    response = _revalidate(client, path, etag)
+    assert response.status_code == 200
+    assert response.json()[0]["author"]["full_name"] == "Renamed author"
+
+    etag = response.headers["etag"]
+    db.delete(db.get(models.User, author_id))
+    db.commit()
+    db.close()
+    response = _revalidate(client, path, etag)
+    assert response.status_code == 200
+    assert response.json()[0]["author"] is None
+
+
+def test_password_rehash_keeps_the_article_list_etag(client):
+    etag = client.get("/articles/?limit=5").headers["etag"]
+    db = SessionLocal()
+    admin = db.query(models.User).filter(models.User.role == "admin").first()
+    admin.password_hash = hash_password(SYNTHETIC_PASSWORD)  # new salt, as a login rehash would store
+    db.commit()
+    db.close()
+    assert _revalidate(client, "/articles/?limit=5", etag).status_code == 304
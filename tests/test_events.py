@@ -0,0 +1,92 @@
+"""User events: resuming after a reconnect, and live delivery over the WebSocket.
+
+Live delivery goes through the configured backend: the committing process on
+SQLite, LISTEN/NOTIFY when the suite runs on PostgreSQL.
+"""
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from sqlalchemy import func, insert, select
+
+from app import events, models
+from app.database import SessionLocal
+
+# Heartbeats (EVENT_HEARTBEAT_SECONDS apart) a test waits through for an event.
+PATIENCE = 10
+
+
+@pytest.fixture
+def user_id(database, request):
+    """A user of its own, so a replay holds only the test's events."""
+    db = SessionLocal()
+    user = models.User(full_name="Event reader", email=f"{request.node.name}@events.tests.example.org",
+                       password_hash="unused", role="citizen")
+    db.add(user)
+    db.commit()
+    user_id = user.id
+    db.close()
+    return user_id
+
+
+@pytest.fixture
+def appointment_id(database, ids):
+    db = SessionLocal()
+    appointment = models.Appointment(citizen_id=ids["citizen_id"], vaccine_id=ids["vaccine_id"],
+                                     preferred_date=datetime(2031, 4, 7, 9, tzinfo=timezone.utc))
+    db.add(appointment)
+    db.commit()
+    appointment_id = appointment.id
+    db.close()
+    return appointment_id
+
+
+def _insert_event(database, event_id: int, user_id: int, created_at: datetime):
+    with database.begin() as conn:
+        conn.execute(insert(events.EVENTS).values(id=event_id, user_id=user_id, type="test.event", payload="{}",
+                                                  created_at=created_at))
+
+
+def _next_event(socket, wanted):
+    """The first message ``wanted`` accepts; heartbeats and other events are skipped."""
+    heartbeats = 0
+    while heartbeats < PATIENCE:
+        message = socket.receive_json()
+        if message["type"] == "ping":
+            heartbeats += 1
+        elif wanted(message):
+            return message
+    pytest.fail(f"no matching event within {PATIENCE} heartbeats")
+
+
+def _status_event(appointment_id: int, status: str):
+    return lambda message: (message["type"] == "appointment.status"
+                            and message["data"]["appointment_id"] == appointment_id
+                            and message["data"]["status"] == status)
+
+
+def test_resume_replays_an_event_that_committed_after_a_higher_id(database, user_id):
+    with database.connect() as conn:
+        base = (conn.scalar(select(func.max(events.EVENTS.c.id))) or 0) + 1000
+    now = datetime.now(timezone.utc)
+    _insert_event(database, base, user_id, now - timedelta(hours=1))
+    # base + 2 commits (and is delivered) first; base + 1, inserted just before it, commits later.
+    _insert_event(database, base + 2, user_id, now)
+    _insert_event(database, base + 1, user_id, now - timedelta(seconds=1))
+    _insert_event(database, base + 3, user_id, now + timedelta(seconds=1))
+
+    assert [event.id for event in events.replay(user_id, base + 2)] == [base + 1, base + 3]
+    assert [event.id for event in events.replay(user_id, 0)] == [base, base + 1, base + 2, base + 3]
+
+
+def test_websocket_delivers_live_and_replays_on_reconnect(client, admin, citizen, appointment_id):
+    path = f"/appointments/{appointment_id}/status"
+    with client.websocket_connect("/events/ws", headers=citizen) as socket:
+        assert client.patch(f"{path}?status=approved", headers=admin).status_code == 200
+        approved = _next_event(socket, _status_event(appointment_id, "approved"))
+
+    # Committed while the citizen is away: replayed after the last id it saw.
+    assert client.patch(f"{path}?status=rejected&reason_rejection=Moved", headers=admin).status_code == 200
+    with client.websocket_connect(f"/events/ws?last_event_id={approved['id']}", headers=citizen) as socket:
+        rejected = _next_event(socket, _status_event(appointment_id, "rejected"))
+    assert rejected["id"] > approved["id"]
+    assert rejected["data"]["reason_rejection"] == "Moved"
@@ -0,0 +1,89 @@
+"""/metrics behind app.serve: any worker answers the scrape with the sum over all workers."""
+import json
+import os
+import re
+import signal
+import socket
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import httpx
+import pytest
+
+WORKERS = 3
+REQUESTS = 60
+FLUSH_SECONDS = 0.1
+HEALTHZ = re.compile(r'^http_requests_total\{method="GET",route="/healthz",status="200"\} (\d+)$', re.M)
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+@pytest.fixture
+def server(database, tmp_path):
+    """`python -m app.serve` on the test database, with its snapshots in ``tmp_path``."""
+    port = _free_port()
+    env = {**os.environ, "DATABASE_URL": database.url.render_as_string(hide_password=False),
+           "METRICS_DIR": str(tmp_path), "METRICS_FLUSH_SECONDS": str(FLUSH_SECONDS)}
+    process = subprocess.Popen([sys.executable, "-m", "app.serve", "--workers", str(WORKERS), "--host", "127.0.0.1",
+                                "--port", str(port), "--no-access-log", "--log-level", "warning"], env=env)
+    base = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 30
+    while True:
+        try:
+            if httpx.get(f"{base}/readyz").status_code == 200:
+                break
+        except httpx.TransportError:
+            pass
+        assert process.poll() is None, "app.serve exited"
+        assert time.monotonic() < deadline, "app.serve never became ready"
+        time.sleep(0.1)
+    try:
+        yield base, process, tmp_path
+    finally:
+        process.send_signal(signal.SIGTERM)
+        process.wait(timeout=30)
+
+
+def _healthz_total(base: str) -> int:
+    # A new connection per scrape, so the scrapes land on different workers.
+    match = HEALTHZ.search(httpx.get(f"{base}/metrics", headers={"Connection": "close"}).text)
+    return int(match.group(1)) if match else 0
+
+
+def _snapshots(directory) -> dict:
+    """pid -> /healthz requests in that worker's last snapshot."""
+    counts = {}
+    for path in directory.glob("*-*.json"):
+        data = json.loads(path.read_text())
+        counts[int(path.name.split("-")[0])] = sum(
+            value for values, value in data["metrics"]["http_requests_total"] if values[1] == "/healthz")
+    return counts
+
+
+def test_every_worker_reports_the_sum_over_workers(server):
+    base, process, directory = server
+    with ThreadPoolExecutor(max_workers=12) as threads:
+        statuses = list(threads.map(lambda _: httpx.get(f"{base}/healthz", headers={"Connection": "close"})
+                                    .status_code, range(REQUESTS)))
+    assert statuses == [200] * REQUESTS
+    time.sleep(FLUSH_SECONDS * 5)
+
+    assert [_healthz_total(base) for _ in range(3 * WORKERS)] == [REQUESTS] * (3 * WORKERS)
+
+    # A dead worker's counters stay in the total once the master folds them.
+    snapshots = _snapshots(directory)
+    busiest = max(snapshots, key=snapshots.get)
+    assert snapshots[busiest] > 0
+    os.kill(busiest, signal.SIGKILL)
+    deadline = time.monotonic() + 10
+    while busiest in _snapshots(directory):
+        assert time.monotonic() < deadline, "the dead worker's snapshot was never folded"
+        time.sleep(0.1)
+    assert process.poll() is None
+    assert [_healthz_total(base) for _ in range(3 * WORKERS)] == [REQUESTS] * (3 * WORKERS)
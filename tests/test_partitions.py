@@ -0,0 +1,78 @@
+"""Appointments and vaccinations across partitions: the delete cascade, maintenance and archival.
+
+The cascade is checked on every database. Maintenance and archival need the
+partitioned PostgreSQL schema and run on months of their own, far ahead of
+the synthetic data.
+"""
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import func, select, text
+
+from app import models, partitions
+from app.database import SessionLocal
+
+
+def _vaccinated_appointment(ids: dict, when: datetime) -> tuple:
+    """(appointment id, vaccination id) of a fresh appointment of the synthetic citizen and its dose."""
+    db = SessionLocal()
+    appointment = models.Appointment(citizen_id=ids["citizen_id"], vaccine_id=ids["vaccine_id"], preferred_date=when)
+    db.add(appointment)
+    db.flush()
+    vaccination = models.Vaccination(appointment_id=appointment.id, citizen_id=ids["citizen_id"],
+                                     vaccine_id=ids["vaccine_id"], dose_number=1, admin_id=ids["admin_id"])
+    db.add(vaccination)
+    db.commit()
+    created = appointment.id, vaccination.id
+    db.close()
+    return created
+
+
+def _exists(database, model, id_: int) -> bool:
+    with database.connect() as conn:
+        return conn.scalar(select(func.count()).select_from(model).where(model.id == id_)) == 1
+
+
+@pytest.fixture
+def postgresql(database):
+    if not partitions.is_partitioned(database.connect(), "appointments"):
+        pytest.skip("Partitions need PostgreSQL")
+    return database
+
+
+def test_cancelling_an_appointment_deletes_its_vaccination(client, database, ids, citizen):
+    appointment_id, vaccination_id = _vaccinated_appointment(ids, datetime(2032, 2, 3, 9, tzinfo=timezone.utc))
+    assert client.delete(f"/appointments/{appointment_id}", headers=citizen).status_code == 204
+    assert not _exists(database, models.Vaccination, vaccination_id)
+
+
+def test_sql_delete_of_an_appointment_deletes_its_vaccination(postgresql, ids):
+    appointment_id, vaccination_id = _vaccinated_appointment(ids, datetime(2032, 2, 4, 9, tzinfo=timezone.utc))
+    with postgresql.begin() as conn:
+        conn.execute(text("DELETE FROM appointments WHERE id = :id"), {"id": appointment_id})
+    assert not _exists(postgresql, models.Vaccination, vaccination_id)
+
+
+def test_maintenance_and_archival_keep_the_vaccination(client, postgresql, ids, admin):
+    month = date(2045, 3, 1)
+    appointment_id, vaccination_id = _vaccinated_appointment(ids, datetime(2045, 3, 9, 9, tzinfo=timezone.utc))
+    table = next(table for table in partitions.TABLES if table.name == "appointments")
+    name = partitions.partition_name(table.name, month)
+
+    # Far ahead of PARTITION_MONTHS_AHEAD: the row waits in the default partition until maintenance.
+    created = dict(partitions.maintain(postgresql, months_ahead=0))
+    assert created[name] == 1
+    assert _exists(postgresql, models.Vaccination, vaccination_id)
+
+    with postgresql.connect().execution_options(isolation_level="AUTOCOMMIT") as lock:
+        archived = partitions.archive_partition(postgresql, lock, table, name, month)
+    assert archived == f"{partitions.ARCHIVE_SCHEMA}.{name}"
+    with postgresql.connect() as conn:
+        assert conn.scalar(text(f"SELECT count(*) FROM {partitions.ARCHIVE_SCHEMA}.appointments WHERE id = :id"),
+                           {"id": appointment_id}) == 1
+
+    # The vaccination stays live, its appointment_id resolvable only in the archive.
+    assert client.get(f"/appointments/{appointment_id}", headers=admin).status_code == 404
+    response = client.get(f"/vaccinations/{vaccination_id}", headers=admin)
+    assert response.status_code == 200, response.text
+    assert response.json()["appointment_id"] == appointment_id
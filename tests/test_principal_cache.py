@@ -0,0 +1,66 @@
+"""Role changes and deletions made outside this process reach it once its cached principal expires."""
+import re
+
+from sqlalchemy import text
+
+from app import principal_cache
+from app.synthetic_data import SYNTHETIC_PASSWORD
+from app.utils import hash_password
+
+ADMIN_ROUTE = "/stats/vaccinations"
+
+
+def _other_worker(database, statement: str, user_id: int):
+    # Plain SQL fires no mapper events: what this process sees of a change made by another worker.
+    with database.begin() as conn:
+        conn.execute(text(statement), {"id": user_id})
+
+
+def _admin_token(client, database, email: str):
+    with database.begin() as conn:
+        conn.execute(text("INSERT INTO users (full_name, email, password_hash, role) "
+                          "VALUES ('Revoked admin', :email, :hash, 'admin')"),
+                     {"email": email, "hash": hash_password(SYNTHETIC_PASSWORD)})
+        user_id = conn.execute(text("SELECT id FROM users WHERE email = :email"), {"email": email}).scalar()
+    response = client.post("/auth/login", data={"username": email, "password": SYNTHETIC_PASSWORD})
+    return user_id, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+def test_role_claim_is_not_trusted_by_default():
+    assert not principal_cache.TRUST_ROLE_CLAIM
+    assert principal_cache.principal_from_claims({"user_id": 1, "role": "admin", "iat": 0}) is None
+
+
+def test_demotion_elsewhere_applies_after_cache_expiry(client, database):
+    user_id, token = _admin_token(client, database, "demoted@tests.example.org")
+    assert client.get(ADMIN_ROUTE, headers=token).status_code == 200
+
+    _other_worker(database, "UPDATE users SET role = 'citizen' WHERE id = :id", user_id)
+    principal_cache.principal_cache.clear()  # PRINCIPAL_CACHE_TTL elapsed
+    assert client.get(ADMIN_ROUTE, headers=token).status_code == 403
+
+
+def test_deletion_elsewhere_applies_after_cache_expiry(client, database):
+    user_id, token = _admin_token(client, database, "deleted@tests.example.org")
+    assert client.get(ADMIN_ROUTE, headers=token).status_code == 200
+
+    _other_worker(database, "DELETE FROM users WHERE id = :id", user_id)
+    principal_cache.principal_cache.clear()
+    assert client.get(ADMIN_ROUTE, headers=token).status_code == 401
+
+
+def _scrape(client) -> dict:
+    """The principal cache counters; a counter never incremented has no sample yet."""
+    text_ = client.get("/metrics").text
+    return {name: float(match.group(1)) if (match := re.search(rf"^{name} (\S+)$", text_, re.M)) else 0.0
+            for name in ("principal_cache_hits_total", "principal_cache_misses_total")}
+
+
+def test_hits_and_misses_are_exported(client, admin):
+    principal_cache.principal_cache.clear()
+    before = _scrape(client)
+    assert client.get(ADMIN_ROUTE, headers=admin).status_code == 200  # loads the user, caches the principal
+    assert client.get(ADMIN_ROUTE, headers=admin).status_code == 200
+    after = _scrape(client)
+    assert after["principal_cache_misses_total"] - before["principal_cache_misses_total"] == 1
+    assert after["principal_cache_hits_total"] - before["principal_cache_hits_total"] == 1
@@ -0,0 +1,29 @@
+"""List pages built from column projections render what the response_model path renders."""
+from sqlalchemy import text
+
+from app import models
+from app.database import SessionLocal, engine
+from app.pagination import encode_cursor
+
+
+def test_article_without_author_is_the_same_on_every_path(client, ids):
+    db = SessionLocal()
+    author = models.User(full_name="Departed author", email="departed-author@tests.example.org",
+                         password_hash="unused", role="admin")
+    db.add(author)
+    db.flush()
+    article = models.AwarenessArticle(title="Orphan", content="Its author left", created_by=author.id)
+    db.add(article)
+    db.commit()
+    author_id, article_id = author.id, article.id
+    db.close()
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM users WHERE id = :id"), {"id": author_id})
+
+    by_id = client.get(f"/articles/{article_id}")
+    assert by_id.status_code == 200, by_id.text
+    assert by_id.json()["author"] is None
+    by_ids = client.get(f"/articles/?ids={article_id}")
+    page = client.get(f"/articles/?limit=1&cursor={encode_cursor({'id': article_id - 1})}")
+    assert by_ids.status_code == page.status_code == 200
+    assert by_ids.content == page.content == b"[" + by_id.content + b"]"
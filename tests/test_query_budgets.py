@@ -0,0 +1,138 @@
+"""Every router driven with ENFORCE_QUERY_BUDGETS=1 and RAISE_ON_LAZY_LOAD=1 (see conftest.py).
+
+A route that issues more statements than its query_budget() raises
+QueryBudgetExceeded (listing the statements) out of the test client; one that
+lazy loads a relationship raises InvalidRequestError.
+"""
+import io
+
+import pytest
+from fastapi.routing import APIRoute
+
+from app import loaders, query_budget
+
+# Routes that never touch the database, or hold a stream open.
+UNBUDGETED = {"/", "/healthz", "/readyz", "/metrics", "/docs", "/docs/oauth2-redirect", "/redoc", "/openapi.json"}
+
+
+def _ok(response, status=200):
+    assert response.status_code == status, f"{response.request.method} {response.request.url}: {response.text}"
+    return response
+
+
+def _book(client, citizen, ids, day: str) -> int:
+    response = _ok(client.post("/appointments/", headers=citizen, json={
+        "citizen_id": ids["citizen_id"], "vaccine_id": ids["vaccine_id"], "preferred_date": f"{day}T09:00:00Z"}))
+    return response.json()["id"]
+
+
+def test_budgets_are_enforced(client):
+    assert query_budget.ENFORCE_QUERY_BUDGETS and loaders.RAISE_ON_LAZY_LOAD
+
+
+def test_every_route_declares_a_budget(client):
+    missing = []
+    for route in client.app.routes:
+        if not isinstance(route, APIRoute) or route.path in UNBUDGETED:
+            continue
+        declared = any(getattr(each.dependency, "__qualname__", "").startswith("query_budget.")
+                       for each in route.dependencies)
+        if not declared:
+            missing.append(f"{sorted(route.methods)} {route.path}")
+    assert not missing
+
+
+def test_over_budget_raises():
+    with query_budget.count_queries() as stats:
+        stats.count, stats.budget, stats.statements = 2, 1, ["SELECT 1", "SELECT 2"]
+    with pytest.raises(query_budget.QueryBudgetExceeded, match="issued 2 SQL statements, budget is 1"):
+        query_budget.check_budget(stats)
+
+
+def test_users_router(client, admin):
+    _ok(client.post("/users/register", json={
+        "full_name": "Budget citizen", "email": "budget@tests.example.org", "password": "budget-password"}))
+    _ok(client.get("/users/?limit=20", headers=admin))
+    _ok(client.head("/users/", headers=admin))
+
+
+def test_auth_router(client):
+    from app.synthetic_data import SYNTHETIC_CITIZEN_EMAIL, SYNTHETIC_PASSWORD
+
+    _ok(client.post("/auth/login", data={"username": SYNTHETIC_CITIZEN_EMAIL, "password": SYNTHETIC_PASSWORD}))
+    _ok(client.post("/auth/login", data={"username": SYNTHETIC_CITIZEN_EMAIL, "password": "wrong"}), 400)
+
+
+def test_vaccine_router(client, admin, ids):
+    vaccine_id = _ok(client.post("/vaccines/", headers=admin, json={"name": "Budget vaccine", "price": 12.5})).json()["id"]
+    _ok(client.get("/vaccines/"))
+    _ok(client.get(f"/vaccines/?ids={vaccine_id},{ids['vaccine_id']}"))
+    _ok(client.head("/vaccines/"))
+    _ok(client.head(f"/vaccines/{vaccine_id}"))
+    _ok(client.get(f"/vaccines/{vaccine_id}"))
+    _ok(client.patch(f"/vaccines/{vaccine_id}", headers=admin, json={"name": "Budget vaccine", "price": 13.0}))
+    _ok(client.delete(f"/vaccines/{vaccine_id}", headers=admin), 204)
+
+
+def test_appointment_router(client, admin, citizen, ids):
+    appointment_id = _book(client, citizen, ids, "2031-02-03")
+    _ok(client.get("/appointments/?limit=50"))
+    _ok(client.get(f"/appointments/?ids={appointment_id},{ids['middle_appointment_id']}"))
+    _ok(client.head("/appointments/"))
+    _ok(client.head(f"/appointments/{appointment_id}"))
+    etag = _ok(client.get(f"/appointments/{appointment_id}")).headers["etag"]
+    _ok(client.get(f"/appointments/{appointment_id}", headers={"If-None-Match": etag}), 304)
+    _ok(client.patch(f"/appointments/{appointment_id}/status?status=approved", headers=admin))
+    _ok(client.patch("/appointments/status", headers=admin, json={"status": "rejected", "ids": [appointment_id]}))
+    _ok(client.patch("/appointments/status", headers=admin, json={
+        "status": "approved", "vaccine_id": ids["vaccine_id"], "current_status": "pending",
+        "date_from": "2025-03-01T00:00:00Z", "date_to": "2025-03-08T00:00:00Z"}))
+    _ok(client.get(f"/appointments/export?vaccine_id={ids['vaccine_id']}&format=ndjson", headers=admin))
+    _ok(client.delete(f"/appointments/{appointment_id}", headers=citizen), 204)
+
+
+def test_vaccination_router(client, admin, citizen, ids):
+    appointment_id = _book(client, citizen, ids, "2031-02-04")
+    body = {"appointment_id": appointment_id, "citizen_id": ids["citizen_id"], "vaccine_id": ids["vaccine_id"],
+            "dose_number": 1}
+    vaccination_id = _ok(client.post("/vaccinations/", headers=admin, json=body)).json()["id"]
+    _ok(client.get("/vaccinations/?limit=50"))
+    _ok(client.head("/vaccinations/"))
+    _ok(client.head(f"/vaccinations/{vaccination_id}"))
+    _ok(client.get(f"/vaccinations/{vaccination_id}"))
+    _ok(client.patch(f"/vaccinations/{vaccination_id}", headers=admin, json={**body, "batch_number": "B-1"}))
+    _ok(client.get("/vaccinations/export?columns=id,vaccine_name,citizen_email", headers=admin))
+    upload = io.BytesIO(("appointment_id,citizen_id,vaccine_id,dose_number\n"
+                         f"{appointment_id},{ids['citizen_id']},{ids['vaccine_id']},2\n").encode())
+    result = _ok(client.post("/vaccinations/import", headers=admin, files={"file": ("doses.csv", upload)})).json()
+    assert result["inserted"] == 1, result
+    _ok(client.delete(f"/vaccinations/{vaccination_id}", headers=admin), 204)
+
+
+def test_awareness_article_router(client, admin, ids):
+    body = {"title": "Measles booster campaign", "content": "Children get their booster dose at school."}
+    article_id = _ok(client.post("/articles/", headers=admin, json=body)).json()["id"]
+    etag = _ok(client.get("/articles/?limit=20")).headers["etag"]
+    _ok(client.get("/articles/?limit=20", headers={"If-None-Match": etag}), 304)
+    _ok(client.head("/articles/"))
+    _ok(client.get("/articles/search?q=measles%20booster"))
+    _ok(client.head(f"/articles/{article_id}"))
+    etag = _ok(client.get(f"/articles/{article_id}")).headers["etag"]
+    _ok(client.get(f"/articles/{article_id}", headers={"If-None-Match": etag}), 304)
+    _ok(client.patch(f"/articles/{article_id}", headers=admin, json={**body, "title": "Measles booster week"}))
+    _ok(client.delete(f"/articles/{article_id}", headers=admin), 204)
+
+
+def test_stats_router(client, admin, ids):
+    _ok(client.get(f"/stats/appointments?vaccine_id={ids['vaccine_id']}", headers=admin))
+    _ok(client.get("/stats/vaccinations", headers=admin))
+
+
+def test_appointment_slot_router(client, admin, ids):
+    _ok(client.put(f"/slots/{ids['vaccine_id']}/2031-03-01", headers=admin, json={"capacity": 40}))
+    _ok(client.get(f"/slots/?vaccine_id={ids['vaccine_id']}", headers=admin))
+
+
+@pytest.mark.parametrize("report", ["coverage", "progression", "cohorts", "citizens", "due"])
+def test_analytics_router(client, admin, report):
+    _ok(client.get(f"/analytics/{report}", headers=admin))
@@ -0,0 +1,201 @@
+"""EXPLAIN the SQL behind the hot routes: none may read a whole large table.
+
+Each case sends one request through the app, captures the statements it
+issues and EXPLAINs them on the seeded database (see conftest.py). A plan
+fails when it scans a large table: SQLite ``SCAN <table>``, or PostgreSQL
+``Seq Scan`` with ``enable_seqscan`` off (so a sequential scan only shows up
+when no index can serve the query). An ordered scan cut short by ``LIMIT``
+(first page of a list) is accepted.
+"""
+import json
+import re
+import threading
+
+import pytest
+
+# Small by design: a full read of these is the plan we want.
+SMALL_TABLES = {"vaccines", "catalog_versions", "vaccine_dose_stats", "alembic_version"}
+EXPLAINED = ("SELECT", "UPDATE", "DELETE", "WITH")
+
+# "SCAN CONSTANT ROW" is the outer SELECT of an EXISTS probe, not a table.
+_SQLITE_SCAN = re.compile(r"^SCAN (?!CONSTANT ROW)(\w+)")
+# Partitions are reported under their own names (appointments_p2026_10).
+_PARTITION = re.compile(r"^(\w+?)_(p\d{4}_\d{2}|default)$")
+
+WINDOW = "date_from=2025-03-01T00:00:00Z&date_to=2025-03-08T00:00:00Z"
+
+# (label, method, path, role, json body); paths and bodies are formatted with the ids fixtures.
+HOT_REQUESTS = [
+    ("login", "POST", "/auth/login", None, None),
+    ("list appointments", "GET", "/appointments/?limit=50", None, None),
+    ("list appointments, next page", "GET", "/appointments/?limit=50&cursor={cursor}", None, None),
+    ("get appointment", "GET", "/appointments/{appointment_id}", None, None),
+    ("head appointment", "HEAD", "/appointments/{appointment_id}", None, None),
+    ("batch appointments by ids", "GET",
+     "/appointments/?ids={appointment_id},{middle_appointment_id},{own_appointment_id}", None, None),
+    ("list vaccinations, next page", "GET", "/vaccinations/?limit=50&cursor={cursor}", None, None),
+    ("get vaccination", "GET", "/vaccinations/{vaccination_id}", None, None),
+    ("list vaccines", "GET", "/vaccines/", None, None),
+    ("list users", "GET", "/users/?limit=50", None, None),
+    ("list articles", "GET", "/articles/?limit=20", None, None),
+    ("get article", "GET", "/articles/{article_id}", None, None),
+    ("search articles", "GET", "/articles/search?q=measles%20booster", None, None),
+    ("book appointment", "POST", "/appointments/", "citizen",
+     {"citizen_id": "{citizen_id}", "vaccine_id": "{vaccine_id}", "preferred_date": "2030-06-01T09:00:00Z"}),
+    ("approve appointment", "PATCH", "/appointments/{own_appointment_id}/status?status=approved", "admin", None),
+    ("bulk status by vaccine and week", "PATCH", "/appointments/status", "admin",
+     {"status": "approved", "vaccine_id": "{vaccine_id}", "current_status": "pending",
+      "date_from": "2025-02-01T00:00:00Z", "date_to": "2025-02-08T00:00:00Z"}),
+    ("export appointments, vaccine and week", "GET", "/appointments/export?vaccine_id={vaccine_id}&" + WINDOW,
+     "admin", None),
+    ("export vaccinations, vaccine", "GET", "/vaccinations/export?vaccine_id={vaccine_id}", "admin", None),
+    ("appointment stats", "GET", "/stats/appointments?vaccine_id={vaccine_id}", "admin", None),
+    ("dose stats", "GET", "/stats/vaccinations", "admin", None),
+    ("slots", "GET", "/slots/?vaccine_id={vaccine_id}", "admin", None),
+    ("record vaccination", "POST", "/vaccinations/", "admin",
+     {"appointment_id": "{vaccinated_appointment_id}", "citizen_id": "{citizen_id}", "vaccine_id": "{vaccine_id}",
+      "dose_number": 2}),
+    ("delete vaccination", "DELETE", "/vaccinations/{own_vaccination_id}", "admin", None),
+    ("cancel appointment", "DELETE", "/appointments/{own_appointment_id}", "citizen", None),
+]
+
+
+class Capture:
+    """Statements issued by the app while ``active`` (the test client serves from another thread)."""
+
+    def __init__(self, engines):
+        from sqlalchemy import event
+
+        self.engines = engines
+        self.active = False
+        self.statements = []
+        self._lock = threading.Lock()
+        for engine in engines:
+            event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active:
+            if executemany:
+                parameters = parameters[0] if parameters else ()
+            with self._lock:
+                self.statements.append((statement, parameters))
+
+    def remove(self):
+        from sqlalchemy import event
+
+        for engine in self.engines:
+            event.remove(engine, "before_cursor_execute", self._record)
+
+
+def full_scans(conn, statement: str, parameters):
+    """(large tables scanned in full, plan text) for one statement."""
+    dialect = conn.dialect.name
+    if dialect == "sqlite":
+        plan = [row[3] for row in conn.exec_driver_sql("EXPLAIN QUERY PLAN " + statement, parameters)]
+        scans = {match.group(1) for line in plan if (match := _SQLITE_SCAN.match(line))
+                 and "VIRTUAL TABLE" not in line}
+        if re.search(r"\bLIMIT\b", statement, re.I) and not any("TEMP B-TREE" in line for line in plan):
+            scans = set()
+        return scans - SMALL_TABLES, "\n".join(plan)
+    if dialect == "postgresql":
+        conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+        plan = conn.exec_driver_sql("EXPLAIN (FORMAT JSON) " + statement, parameters).scalar()
+        if isinstance(plan, str):
+            plan = json.loads(plan)
+        scans, stack = set(), [plan[0]["Plan"]]
+        while stack:
+            node = stack.pop()
+            if node["Node Type"] == "Seq Scan":
+                relation = node["Relation Name"]
+                scans.add(match.group(1) if (match := _PARTITION.match(relation)) else relation)
+            stack.extend(node.get("Plans", []))
+        return scans - SMALL_TABLES, json.dumps(plan, indent=1)
+    pytest.skip(f"Plan checks are not available on {dialect}")
+
+
+def _format(value, ids: dict):
+    if isinstance(value, dict):
+        return {key: _format(each, ids) for key, each in value.items()}
+    if isinstance(value, str) and value.startswith("{") and value.endswith("}") and value[1:-1] in ids:
+        return ids[value[1:-1]]  # a whole-value placeholder keeps the id an int
+    return value.format(**ids) if isinstance(value, str) else value
+
+
+@pytest.fixture(scope="module")
+def capture(database):
+    from app import database as db_module
+
+    engines = [db_module.engine] + ([db_module.async_engine.sync_engine] if db_module.async_engine else [])
+    capture = Capture(engines)
+    yield capture
+    capture.remove()
+
+
+@pytest.fixture
+def own_ids(database, ids):
+    """Fresh appointments of the synthetic citizen for the write requests: one bare, one with a vaccination."""
+    from datetime import datetime, timezone
+    from app import models
+    from app.database import SessionLocal
+    from app.pagination import encode_cursor
+
+    db = SessionLocal()
+    bare, vaccinated = (models.Appointment(citizen_id=ids["citizen_id"], vaccine_id=ids["vaccine_id"],
+                                           preferred_date=datetime(2030, 5, day, 9, tzinfo=timezone.utc))
+                        for day in (2, 3))
+    db.add_all([bare, vaccinated])
+    db.flush()
+    vaccination = models.Vaccination(appointment_id=vaccinated.id, citizen_id=ids["citizen_id"],
+                                     vaccine_id=ids["vaccine_id"], dose_number=1, admin_id=ids["admin_id"])
+    db.add(vaccination)
+    db.commit()
+    own = {"own_appointment_id": bare.id, "own_vaccination_id": vaccination.id,
+           "vaccinated_appointment_id": vaccinated.id, "cursor": encode_cursor({"id": ids["middle_appointment_id"]})}
+    db.close()
+    return {**ids, **own}
+
+
+def test_schema_matches_models(database):
+    """`alembic upgrade head` leaves no drift against the models."""
+    from alembic.autogenerate import compare_metadata
+    from alembic.migration import MigrationContext
+    from app import models
+    from app.database import Base
+
+    def include_object(object, name, type_, reflected, compare_to):
+        if type_ == "foreign_key_constraint" and models.is_unenforced_foreign_key(object):
+            return False
+        return not (reflected and compare_to is None
+                    and (models.is_article_search_object(name) or models.is_partition_object(name)))
+
+    with database.connect() as conn:
+        context = MigrationContext.configure(conn, opts={"include_object": include_object})
+        assert compare_metadata(context, Base.metadata) == []
+
+
+@pytest.mark.parametrize("label, method, path, role, body", HOT_REQUESTS, ids=[case[0] for case in HOT_REQUESTS])
+def test_hot_request_uses_indexes(client, database, capture, own_ids, admin, citizen,
+                                  label, method, path, role, body):
+    from app.synthetic_data import SYNTHETIC_CITIZEN_EMAIL, SYNTHETIC_PASSWORD
+
+    headers = {"admin": admin, "citizen": citizen}.get(role, {})
+    capture.statements.clear()
+    capture.active = True
+    try:
+        if path == "/auth/login":
+            response = client.post(path, data={"username": SYNTHETIC_CITIZEN_EMAIL, "password": SYNTHETIC_PASSWORD})
+        else:
+            response = client.request(method, _format(path, own_ids), json=_format(body, own_ids), headers=headers)
+    finally:
+        capture.active = False
+    assert response.status_code < 400, response.text
+
+    checked = [(s, p) for s, p in capture.statements if s.lstrip().upper().startswith(EXPLAINED)]
+    failures = []
+    with database.connect() as conn:
+        for statement, parameters in checked:
+            scans, plan = full_scans(conn, statement, parameters)
+            if scans:
+                failures.append(f"full scan of {', '.join(sorted(scans))}:\n{statement.strip()}\n{plan}")
+            conn.rollback()
+    assert not failures, "\n\n".join(failures)
@@ -0,0 +1,120 @@
+"""GET/HEAD read routing against a primary and a stale replica.
+
+The replica is a copy of the seeded primary taken when this module starts
+(SQLite only, see conftest.py). Nothing replicates afterwards, so every
+later write is "lagging" forever and shows which database answered a
+request. Each request sends its own Cookie header: none (a client that has
+not written) or the window cookie a write returned.
+"""
+import sqlite3
+import threading
+import time
+
+import pytest
+
+NO_WINDOW = {"Cookie": ""}
+
+
+class Counter:
+    """Statements issued on one engine, split into reads and writes."""
+
+    def __init__(self, engine):
+        from sqlalchemy import event
+
+        self.engine = engine
+        self.reads = self.writes = 0
+        self._lock = threading.Lock()
+        event.listen(engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        with self._lock:
+            if context is not None and (context.isinsert or context.isupdate or context.isdelete):
+                self.writes += 1
+            else:
+                self.reads += 1
+
+    def reset(self):
+        with self._lock:
+            self.reads = self.writes = 0
+
+    def remove(self):
+        from sqlalchemy import event
+
+        event.remove(self.engine, "before_cursor_execute", self._record)
+
+
+@pytest.fixture(scope="module")
+def engines(database):
+    """(primary, replica) statement counters, once the replica is a snapshot of the seeded primary."""
+    from app import database as db_module
+
+    if not db_module.REPLICA_DATABASE_URL:
+        pytest.skip("REPLICA_DATABASE_URL is not set")
+    if database.dialect.name != "sqlite" or db_module.replica_engine.dialect.name != "sqlite":
+        pytest.skip("The stale replica is a copy of a SQLite primary")
+    with sqlite3.connect(database.url.database) as source, \
+            sqlite3.connect(db_module.replica_engine.url.database) as target:
+        source.backup(target)
+    if db_module.async_engine is not None:
+        counters = Counter(db_module.async_engine.sync_engine), Counter(db_module.async_replica_engine.sync_engine)
+    else:
+        counters = Counter(db_module.engine), Counter(db_module.replica_engine)
+    yield counters
+    for counter in counters:
+        counter.remove()
+
+
+def _window(response) -> dict:
+    """The Cookie header a browser would send back after ``response``."""
+    from app.read_routing import PRIMARY_COOKIE
+
+    cookie = response.headers.get("set-cookie", "")
+    assert cookie.startswith(f"{PRIMARY_COOKIE}="), cookie or "<no cookie>"
+    return {"Cookie": cookie.split(";", 1)[0]}
+
+
+def test_reads_follow_the_read_your_writes_window(client, engines, ids, admin, citizen):
+    from app.read_routing import READ_YOUR_WRITES_SECONDS
+
+    primary, replica = engines
+    primary.reset(), replica.reset()
+    response = client.post("/appointments/", headers={**citizen, **NO_WINDOW}, json={
+        "citizen_id": ids["citizen_id"], "vaccine_id": ids["vaccine_id"], "preferred_date": "2031-03-05T09:00:00Z"})
+    assert response.status_code == 200, response.text
+    assert primary.writes and not replica.reads
+    writer = {**citizen, **_window(response)}
+    path = f"/appointments/{response.json()['id']}"
+
+    replica.reset()
+    assert client.get(path, headers=writer).status_code == 200
+    assert not replica.reads, "the writer read its own write from the replica"
+
+    # 404: the appointment never reached the replica.
+    assert client.get(path, headers={**admin, **NO_WINDOW}).status_code == 404
+    assert replica.reads
+    assert client.head(path, headers={**admin, **NO_WINDOW}).status_code == 404
+
+    time.sleep(READ_YOUR_WRITES_SECONDS + 0.2)
+    replica.reset()
+    assert client.get(path, headers=writer).status_code == 404
+    assert replica.reads
+    assert not replica.writes
+
+
+def test_a_user_only_on_the_primary_can_authenticate(client, engines):
+    from app.synthetic_data import SYNTHETIC_PASSWORD
+
+    primary, replica = engines
+    email = "fresh@replica.tests.example.org"
+    response = client.post("/users/register", headers=NO_WINDOW, json={
+        "full_name": "Fresh citizen", "email": email, "password": SYNTHETIC_PASSWORD})
+    assert response.status_code == 200, response.text
+    response = client.post("/auth/login", headers=NO_WINDOW, data={"username": email, "password": SYNTHETIC_PASSWORD})
+    assert response.status_code == 200, response.text
+
+    replica.reset()
+    token = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    response = client.get("/appointments/", headers={**token, **NO_WINDOW})
+    assert response.status_code == 200, response.text
+    assert replica.reads, "the list was not read from the replica"
+    assert not replica.writes
@@ -0,0 +1,121 @@
+"""Appointment slots under contention: one slot is never booked past its capacity."""
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timezone
+
+import pytest
+from sqlalchemy import exc, func, select
+
+from app import models, slots
+from app.database import SessionLocal
+
+THREADS = 16
+ATTEMPTS = 10  # per thread
+CAPACITY = 25
+
+
+@pytest.fixture
+def vaccine_id(database, request):
+    db = SessionLocal()
+    vaccine = models.Vaccine(name=f"Contended {request.node.name}")
+    db.add(vaccine)
+    db.commit()
+    vaccine_id = vaccine.id
+    db.close()
+    return vaccine_id
+
+
+def _retrying(work):
+    """Run ``work`` until it gets past SQLite's "database is locked"."""
+    while True:
+        try:
+            return work()
+        except exc.OperationalError:
+            continue
+
+
+def _hammer(worker):
+    with ThreadPoolExecutor(max_workers=THREADS) as threads:
+        return [outcome for outcomes in threads.map(lambda _: [worker() for _ in range(ATTEMPTS)], range(THREADS))
+                for outcome in outcomes]
+
+
+def test_reserve_one_never_exceeds_capacity(database, vaccine_id):
+    day = date(2032, 1, 5)
+    db = SessionLocal()
+    slots.set_capacity(db, vaccine_id, day, CAPACITY)
+    db.commit()
+    db.close()
+
+    def reserve():
+        def attempt():
+            with database.begin() as conn:
+                slots._reserve_one(conn, vaccine_id, day, 1)
+        try:
+            _retrying(attempt)
+            return True
+        except slots.SlotFull:
+            return False
+
+    outcomes = _hammer(reserve)
+    with database.connect() as conn:
+        booked = conn.scalar(select(slots.SLOTS.c.booked).where(slots.SLOTS.c.vaccine_id == vaccine_id))
+    assert outcomes.count(True) == CAPACITY
+    assert booked == CAPACITY
+
+
+def test_bookings_and_releases_keep_the_counter_exact(database, vaccine_id, ids):
+    preferred_date = datetime(2032, 1, 6, 9, tzinfo=timezone.utc)
+    day = slots.stored_day(preferred_date, database.dialect.name)
+    db = SessionLocal()
+    slots.set_capacity(db, vaccine_id, day, CAPACITY)
+    db.commit()
+    db.close()
+    holding = (select(func.count()).where(models.Appointment.vaccine_id == vaccine_id,
+                                          models.Appointment.status.in_(slots.HOLDING_STATUSES)))
+    seen = []
+    done = threading.Event()
+
+    def monitor():
+        with database.connect() as conn:
+            while not done.is_set():
+                seen.append(conn.scalar(holding))
+                conn.rollback()
+
+    def book():
+        def attempt():
+            session = SessionLocal()
+            try:
+                appointment = models.Appointment(citizen_id=ids["citizen_id"], vaccine_id=vaccine_id,
+                                                 preferred_date=preferred_date)
+                session.add(appointment)
+                session.commit()
+                # Every third booking gives its place back, alternately by rejection and by deletion.
+                if appointment.id % 3 == 0:
+                    appointment.status = "rejected"
+                    session.commit()
+                elif appointment.id % 3 == 1 and appointment.id % 2:
+                    session.delete(appointment)
+                    session.commit()
+                return True
+            finally:
+                session.close()
+        try:
+            return _retrying(attempt)
+        except slots.SlotFull:
+            return False
+
+    watcher = threading.Thread(target=monitor)
+    watcher.start()
+    try:
+        outcomes = _hammer(book)
+    finally:
+        done.set()
+        watcher.join()
+
+    with database.connect() as conn:
+        final = conn.scalar(holding)
+        booked = conn.scalar(select(slots.SLOTS.c.booked).where(slots.SLOTS.c.vaccine_id == vaccine_id))
+    assert outcomes.count(False), "the slot never filled up"
+    assert max(seen + [final]) <= CAPACITY
+    assert booked == final
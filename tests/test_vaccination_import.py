@@ -0,0 +1,85 @@
+"""Bulk vaccination import: bad references are reported per row, never as a failed import."""
+import io
+import json
+
+from sqlalchemy import func, select
+
+from app import models
+from app.events import EVENTS
+from app.database import SessionLocal
+
+UNKNOWN_ID = 999_999_999
+
+
+def _two_appointments():
+    """Two appointments with different citizens and vaccines."""
+    db = SessionLocal()
+    try:
+        columns = (models.Appointment.id, models.Appointment.citizen_id, models.Appointment.vaccine_id)
+        first = db.execute(select(*columns).order_by(models.Appointment.id).limit(1)).one()
+        second = db.execute(select(*columns).where(models.Appointment.citizen_id != first.citizen_id,
+                                                   models.Appointment.vaccine_id != first.vaccine_id)
+                            .order_by(models.Appointment.id).limit(1)).one()
+        return first, second
+    finally:
+        db.close()
+
+
+def _import(client, admin, rows: list):
+    body = "".join(json.dumps(row) + "\n" for row in rows).encode()
+    response = client.post("/vaccinations/import", headers=admin, files={"file": ("doses.ndjson", io.BytesIO(body))})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _doses(appointment_id: int) -> int:
+    db = SessionLocal()
+    try:
+        return db.scalar(select(func.count()).where(models.Vaccination.appointment_id == appointment_id))
+    finally:
+        db.close()
+
+
+def test_unknown_and_mismatched_references_are_row_errors(client, admin):
+    (good, citizen, vaccine), (_, other_citizen, other_vaccine) = _two_appointments()
+    valid = {"appointment_id": good, "citizen_id": citizen, "vaccine_id": vaccine, "dose_number": 1}
+    doses = _doses(good)
+    result = _import(client, admin, [
+        valid,
+        {**valid, "citizen_id": UNKNOWN_ID},
+        {**valid, "appointment_id": UNKNOWN_ID},
+        {**valid, "vaccine_id": UNKNOWN_ID},
+        {**valid, "citizen_id": other_citizen},
+        {**valid, "vaccine_id": other_vaccine},
+    ])
+
+    assert result["inserted"] == 1
+    assert [(error["line"], error["errors"]) for error in result["errors"]] == [
+        (2, ["citizen_id: Citizen not found"]),
+        (3, ["appointment_id: Appointment not found"]),
+        (4, ["vaccine_id: Vaccine not found"]),
+        (5, [f"citizen_id: Appointment {good} belongs to citizen {citizen}"]),
+        (6, [f"vaccine_id: Appointment {good} is for vaccine {vaccine}"]),
+    ]
+    assert _doses(good) == doses + 1
+
+
+def test_imported_doses_are_recorded_as_events(client, admin):
+    (appointment, citizen, vaccine), _ = _two_appointments()
+    row = {"appointment_id": appointment, "citizen_id": citizen, "vaccine_id": vaccine, "dose_number": 7,
+           "batch_number": "IMPORT-EVENTS"}
+    assert _import(client, admin, [row])["inserted"] == 1
+
+    db = SessionLocal()
+    try:
+        vaccination_id = db.scalar(select(models.Vaccination.id).where(
+            models.Vaccination.appointment_id == appointment, models.Vaccination.batch_number == "IMPORT-EVENTS"))
+        payloads = db.scalars(select(EVENTS.c.payload).where(EVENTS.c.user_id == citizen,
+                                                             EVENTS.c.type == "vaccination.recorded")).all()
+    finally:
+        db.close()
+    recorded = [data for data in map(json.loads, payloads) if data["vaccination_id"] == vaccination_id]
+    assert len(recorded) == 1
+    # The citizen is the event's user, not part of its data.
+    expected = {key: value for key, value in row.items() if key != "citizen_id"}
+    assert {key: recorded[0][key] for key in expected} == expected